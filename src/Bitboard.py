@@ -0,0 +1,427 @@
+'''Bitboard backend for the engine. BitboardGameState exposes the same interface as ChessEngine.GameState (make_move, undo_move, get_valid_moves), but the position is stored as twelve 64-bit integers, one per piece kind, plus the occupancy masks of both sides. Move generation and check detection are carried out with bitwise operations instead of comparing strings square by square.
+
+Squares are indexed as sq = 8*row + col, with row 0 being the 8th rank, so that bit `sq` of every bitboard maps directly onto GameState.board[row, col].
+'''
+import random as r
+from typing import Dict, Iterator, List, Tuple
+
+from ChessEngine import Move, EMPTY, PIECE_NAMES, PIECE_CODES, FEN_CASTLING
+from Tables import FULL, POSITIVE, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, ROOK_RAYS, BISHOP_RAYS, BETWEEN
+
+
+
+#########################
+## PIECES AND CASTLING ##
+#########################
+
+PIECES: List[int] = [PIECE_CODES[name] for name in ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']] #ChessEngine piece codes, in bitboard order
+PIECE_INDEX: Dict[int, int] = {piece: i for i, piece in enumerate(PIECES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6) #offsets inside a colour block, black pieces are shifted by 6
+WHITE, BLACK = 0, 1
+
+START_FEN: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+#castling rights are stored as a 4-bit mask, much cheaper to update than four separate counters
+WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG = 1, 2, 4, 8
+
+#every move touching one of these squares (king or rook homes) clears the related rights
+CASTLING_MASK: List[int] = [15] * 64
+CASTLING_MASK[60] &= ~(WHITE_SHORT | WHITE_LONG)
+CASTLING_MASK[63] &= ~WHITE_SHORT
+CASTLING_MASK[56] &= ~WHITE_LONG
+CASTLING_MASK[4] &= ~(BLACK_SHORT | BLACK_LONG)
+CASTLING_MASK[7] &= ~BLACK_SHORT
+CASTLING_MASK[0] &= ~BLACK_LONG
+
+
+
+###########
+## UTILS ##
+###########
+
+def lsb(bb: int) -> int:
+    return (bb & -bb).bit_length() - 1
+##
+
+def iter_bits(bb: int) -> Iterator[int]:
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+##
+
+def slider_attacks(sq: int, occ: int, directions: Tuple[int, ...]) -> int:
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occ
+        if blockers:
+            blocker = lsb(blockers) if POSITIVE[d] else blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker] #we cut away everything shadowed by the first blocker
+        attacks |= ray
+    return attacks
+##
+
+def rook_attacks(sq: int, occ: int) -> int:
+    return slider_attacks(sq, occ, ROOK_DIRECTIONS)
+##
+
+def bishop_attacks(sq: int, occ: int) -> int:
+    return slider_attacks(sq, occ, BISHOP_DIRECTIONS)
+##
+
+
+'''Read-only view over the piece list of a BitboardGameState, indexed as board[row, col] and returning strings like 'wK' or '--', exactly like the board conversion layer of GameState. This is what keeps ChessMain drawing code working on top of this backend.'''
+class _BoardView():
+
+    def __init__(self, squares: List[int]) -> None:
+        self.squares = squares
+    ##
+
+    def __getitem__(self, key: Tuple[int, int]) -> str:
+        row, col = key
+        return PIECE_NAMES[self.squares[8*row + col]]
+    ##
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for row in range(8):
+            yield [PIECE_NAMES[piece] for piece in self.squares[8*row: 8*row+8]]
+    ##
+##
+
+
+
+class BitboardGameState():
+    def __init__(self, fen: str = START_FEN) -> None:
+
+        '''
+        self.bitboards stores one 64-bit integer per piece kind, following the PIECES ordering. self.occupancy stores the union of the white and black ones, and is always kept in sync together with self.squares, a plain 64-long list we use to know in O(1) which piece sits on a square.
+        '''
+
+        self.bitboards: List[int] = [0] * 12
+        self.occupancy: List[int] = [0, 0]
+        self.squares: List[int] = [EMPTY] * 64
+        self.board: _BoardView = _BoardView(self.squares)
+
+        self.white_to_move: bool = True
+        self.move_log: List[Move] = []
+        self.castling: int = 0
+        self.en_passant_sq: int = -1 #square a pawn can capture en passant on, -1 if none
+        self.history: List[Tuple[int, int, int]] = [] #(castling, en_passant_sq, captured piece index) before every move, popped on undo
+
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+
+        self._set_fen(fen)
+    ##
+
+    '''A new game set up from a FEN string, same as BitboardGameState(fen): the position is parsed once, by __init__'''
+    @classmethod
+    def from_fen(cls, fen: str) -> 'BitboardGameState':
+        return cls(fen)
+    ##
+
+    '''Sets the position up from a FEN string and resets the history. Raises ValueError on malformed strings, with the same checks as GameState._set_fen'''
+    def _set_fen(self, fen: str) -> None:
+        fields = fen.split()
+        if not fields:
+            raise ValueError('Empty FEN string')
+        self.bitboards[:] = [0] * 12
+        self.occupancy[:] = [0, 0]
+        self.squares[:] = [EMPTY] * 64
+        self.move_log = []
+        self.history = []
+
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise ValueError(f'Invalid FEN placement, 8 ranks expected: {fields[0]}')
+        for row, rank in enumerate(ranks):
+            sq, end = 8*row, 8*row + 8
+            for char in rank:
+                if char in '12345678':
+                    sq += int(char)
+                    continue
+                piece = PIECE_CODES.get(('w' if char.isupper() else 'b') + char.upper())
+                if piece is None or sq >= end:
+                    raise ValueError(f'Invalid FEN placement: {fields[0]}')
+                self._put(PIECE_INDEX[piece], sq)
+                sq += 1
+            if sq != end:
+                raise ValueError(f'Invalid FEN placement, 8 squares expected on every rank: {fields[0]}')
+        if any(bin(self.bitboards[PIECE_INDEX[PIECE_CODES[king]]]).count('1') != 1 for king in ('wK', 'bK')):
+            raise ValueError(f'Invalid FEN placement, exactly one king per side expected: {fields[0]}')
+
+        side = fields[1] if len(fields) > 1 else 'w'
+        if side not in ('w', 'b'):
+            raise ValueError(f'Invalid FEN side to move: {side}')
+        self.white_to_move = side == 'w'
+
+        self.castling = 0
+        rights = fields[2] if len(fields) > 2 else '-'
+        if rights != '-' and not all(char in FEN_CASTLING for char in rights):
+            raise ValueError(f'Invalid FEN castling rights: {rights}')
+        for char in rights.strip('-'):
+            colour = 'w' if char.isupper() else 'b'
+            king_sq, rook_sq = FEN_CASTLING[char]
+            if self.squares[king_sq] != PIECE_CODES[colour + 'K'] or self.squares[rook_sq] != PIECE_CODES[colour + 'R']: #make_move toggles the rook, castling without it would create one
+                raise ValueError(f'Invalid FEN castling rights, {char} without its king and rook in place: {rights}')
+        for char, flag in (('K', WHITE_SHORT), ('Q', WHITE_LONG), ('k', BLACK_SHORT), ('q', BLACK_LONG)):
+            if char in rights:
+                self.castling |= flag
+
+        ep = fields[3] if len(fields) > 3 else '-'
+        if ep != '-' and (len(ep) != 2 or ep[0] not in Move.FILES_TO_COLS or ep[1] != ('6' if self.white_to_move else '3')):
+            raise ValueError(f'Invalid FEN en passant square: {ep}')
+        self.en_passant_sq = -1 if ep == '-' else 8*Move.RANKS_TO_ROWS[ep[1]] + Move.FILES_TO_COLS[ep[0]]
+    ##
+
+    def _put(self, piece: int, sq: int) -> None:
+        bit = 1 << sq
+        self.bitboards[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.squares[sq] = PIECES[piece]
+    ##
+
+    def _remove(self, piece: int, sq: int) -> None:
+        bit = 1 << sq
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece // 6] ^= bit
+        self.squares[sq] = EMPTY
+    ##
+
+    def piece_at(self, row: int, col: int) -> int:
+        return self.squares[8*row + col]
+    ##
+
+    def make_move(self, move: Move) -> None:
+        '''As for GameState, we assume the move is valid (i.e. produced by get_valid_moves)'''
+        start, end = move.start_sq, move.end_sq
+        piece = PIECE_INDEX[move.piece_moved] #moves look their pieces up lazily, this must happen before the board changes
+        captured = PIECE_INDEX.get(move.piece_captured, -1)
+
+        self.history.append((self.castling, self.en_passant_sq, captured))
+        self.move_log.append(move)
+
+        if captured >= 0:
+            self._remove(captured, end)
+        self._remove(piece, start)
+
+        ## PROMOTION LOGIC ##
+        if move.pawn_promotion[0] and move.pawn_promotion[1] != EMPTY:
+            self._put(PIECE_INDEX[move.pawn_promotion[1]], end)
+        else:
+            self._put(piece, end)
+
+        ### EN PASSANT LOGIC ###
+        if move.en_passant:
+            self._remove(BLACK*6 + PAWN if piece < 6 else PAWN, 8*move.start_row + move.end_col)
+
+        if piece % 6 == PAWN and abs(end - start) == 16:
+            self.en_passant_sq = (start + end) // 2
+        else:
+            self.en_passant_sq = -1
+
+        ### CASTLING LOGIC ###
+        if move.short_castle:
+            self._remove(piece - KING + ROOK, start + 3)
+            self._put(piece - KING + ROOK, start + 1)
+        elif move.long_castle:
+            self._remove(piece - KING + ROOK, start - 4)
+            self._put(piece - KING + ROOK, start - 1)
+        self.castling &= CASTLING_MASK[start] & CASTLING_MASK[end]
+
+        self.white_to_move = not self.white_to_move
+    ##
+
+    def undo_move(self) -> None:
+        if len(self.move_log) > 0:
+            move: Move = self.move_log.pop()
+            self.castling, self.en_passant_sq, captured = self.history.pop()
+            self.white_to_move = not self.white_to_move
+
+            start, end = move.start_sq, move.end_sq
+            piece = PIECE_INDEX[move.piece_moved]
+
+            self._remove(PIECE_INDEX[self.squares[end]], end) #this also takes care of promoted pieces
+            self._put(piece, start)
+            if captured >= 0:
+                self._put(captured, end)
+
+            if move.en_passant:
+                self._put(BLACK*6 + PAWN if piece < 6 else PAWN, 8*move.start_row + move.end_col)
+
+            if move.short_castle:
+                self._remove(piece - KING + ROOK, start + 1)
+                self._put(piece - KING + ROOK, start + 3)
+            elif move.long_castle:
+                self._remove(piece - KING + ROOK, start - 1)
+                self._put(piece - KING + ROOK, start - 4)
+    ##
+
+    def make_random_move(
+            self,
+            moves: List[Move] | None = None):
+
+        if not moves:
+            moves = self.get_valid_moves()
+
+        self.make_move(moves[r.randrange(len(moves))])
+    ##
+
+    '''CHECK DETECTION. All the pieces of colour `by` attacking the square `sq` given the occupancy `occ`. Pawn attackers are found by looking at the squares a pawn of the opposite colour would attack from `sq`'''
+    def attackers_to(self, sq: int, occ: int, by: int) -> int:
+        bb = self.bitboards
+        off = 6*by
+        return (
+            (PAWN_ATTACKS[by ^ 1][sq] & bb[off+PAWN])
+            | (KNIGHT_ATTACKS[sq] & bb[off+KNIGHT])
+            | (KING_ATTACKS[sq] & bb[off+KING])
+            | (rook_attacks(sq, occ) & (bb[off+ROOK] | bb[off+QUEEN]))
+            | (bishop_attacks(sq, occ) & (bb[off+BISHOP] | bb[off+QUEEN]))
+        )
+    ##
+
+    def king_square(self, colour: int) -> int:
+        return lsb(self.bitboards[6*colour + KING])
+    ##
+
+    def is_attacked(self, sq: int, by: int) -> bool:
+        return self.attackers_to(sq, self.occupancy[0] | self.occupancy[1], by) != 0
+    ##
+
+    ''' Get all the legal moves of the side to move.
+
+        Legality is handled up front with masks rather than by playing every move: `checkers` are the pieces giving check, `check_mask` the squares a non-king move must land on (the checker or the squares between it and the king), and `pins` maps every pinned piece to the ray it is allowed to move along. King moves are tested against the opponent attacks with the king removed from the occupancy, so that it cannot step back along a slider ray. En passant is the only move we verify by playing it, since it removes two pieces from the same rank.
+    '''
+    def get_valid_moves(self) -> List[Move]:
+        moves: List[Move] = []
+        us = WHITE if self.white_to_move else BLACK
+        them = us ^ 1
+        bb = self.bitboards
+        off, opp = 6*us, 6*them
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occ = own | enemy
+
+        king_sq = lsb(bb[off+KING])
+        king_square = divmod(king_sq, 8)
+        checkers = self.attackers_to(king_sq, occ, them)
+        self.in_check = checkers != 0
+
+        ### KING MOVES ###
+        occ_no_king = occ ^ (1 << king_sq)
+        for end in iter_bits(KING_ATTACKS[king_sq] & ~own):
+            if not self.attackers_to(end, occ_no_king, them):
+                moves.append(Move(king_square, divmod(end, 8), self))
+
+        if checkers & (checkers - 1): #double check, only the king can move
+            return self._update_status(moves)
+
+        check_mask = FULL
+        if checkers:
+            check_mask = checkers | BETWEEN[king_sq][lsb(checkers)]
+
+        ### PINS ###
+        pins: Dict[int, int] = {}
+        snipers = (ROOK_RAYS[king_sq] & (bb[opp+ROOK] | bb[opp+QUEEN])) | (BISHOP_RAYS[king_sq] & (bb[opp+BISHOP] | bb[opp+QUEEN]))
+        for sniper in iter_bits(snipers):
+            blockers = BETWEEN[king_sq][sniper] & occ
+            if blockers and not (blockers & (blockers - 1)) and (blockers & own):
+                pins[lsb(blockers)] = BETWEEN[king_sq][sniper] | (1 << sniper)
+
+        ### KNIGHTS AND SLIDERS ###
+        for piece, attacks in ((KNIGHT, None), (BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, None)):
+            for start in iter_bits(bb[off+piece]):
+                if piece == KNIGHT:
+                    targets = KNIGHT_ATTACKS[start]
+                elif piece == QUEEN:
+                    targets = rook_attacks(start, occ) | bishop_attacks(start, occ)
+                else:
+                    targets = attacks(start, occ)
+                targets &= ~own & check_mask & pins.get(start, FULL)
+                start_square = divmod(start, 8)
+                for end in iter_bits(targets):
+                    moves.append(Move(start_square, divmod(end, 8), self))
+
+        ### PAWNS ###
+        push = -8 if us == WHITE else 8
+        double_row = 6 if us == WHITE else 1
+        promotion_row = 0 if us == WHITE else 7
+        empty = ~occ
+        for start in iter_bits(bb[off+PAWN]):
+            allowed = check_mask & pins.get(start, FULL)
+            start_square = divmod(start, 8)
+            targets = PAWN_ATTACKS[us][start] & enemy
+            one = start + push
+            if (empty >> one) & 1:
+                targets |= 1 << one
+                if start // 8 == double_row and (empty >> (one + push)) & 1:
+                    targets |= 1 << (one + push)
+            for end in iter_bits(targets & allowed):
+                end_square = divmod(end, 8)
+                if end_square[0] == promotion_row:
+                    for kind in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append(Move(start_square, end_square, self, pawn_promotion=(True, PIECES[off+kind])))
+                else:
+                    moves.append(Move(start_square, end_square, self))
+
+            if self.en_passant_sq >= 0 and PAWN_ATTACKS[us][start] & (1 << self.en_passant_sq):
+                move = Move(start_square, divmod(self.en_passant_sq, 8), self, en_passant=True)
+                self.make_move(move)
+                legal = not self.attackers_to(king_sq, self.occupancy[0] | self.occupancy[1], them)
+                self.undo_move()
+                if legal:
+                    moves.append(move)
+
+        ### CASTLING ###
+        if not checkers:
+            home = 60 if us == WHITE else 4
+            short_right, long_right = (WHITE_SHORT, WHITE_LONG) if us == WHITE else (BLACK_SHORT, BLACK_LONG)
+            if (self.castling & short_right) and not (occ & (0b11 << (home+1))):
+                if not self.attackers_to(home+1, occ, them) and not self.attackers_to(home+2, occ, them):
+                    moves.append(Move(king_square, divmod(home+2, 8), self, short_castle=True))
+            if (self.castling & long_right) and not (occ & (0b111 << (home-3))):
+                if not self.attackers_to(home-1, occ, them) and not self.attackers_to(home-2, occ, them):
+                    moves.append(Move(king_square, divmod(home-2, 8), self, long_castle=True))
+
+        return self._update_status(moves)
+    ##
+
+    def _update_status(self, moves: List[Move]) -> List[Move]:
+        self.checkmate = len(moves) == 0 and self.in_check
+        self.stalemate = len(moves) == 0 and not self.in_check
+        return moves
+    ##
+
+    ###################
+    ## UTILS SECTION ##
+    ###################
+
+    @property
+    def white_king_pos(self) -> Tuple[int, int]:
+        return divmod(self.king_square(WHITE), 8)
+    ##
+
+    @property
+    def black_king_pos(self) -> Tuple[int, int]:
+        return divmod(self.king_square(BLACK), 8)
+    ##
+
+    def col(self) -> str:
+        return 'w' if self.white_to_move else 'b'
+    ##
+
+    def opp_col(self) -> str:
+        return 'b' if self.white_to_move else 'w'
+    ##
+##
+
+
+
+if __name__ == '__main__':
+    game = BitboardGameState()
+    print(len(game.get_valid_moves()))
+    for row in game.board:
+        print(row)
+##
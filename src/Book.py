@@ -0,0 +1,223 @@
+'''Opening book, in the binary layout of Polyglot books: a file of 16-byte entries sorted by position key, all big-endian,
+
+    key     8 bytes     position hash
+    move    2 bytes     to file, to row, from file, from row (3 bits each, row 0 being the first rank), promotion (0 none, 1 knight ... 4 queen)
+    weight  2 bytes     how good the move is, relative to the other moves of the position
+    learn   4 bytes     unused, always 0
+
+Castling is written as the king capturing its own rook (e1h1), as Polyglot does. Position keys are the Polyglot ones too (see polyglot_key), not the Zobrist keys of GameState: books built by other Polyglot tools can be probed here, and books built here can be read by them.
+
+The book is read through mmap: a lookup is a binary search over the mapped file, only the entries of the position are ever unpacked, and the book itself never enters the Python heap. Books are built from PGN collections:
+
+    python Book.py build games.pgn --out book.bin --plies 20
+    python Book.py probe book.bin --fen "<fen>"
+'''
+import argparse
+import mmap
+import os
+import random
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ChessEngine import GameState, Move, START_FEN, PAWN, KNIGHT, QUEEN, WHITE, BLACK, KIND_MASK
+from Tables import MAILBOX_SQUARES
+from Zobrist import POLYGLOT_RANDOM64, WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG
+from PGN import read_games, parse_san
+
+
+
+ENTRY = struct.Struct('>QHHI')
+MAX_WEIGHT: int = 0xFFFF
+BOOK_PLIES: int = 20 #positions deeper than this in a game are not added to the book
+RESULT_POINTS: Dict[str, Tuple[int, int]] = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)} #(white, black) points a move collects from the result of its game
+
+
+
+## KEYS ##
+
+'''Polyglot key of the position, computed from scratch (it is only needed once per book probe, or per ply while building). The en passant file only counts when a pawn of the side to move stands next to the pawn that just double-pushed, whether the capture is legal or not'''
+def polyglot_key(game: GameState) -> int:
+    mailbox = game.mailbox
+    key = 0
+    for sq, idx in enumerate(MAILBOX_SQUARES):
+        piece = mailbox[idx]
+        if piece:
+            row, col = divmod(sq, 8)
+            key ^= POLYGLOT_RANDOM64[64 * (2 * ((piece & KIND_MASK) - 1) + (1 if piece & WHITE else 0)) + 8 * (7 - row) + col]
+
+    rights = game.castling_rights()
+    for i, right in enumerate((WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG)):
+        if rights & right:
+            key ^= POLYGLOT_RANDOM64[768 + i]
+
+    ep_file = game.en_passant_file()
+    pawn = (WHITE if game.white_to_move else BLACK) | PAWN
+    if ep_file >= 0 and any(game.piece_at(*square) == pawn for square, _ in game.en_passant): #self.en_passant lists the squares a capturing pawn would stand on
+        key ^= POLYGLOT_RANDOM64[772 + ep_file]
+
+    if game.white_to_move:
+        key ^= POLYGLOT_RANDOM64[780]
+    return key
+##
+
+
+
+## MOVES ##
+
+'''Polyglot code of `move`. Our rows count from the 8th rank, Polyglot rows from the 1st'''
+def encode_book_move(move: Move) -> int:
+    start_row, start_col, end_row, end_col = move.start_row, move.start_col, move.end_row, move.end_col
+    if move.short_castle:
+        end_col = 7
+    elif move.long_castle:
+        end_col = 0
+    flag = move.code >> 12
+    promotion = flag - KNIGHT + 1 if KNIGHT <= flag <= QUEEN else 0
+    return end_col | (7 - end_row) << 3 | start_col << 6 | (7 - start_row) << 9 | promotion << 12
+##
+
+'''The valid move of `game` with the given Polyglot code, None if there is none (a foreign book, or a key collision)'''
+def decode_book_move(game: GameState, code: int, moves: Optional[List[Move]] = None) -> Optional[Move]:
+    for move in (moves if moves is not None else game.get_valid_moves()):
+        if encode_book_move(move) == code:
+            return move
+    return None
+##
+
+
+
+## READING ##
+
+class OpeningBook():
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None #empty files can not be mapped
+        self.entries: int = size // ENTRY.size
+    ##
+
+    '''(move code, weight) of every entry of the position `key`, found with a binary search for the first of them'''
+    def lookup(self, key: int) -> List[Tuple[int, int]]:
+        book, unpack = self._map, ENTRY.unpack_from
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if unpack(book, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        found: List[Tuple[int, int]] = []
+        while low < self.entries:
+            entry_key, code, weight, _ = unpack(book, low * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((code, weight))
+            low += 1
+        return found
+    ##
+
+    '''Book moves of `game` with their weights, best first'''
+    def moves(self, game: GameState) -> List[Tuple[Move, int]]:
+        entries = self.lookup(polyglot_key(game))
+        if not entries:
+            return []
+        valid = game.get_valid_moves()
+        found = [(decode_book_move(game, code, valid), weight) for code, weight in entries]
+        return sorted([(move, weight) for move, weight in found if move is not None], key=lambda entry: -entry[1])
+    ##
+
+    '''A book move for `game`, drawn at random with probability proportional to its weight (always the heaviest one if `best`), None when out of book'''
+    def pick(self, game: GameState, best: bool = False, rng: random.Random = random) -> Optional[Move]:
+        moves = self.moves(game)
+        if not moves:
+            return None
+        if best:
+            return moves[0][0]
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+    ##
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+    ##
+
+    def __enter__(self) -> 'OpeningBook':
+        return self
+    ##
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+    ##
+##
+
+
+
+## BUILDING ##
+
+'''Plays the first `plies` moves of every game of the PGN files, and collects the points of every (position, move) pair: 2 for a win of the side that played it, 1 for a draw. Games with an unknown result only count 1 per move, and games with illegal moves are cut there'''
+def collect_book_moves(pgn_paths: Iterable[str], plies: int = BOOK_PLIES) -> Dict[Tuple[int, int], int]:
+    points: Dict[Tuple[int, int], int] = {}
+    for path in pgn_paths:
+        for pgn_game in read_games(path):
+            white_points, black_points = RESULT_POINTS.get(pgn_game.result, (1, 1))
+            game = GameState(pgn_game.tags.get('FEN', START_FEN))
+            for san in pgn_game.moves[:plies]:
+                try:
+                    move = parse_san(game, san)
+                except ValueError:
+                    break
+                pair = (polyglot_key(game), encode_book_move(move))
+                points[pair] = points.get(pair, 0) + (white_points if game.white_to_move else black_points)
+                game.make_move(move)
+    return points
+##
+
+'''Writes the book file, entries sorted by key as the binary search expects. Moves below `min_weight` are dropped, and the weights of a position are scaled down together if they do not fit in 16 bits'''
+def write_book(points: Dict[Tuple[int, int], int], out_path: str, min_weight: int = 1) -> int:
+    by_key: Dict[int, List[Tuple[int, int]]] = {}
+    for (key, code), weight in points.items():
+        if weight >= min_weight:
+            by_key.setdefault(key, []).append((code, weight))
+
+    written = 0
+    with open(out_path, 'wb') as out:
+        for key in sorted(by_key):
+            entries = by_key[key]
+            top = max(weight for _, weight in entries)
+            scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+            for code, weight in sorted(entries, key=lambda entry: -entry[1]):
+                out.write(ENTRY.pack(key, code, max(1, int(weight * scale)), 0))
+                written += 1
+    return written
+##
+
+def build_book(pgn_paths: Iterable[str], out_path: str, plies: int = BOOK_PLIES, min_weight: int = 1) -> int:
+    return write_book(collect_book_moves(pgn_paths, plies), out_path, min_weight)
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an opening book from PGN files, or look a position up in one')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build')
+    build.add_argument('pgn', nargs='+')
+    build.add_argument('--out', default='book.bin')
+    build.add_argument('--plies', type=int, default=BOOK_PLIES)
+    build.add_argument('--min-weight', type=int, default=1)
+    probe = commands.add_parser('probe')
+    probe.add_argument('book')
+    probe.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f'{build_book(args.pgn, args.out, args.plies, args.min_weight)} entries written to {args.out}')
+    else:
+        with OpeningBook(args.book) as book:
+            for move, weight in book.moves(GameState(args.fen)):
+                print(f'{move.get_uci_notation()}  {weight}')
+##
@@ -1,11 +1,73 @@
 '''Here we store info and manage the status of game, determine valid mover, etc. This is basically the backend'''
 import numpy as np
 import random as r
-from typing import Union, Tuple, Dict, List, Callable, Optional, Any, Literal
+import struct
+from functools import wraps
+from typing import Tuple, Dict, List, Callable, Optional, Any, Literal
 
+from Zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS, WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG
+from Evaluation import MG_TABLE, EG_TABLE, PIECE_PHASE
+from Tables import DIRECTIONS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, RAY_TARGETS, KNIGHT_TARGETS, KING_TARGETS, MAILBOX_SQUARES, MAILBOX_TO_ROW_COL, MAILBOX_TO_SQUARE, SQUARE_TO_MAILBOX, mailbox_index
 
 
+
+'''PIECES ENCODING. Squares hold small integers instead of strings: the lowest 3 bits store the kind of the piece, bits 3 and 4 its colour. This way we can tell ally, enemy and empty squares apart with a single bitwise and, without slicing any string.'''
+EMPTY: int = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE: int = 8
+BLACK: int = 16
+OFFBOARD: int = 32 #sentinel filling the border of the mailbox, it is neither empty nor a piece of any colour
+KIND_MASK: int = 7
+
+PIECE_NAMES: Dict[int, str] = {EMPTY: '--'}
+PIECE_NAMES.update({colour | kind: col + name for colour, col in [(WHITE, 'w'), (BLACK, 'b')] for kind, name in zip(range(1,7), 'PNBRQK')})
+PIECE_CODES: Dict[str, int] = {v: k for k,v in PIECE_NAMES.items()}
+
+'''FEN letters of the pieces: uppercase for white, lowercase for black'''
+FEN_PIECES: Dict[str, int] = {(name if colour == WHITE else name.lower()): colour | kind for colour in (WHITE, BLACK) for kind, name in zip(range(1,7), 'PNBRQK')}
+FEN_LETTERS: Dict[int, str] = {v: k for k,v in FEN_PIECES.items()}
+START_FEN: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+'''Castling rights of the FEN castling field, with the squares (8*row + col, a8 being 0) their king and rook must stand on for the right to make sense'''
+FEN_CASTLING: Dict[str, Tuple[int, int]] = {'K': (60, 63), 'Q': (60, 56), 'k': (4, 7), 'q': (4, 0)}
+
+'''The board is a 10x12 mailbox: the 8x8 board sits in the middle of a 10 columns x 12 rows array whose border is filled with OFFBOARD. Walking off the board in any direction (knight jumps included) always lands on a sentinel, so we never need bounds checks. Square (row, col) of the 8x8 board lives at index 21 + 10*row + col, see Tables.py for the layout helpers and for the precomputed targets of every square.'''
+
+'''CHECK CONDITIONS. For every direction, the kinds of enemy pieces that give check from along it, stored as bitmasks of (1 << kind). Sliders attack from any distance, kings and pawns only from the adjacent square, pawns along two diagonals only, which depend on their colour.'''
+SLIDING_ATTACKERS: List[int] = [(1 << ROOK | 1 << QUEEN) if d in ROOK_DIRECTIONS else (1 << BISHOP | 1 << QUEEN) for d in range(8)]
+ADJACENT_ATTACKERS: Dict[int, List[int]] = {
+    BLACK: [SLIDING_ATTACKERS[d] | 1 << KING | (1 << PAWN if DIRECTIONS[d] in [(-1,-1), (-1,1)] else 0) for d in range(8)], #black pawns attack a white king from above
+    WHITE: [SLIDING_ATTACKERS[d] | 1 << KING | (1 << PAWN if DIRECTIONS[d] in [(1,-1), (1,1)] else 0) for d in range(8)],
+}
+
+'''MOVES ENCODING. A move is packed in a single 16-bit integer: start square (bits 0-5) and end square (bits 6-11), both as 8*row + col, plus a 4-bit flag (bits 12-15). The flag of a promotion is the kind of the new piece, so that all flags fit together:
+        0 normal move, 1 en passant, 2-5 promotion to KNIGHT, BISHOP, ROOK, QUEEN, 6 short castle, 7 long castle
+'''
+NORMAL_MOVE, EN_PASSANT_MOVE, SHORT_CASTLE_MOVE, LONG_CASTLE_MOVE = 0, 1, 6, 7
+
+'''GENERATION STAGES. Move generators can be asked for a part of the moves only: NOISY_MOVES are captures (en passant included) and promotions, QUIET_MOVES everything else (castling included). Search picks moves stage by stage, and often never needs the quiet ones.'''
+NOISY_MOVES, QUIET_MOVES = 1, 2
+ALL_MOVES: int = NOISY_MOVES | QUIET_MOVES
+
+'''UNDO STATE. make_move pushes on GameState.state_log everything a move changes that can not be played backwards, as one tuple, and undo_move pops it back at once: undoing only puts the pieces back on their squares, nothing is recomputed. The tuple holds, in this order:
+    zobrist_key, mg_score, eg_score, phase, white_long_castle, white_short_castle, black_long_castle, black_short_castle, en_passant, halfmove_clock, piece_captured
+Castling counters only change when a king moves, or when something leaves or lands on one of the rook corners below.'''
+CASTLING_CORNERS: Tuple[int, ...] = (56, 63, 0, 7) #a8 is 0, h1 is 63 (see MOVES ENCODING)
+
+'''SNAPSHOTS. GameState.pack writes a position as a fixed-size bytes buffer, to ship it to other processes or keep it aside, and GameState.unpack sets it back up without parsing anything or computing anything from scratch:
+    64 bytes of pieces (square 8*row + col), side to move and castling rights (bit 0 white to move, bits 1-4 the rights of castling_rights), en passant file (-1 none), halfmove clock, fullmove number, Zobrist key, mg_score, eg_score, phase
+The history (move_log, state_log) is left out: an unpacked game can not undo the moves that led to it.'''
+SNAPSHOT = struct.Struct('<64sBbHHQiiB')
+
+'''Promotion flags, as tried by get_pawn_moves. The queen comes first: moves entered on the board only know their squares, and are matched against the first valid move with the same squares'''
+PROMOTIONS: List[int] = [QUEEN, ROOK, BISHOP, KNIGHT]
+NO_PROMOTION: List[int] = [NORMAL_MOVE]
+
+
+
+'''A move only stores its packed code (see MOVES ENCODING above). Everything else is derived from it on demand, the pieces involved included: they are read from the board the first time they are asked for, and cached from then on. make_move asks for them before touching the board, so a move that has been played always knows what it moved and what it captured, and drops its reference to the game.'''
 class Move():
+    __slots__ = ('code', '_game', '_piece_moved', '_piece_captured')
     
     #fixed dicts to use when translating moves in standard chess notation
     RANKS_TO_ROWS: Dict[str, int] = {f'{i}': 8-i for i in range(1,9)}
@@ -21,21 +83,115 @@ class Move():
             en_passant: Optional[bool] = False, 
             short_castle: Optional[bool] = False, 
             long_castle: Optional[bool] = False, 
-            pawn_promotion: Tuple[bool, str] = (False, '--')
+            pawn_promotion: Tuple[bool, int] = (False, EMPTY)
     ) -> None:
 
-        self.start_row = start_square[0]
-        self.start_col = start_square[1]
-        self.end_row = end_square[0]
-        self.end_col = end_square[1]
-        self.piece_moved = game.board[self.start_row, self.start_col]
-        self.piece_captured = game.board[self.end_row, self.end_col]
-        self.move_id = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col #ID creation like this basically means we only rely on moving from place A to place B, seems silly because we would likely like to record also which piece actually moves, but this is done by other pieces of code, and depend from time to time so there is no need to record such info.
+        if en_passant: flag = EN_PASSANT_MOVE
+        elif short_castle: flag = SHORT_CASTLE_MOVE
+        elif long_castle: flag = LONG_CASTLE_MOVE
+        elif pawn_promotion[0]: flag = pawn_promotion[1] & KIND_MASK
+        else: flag = NORMAL_MOVE
+
+        self.code: int = (8*start_square[0] + start_square[1]) | ((8*end_square[0] + end_square[1]) << 6) | (flag << 12)
+        self._game = game
+        self._piece_moved: int = -1 #not looked up yet
+        self._piece_captured: int = -1
+    ##
+
+    '''Fast constructor used by the move generators, straight from the packed code'''
+    @classmethod
+    def from_code(cls, code: int, game) -> 'Move':
+        move = cls.__new__(cls)
+        move.code = code
+        move._game = game
+        move._piece_moved = -1
+        move._piece_captured = -1
+        return move
+    ##
+
+    def _look_up_pieces(self) -> None:
+        game = self._game
+        self._piece_moved = game.piece_at(*divmod(self.code & 63, 8))
+        self._piece_captured = game.piece_at(*divmod((self.code >> 6) & 63, 8))
+        self._game = None
+    ##
+
+    @property
+    def piece_moved(self) -> int:
+        if self._piece_moved < 0: self._look_up_pieces()
+        return self._piece_moved
+    ##
+
+    @property
+    def piece_captured(self) -> int:
+        if self._piece_captured < 0: self._look_up_pieces()
+        return self._piece_captured
+    ##
+
+    ## SQUARES AND FLAGS, DECODED FROM THE PACKED CODE ##
+    @property
+    def start_sq(self) -> int:
+        return self.code & 63
+    ##
+
+    @property
+    def end_sq(self) -> int:
+        return (self.code >> 6) & 63
+    ##
+
+    @property
+    def start_row(self) -> int:
+        return (self.code >> 3) & 7
+    ##
+
+    @property
+    def start_col(self) -> int:
+        return self.code & 7
+    ##
+
+    @property
+    def end_row(self) -> int:
+        return (self.code >> 9) & 7
+    ##
+
+    @property
+    def end_col(self) -> int:
+        return (self.code >> 6) & 7
+    ##
+
+    @property
+    def flag(self) -> int:
+        return self.code >> 12
+    ##
+
+    @property
+    def en_passant(self) -> bool:
+        return self.code >> 12 == EN_PASSANT_MOVE
+    ##
+
+    @property
+    def short_castle(self) -> bool:
+        return self.code >> 12 == SHORT_CASTLE_MOVE
+    ##
+
+    @property
+    def long_castle(self) -> bool:
+        return self.code >> 12 == LONG_CASTLE_MOVE
+    ##
+
+    '''Start and end squares only: two moves sharing the same id differ at most by the promotion piece'''
+    @property
+    def move_id(self) -> int:
+        return self.code & 0xFFF
+    ##
 
-        self.en_passant = en_passant
-        self.short_castle = short_castle
-        self.long_castle = long_castle
-        self.pawn_promotion = pawn_promotion
+    '''(is_promotion, new piece with its colour), as the rest of the engine expects it'''
+    @property
+    def pawn_promotion(self) -> Tuple[bool, int]:
+        flag = self.code >> 12
+        if KNIGHT <= flag <= QUEEN:
+            return (True, (self.piece_moved & (WHITE | BLACK)) | flag)
+        return (False, EMPTY)
     ##
 
     def __repr__(self) -> str:
@@ -55,13 +211,24 @@ class Move():
         return self.COLS_TO_FILES[c] + self.ROWS_TO_RANKS[r]
     ##
 
-    '''Overriding the == operator for Moves, important to check whether two moves can be considered the same (we just check for equality in the hashed ID created)'''
+    '''Coordinate notation as used by UCI and perft divide tools: start and end squares, plus the promotion piece in lowercase (castling is written as a king move)'''
+    def get_uci_notation(self) -> str:
+        flag = self.code >> 12
+        promotion = 'nbrq'[flag - KNIGHT] if KNIGHT <= flag <= QUEEN else ''
+        return self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col) + promotion
+    ##
+
+    '''Overriding the == operator for Moves: two moves are the same when their packed codes are, promotion piece and special flags included. Hashing the code keeps moves usable as dict keys and set members'''
     def __eq__(self, other):
         if isinstance(other, Move):
-            return self.move_id == other.move_id
+            return self.code == other.code
         else: 
             raise TypeError(f"Unable two compare {type(self)} and {type(other)}")
     ##
+
+    def __hash__(self) -> int:
+        return self.code
+    ##
 ##
 
 
@@ -75,13 +242,13 @@ class Move():
 
         Regarding the 'direction' storing, it may seem intuitive for some kind of pieces, specifically everything but the knights. In reality, inside the moves direction everything we handle this in a very general way that eases a lot the process of the filtering stage inside this wrapper
 '''
-def clean_pinned_moves(func: Callable) -> Callable[[Any, int, int], List[Move]]: #OBSERVE: Any is used just to avoid typing errors, it refers to a GameState object. Same below
+def clean_pinned_moves(func: Callable) -> Callable[[Any, int, int, int], List[Move]]: #OBSERVE: Any is used just to avoid typing errors, it refers to a GameState object. Same below
     
-    def wrapper(self: Any, *args: *Tuple[int, int]) -> List[Move]:
+    @wraps(func) #keeps the name of the wrapped method, so that bound methods, and GameState with them, can be pickled
+    def wrapper(self: Any, r: int, c: int, stage: int = ALL_MOVES) -> List[Move]:
 
         moves: List[Move] = []
-        r,c = args #we unwrap just to handle things better
-        all_moves: List[Tuple[Move, Tuple[int, int]]] = func(self,r,c)
+        all_moves: List[Tuple[Move, Tuple[int, int]]] = func(self,r,c,stage)
 
         #TODO: reformat self.pins as a dict to have an easier hashing time'''
 
@@ -90,7 +257,8 @@ def clean_pinned_moves(func: Callable) -> Callable[[Any, int, int], List[Move]]:
 
         # Could be written as list comprehension but that format is less readable
         if ((r,c) in pins.keys()): #if the piece is pinned
-            moves = [move for move, dir in all_moves if (pins[(move.start_row, move.start_col)] == dir) or pins[(move.start_row, move.start_col)] == (-dir[0], -dir[1])] #we filter
+            pin_dir = pins[(r,c)] #every move comes from the piece at (r,c)
+            moves = [move for move, dir in all_moves if (pin_dir == dir) or pin_dir == (-dir[0], -dir[1])] #we filter
         else: 
             moves = [move for move, _ in all_moves]  #else nothing to filter, just a little refactoring
         return moves
@@ -102,168 +270,257 @@ def clean_pinned_moves(func: Callable) -> Callable[[Any, int, int], List[Move]]:
 
 
 class GameState():
-    def __init__(self):
+    def __init__(self, fen: str = START_FEN):
 
         '''
-        We save our board as a list-of-list: nested strings np.ndarray([], dtype=str) to store data. First order data are chessboard rows, so that we access those with self.board[i]. For pieces, first token represents the player, second one represent their class. Also, we use '--' to represent an empty space in the board
+        We save our board as a 10x12 mailbox: a flat list of 120 small integers (see PIECES ENCODING at the top of the file), where the actual 8x8 board is surrounded by OFFBOARD sentinels. Square (row, col) lives at self.mailbox[mailbox_index(row, col)], and self.piece_at(row, col) is the way to read it.
+
+        The old representation, nested strings np.ndarray([], dtype=str) with first token representing the player, second one the class of the piece and '--' for empty spaces, is still available through the self.board property. It is only a conversion layer for the graphical side, rebuilt at every access, and it is read-only: a position is set up from FEN, which also sets the Zobrist key, the evaluation terms and the history that go with it.
+
+        The position itself, start position included, is always set up from a FEN string (see _set_fen at the end of __init__), which writes the mailbox directly.
         '''
 
-        self.board = np.array([
-            np.array(["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"], dtype=str),
-            np.array(['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'], dtype=str),
-            np.array(['--', '--', '--', '--', '--', '--', '--', '--'], dtype=str),
-            np.array(['--', '--', '--', '--', '--', '--', '--', '--'], dtype=str),
-            np.array(['--', '--', '--', '--', '--', '--', '--', '--'], dtype=str),
-            np.array(['--', '--', '--', '--', '--', '--', '--', '--'], dtype=str),
-            np.array(['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'], dtype=str),
-            np.array(['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR'], dtype=str)
-        ])
+        self.mailbox: List[int] = [OFFBOARD] * 120
+        self.white_king_pos: Tuple[int, int] = (7,4) #we store as Tuple[int, int] so that it is coherent within Moves construction
+        self.black_king_pos: Tuple[int, int] = (0,4)
 
         self.white_to_move: bool = True
         self.move_log: List[Move] = []
-        self.white_king_pos: Tuple[int, int] = (7,4) #we store as Tuple[int, int] so that it is coherent within Moves construction
-        self.black_king_pos: Tuple[int, int] = (0,4)
         self.checkmate = False
         self.stalemate = False
         self.in_check = False #store whether one of the player is in check
         self.pins = [] #store pinned pieces
         self.checks = [] #store check squares
+        self.attacked: List[bool] = [False] * 120 #squares attacked by the opponent, indexed as the mailbox (see get_attacked_squares)
 
-        self.MOVES_FUNCTIONS: Dict[str, Callable] = {
-            'P': self.get_pawn_moves,
-            'R': self.get_rook_moves,
-            'B': self.get_bishop_moves,
-            'N': self.get_knight_moves,
-            'Q': self.get_queen_moves,
-            'K': self.get_king_moves,
-        }
+        self.MOVES_FUNCTIONS: Dict[int, Callable] = self._moves_functions()
 
         self.en_passant: List[List[Tuple[int, int]]] = []         #this is used to store the (eventual) squares that are allowed to catch en Passant.
 
-        self._WHITE_ROOKS_SPOTS = {(7,0): 'long', (7,7): 'short'}
-        self._BLACK_ROOKS_SPOTS = {(0,0): 'long', (0,7): 'short'}
         self.white_long_castle = 0   #these will serve as flags for castling opportunities. They vanish whether the specific rook moves, or the king.
         self.white_short_castle = 0
         self.black_long_castle = 0
         self.black_short_castle = 0
+
+        self.halfmove_clock: int = 0 #plies since the last capture or pawn move, for the fifty-move rule
+        self.fullmove_number: int = 1 #starts at 1, and grows after every black move
+        self.state_log: List[Tuple] = [] #irreversible state before each move of move_log, see UNDO STATE at the top of the file
+
+        self.zobrist_key: int = 0 #64-bit position identity, kept up to date incrementally by make_move/undo_move
+        self.mg_score, self.eg_score, self.phase = 0, 0, 0 #running totals of the evaluation (see Evaluation.py), kept up to date the same way
+        self._set_fen(fen)
+    ##
+
+    '''A new game set up from a FEN string, same as GameState(fen)'''
+    @classmethod
+    def from_fen(cls, fen: str) -> 'GameState':
+        return cls(fen)
+    ##
+
+    '''CONVERSION LAYER between the mailbox and the strings board. Reading self.board allocates a brand new np.ndarray, so it must be kept out of any hot loop (use self.piece_at instead)'''
+    @property
+    def board(self) -> np.ndarray:
+        return np.array([PIECE_NAMES[self.mailbox[idx]] for idx in MAILBOX_SQUARES], dtype=str).reshape((8,8))
+    ##
+
+    def piece_at(self, row: int, col: int) -> int:
+        return self.mailbox[21 + 10*row + col]
     ##
 
-    '''Copying the object by allocating new memory (these are separate objects)'''
-    def __deepcopy__(self):
-        g: GameState = GameState()
-        for name, value in self.__dict__.items():
-            g.__setattr__(name, value)
+    '''Move generators by kind of piece, bound to this game'''
+    def _moves_functions(self) -> Dict[int, Callable]:
+        return {
+            PAWN: self.get_pawn_moves,
+            ROOK: self.get_rook_moves,
+            BISHOP: self.get_bishop_moves,
+            KNIGHT: self.get_knight_moves,
+            QUEEN: self.get_queen_moves,
+            KING: self.get_king_moves,
+        }
+    ##
+
+    '''Independent copy of the game, history included, so that it can branch off on its own line. It skips __init__: attributes are copied over, and only the lists the game changes in place get new ones (played moves never change, they are shared)'''
+    def copy(self) -> 'GameState':
+        g: GameState = type(self).__new__(type(self))
+        g.__dict__.update(self.__dict__)
+        g.mailbox = self.mailbox[:]
+        g.move_log = self.move_log[:]
+        g.state_log = self.state_log[:]
+        g.en_passant = self.en_passant[:]
+        g.pins, g.checks, g.attacked = self.pins[:], self.checks[:], self.attacked[:]
+        g.MOVES_FUNCTIONS = g._moves_functions()
+        return g
+    ##
+
+    def __copy__(self) -> 'GameState':
+        return self.copy()
+    ##
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'GameState':
+        return self.copy()
+    ##
+
+    '''The position as a bytes buffer of SNAPSHOT.size bytes, see SNAPSHOTS at the top of the file'''
+    def pack(self) -> bytes:
+        flags = int(self.white_to_move) | self.castling_rights() << 1
+        pieces = bytes(self.mailbox[idx] for idx in MAILBOX_SQUARES)
+        return SNAPSHOT.pack(pieces, flags, self.en_passant_file(), self.halfmove_clock, self.fullmove_number, self.zobrist_key, self.mg_score, self.eg_score, self.phase)
+    ##
+
+    '''A game in the position packed by GameState.pack, with no history'''
+    @classmethod
+    def unpack(cls, data: bytes) -> 'GameState':
+        pieces, flags, ep_file, halfmove_clock, fullmove_number, key, mg, eg, phase = SNAPSHOT.unpack(data)
+        g: GameState = cls.__new__(cls)
+
+        mailbox = [OFFBOARD] * 120
+        for idx, piece in zip(MAILBOX_SQUARES, pieces):
+            mailbox[idx] = piece
+        g.mailbox = mailbox
+        g.white_king_pos = divmod(pieces.index(WHITE | KING), 8)
+        g.black_king_pos = divmod(pieces.index(BLACK | KING), 8)
+
+        g.white_to_move = bool(flags & 1)
+        rights = flags >> 1
+        g.white_short_castle = int(not rights & WHITE_SHORT)
+        g.white_long_castle = int(not rights & WHITE_LONG)
+        g.black_short_castle = int(not rights & BLACK_SHORT)
+        g.black_long_castle = int(not rights & BLACK_LONG)
+        g._set_en_passant_file(ep_file)
+        g.halfmove_clock, g.fullmove_number = halfmove_clock, fullmove_number
+        g.zobrist_key, g.mg_score, g.eg_score, g.phase = key, mg, eg, phase
+
+        g.move_log, g.state_log = [], []
+        g.checkmate = g.stalemate = g.in_check = False
+        g.pins, g.checks = [], []
+        g.attacked = [False] * 120
+        g.MOVES_FUNCTIONS = g._moves_functions()
         return g
     ##
 
     def make_move(self, move: Move) -> None:
         '''We assume the move is always valid. Further on, we will generate a snippet that only generates valid moves. Also, this currently does not work for special cases like en-passant, castling, or pawn promotion'''
-        self.board[move.start_row, move.start_col] = '--'
-        self.board[move.end_row, move.end_col] = move.piece_moved
+        mailbox = self.mailbox
+        piece_moved, piece_captured = move.piece_moved, move.piece_captured #the move looks them up lazily, this must happen before the board changes
+        start_sq, end_sq = move.start_sq, move.end_sq
+        mailbox[SQUARE_TO_MAILBOX[start_sq]] = EMPTY
+        mailbox[SQUARE_TO_MAILBOX[end_sq]] = piece_moved
         
         self.move_log.append(move)
+        self.state_log.append((self.zobrist_key, self.mg_score, self.eg_score, self.phase, self.white_long_castle, self.white_short_castle, self.black_long_castle, self.black_short_castle, self.en_passant, self.halfmove_clock, piece_captured))
+        self.halfmove_clock = 0 if piece_moved & KIND_MASK == PAWN or piece_captured != EMPTY else self.halfmove_clock + 1
+        if not self.white_to_move:
+            self.fullmove_number += 1
+
+        #hash: we toggle out everything the move is about to change (castling rights and en passant file included), and toggle the new state back in at the end
+        key = self.zobrist_key ^ PIECE_KEYS[piece_moved][start_sq] ^ PIECE_KEYS[piece_captured][end_sq] ^ self._castling_and_en_passant_key()
+        #evaluation terms: same idea, pieces leaving a square are taken out, pieces landing on one are added (see the end of the method)
+        mg = self.mg_score - MG_TABLE[piece_moved][start_sq] - MG_TABLE[piece_captured][end_sq]
+        eg = self.eg_score - EG_TABLE[piece_moved][start_sq] - EG_TABLE[piece_captured][end_sq]
+        self.phase -= PIECE_PHASE[piece_captured]
 
         #update king position(s) if needed
-        if move.piece_moved == 'wK':
+        if piece_moved == WHITE | KING:
             self.white_king_pos = (move.end_row, move.end_col)
             self.white_long_castle += 1 #useful for castling
             self.white_short_castle += 1
-        elif move.piece_moved == 'bK':
+        elif piece_moved == BLACK | KING:
             self.black_king_pos = (move.end_row, move.end_col)
             self.black_long_castle += 1
             self.black_short_castle += 1
 
-        ### EN PASSANT LOGIC ###
+        ### EN PASSANT LOGIC ###
         #check if en-passant is possible next turn?
-        (col, i) = ('w', 1) if self.white_to_move else ('b', -1)
-        if move.piece_moved == (f'{col}P') and (abs(move.end_row-move.start_row) == 2): 
+        (col, i) = (WHITE, 1) if self.white_to_move else (BLACK, -1)
+        if piece_moved == (col | PAWN) and (abs(end_sq - start_sq) == 16): 
             self.en_passant = [[(move.end_row, move.end_col+j), (i,-j)] for j in [-1,1] if 0 <= move.end_col+j <= 7]
         else:
             self.en_passant = []
 
         if move.en_passant:
-            self.board[move.start_row, move.end_col] = '--'
+            mailbox[21 + 10*move.start_row + move.end_col] = EMPTY
+            captured_sq = 8*move.start_row + move.end_col
+            key ^= PIECE_KEYS[(WHITE if col == BLACK else BLACK) | PAWN][captured_sq]
+            mg -= MG_TABLE[(WHITE if col == BLACK else BLACK) | PAWN][captured_sq]
+            eg -= EG_TABLE[(WHITE if col == BLACK else BLACK) | PAWN][captured_sq]
                         
         ### CASTLING LOGIC ###
-        for i,j in [(move.start_row, move.start_col), (move.end_row, move.end_col)]:
-            if (i,j) in self._WHITE_ROOKS_SPOTS.keys():
-                param = f'white_{self._WHITE_ROOKS_SPOTS[(i,j)]}_castle'
-                self.__setattr__(param, self.__getattribute__(param)+1)
-            elif (i,j) in self._BLACK_ROOKS_SPOTS.keys():
-                param = f'black_{self._BLACK_ROOKS_SPOTS[(i,j)]}_castle'
-                self.__setattr__(param, self.__getattribute__(param)+1)
+        #a rook leaving its corner, or being captured there, ends castling on its side
+        if start_sq in CASTLING_CORNERS or end_sq in CASTLING_CORNERS:
+            for sq in (start_sq, end_sq):
+                if sq == 56: self.white_long_castle += 1
+                elif sq == 63: self.white_short_castle += 1
+                elif sq == 0: self.black_long_castle += 1
+                elif sq == 7: self.black_short_castle += 1
 
         if move.long_castle:
             rook_row = 7 if self.white_to_move else 0
-            self.board[rook_row, 0] = '--'
-            self.board[rook_row, 3] = f'{col}R'
+            key ^= PIECE_KEYS[mailbox[mailbox_index(rook_row, 0)]][8*rook_row] ^ PIECE_KEYS[mailbox[mailbox_index(rook_row, 3)]][8*rook_row + 3] ^ PIECE_KEYS[col | ROOK][8*rook_row + 3] #we hash what is actually on the board rather than assuming where the rook is
+            mailbox[mailbox_index(rook_row, 0)] = EMPTY
+            mailbox[mailbox_index(rook_row, 3)] = col | ROOK
+            mg += MG_TABLE[col | ROOK][8*rook_row + 3] - MG_TABLE[col | ROOK][8*rook_row]
+            eg += EG_TABLE[col | ROOK][8*rook_row + 3] - EG_TABLE[col | ROOK][8*rook_row]
             #full_col = 'white' if self.white_to_move else 'black'
             #self.__setattr__(f'{full_col}_long_castle', self.__getattribute__(f'{full_col}_long_castle')+1) #maybe this is reduntant because castling is already considered a king move
         elif move.short_castle:
             rook_row = 7 if self.white_to_move else 0
-            self.board[rook_row, 7] = '--'
-            self.board[rook_row, 5] = f'{col}R'
+            key ^= PIECE_KEYS[mailbox[mailbox_index(rook_row, 7)]][8*rook_row + 7] ^ PIECE_KEYS[mailbox[mailbox_index(rook_row, 5)]][8*rook_row + 5] ^ PIECE_KEYS[col | ROOK][8*rook_row + 5]
+            mailbox[mailbox_index(rook_row, 7)] = EMPTY
+            mailbox[mailbox_index(rook_row, 5)] = col | ROOK
+            mg += MG_TABLE[col | ROOK][8*rook_row + 5] - MG_TABLE[col | ROOK][8*rook_row + 7]
+            eg += EG_TABLE[col | ROOK][8*rook_row + 5] - EG_TABLE[col | ROOK][8*rook_row + 7]
             #full_col = 'white' if self.white_to_move else 'black'
             #self.__setattr__(f'{full_col}_long_castle', self.__getattribute__(f'{full_col}_short_castle')+1)
 
         ## PROMOTION LOGIC ##
-        if move.pawn_promotion[0]:
-            self.board[move.end_row, move.end_col] = move.pawn_promotion[1]
+        flag = move.code >> 12
+        placed = col | flag if KNIGHT <= flag <= QUEEN else piece_moved
+        mailbox[SQUARE_TO_MAILBOX[end_sq]] = placed
+        key ^= PIECE_KEYS[placed][end_sq]
+        self.mg_score = mg + MG_TABLE[placed][end_sq]
+        self.eg_score = eg + EG_TABLE[placed][end_sq]
+        self.phase += PIECE_PHASE[placed] - PIECE_PHASE[piece_moved]
 
         #last operation to do is to pass the turn to the other player
         self.white_to_move = not self.white_to_move 
+        self.zobrist_key = key ^ SIDE_KEY ^ self._castling_and_en_passant_key()
     ##
 
     def undo_move(self) -> None:
-        '''We take the last move done and simply undo, or reverse that. We are not interested in making the method general since undoing a move only make sense if we previously have done that'''
+        '''We take the last move done and simply undo, or reverse that. We are not interested in making the method general since undoing a move only make sense if we previously have done that. Everything but the pieces comes back from state_log as it was, so nothing is recomputed'''
         if len(self.move_log) > 0:  #ensure there actually is a move to undo
             move: Move = self.move_log.pop()
-            self.board[move.start_row, move.start_col] = move.piece_moved
-            self.board[move.end_row, move.end_col] = move.piece_captured
-
-            if move.piece_moved == 'wK':
+            mailbox = self.mailbox
+            (self.zobrist_key, self.mg_score, self.eg_score, self.phase,
+             self.white_long_castle, self.white_short_castle, self.black_long_castle, self.black_short_castle,
+             self.en_passant, self.halfmove_clock, piece_captured) = self.state_log.pop()
+            if self.white_to_move: #black played the move we are undoing
+                self.fullmove_number -= 1
+
+            piece_moved = move.piece_moved
+            mailbox[SQUARE_TO_MAILBOX[move.start_sq]] = piece_moved
+            mailbox[SQUARE_TO_MAILBOX[move.end_sq]] = piece_captured
+
+            if piece_moved == WHITE | KING:
                 self.white_king_pos = (move.start_row, move.start_col)
-                self.white_long_castle -= 1 #useful for castling
-                self.white_short_castle -= 1
-            elif move.piece_moved == 'bK':
+            elif piece_moved == BLACK | KING:
                 self.black_king_pos = (move.start_row, move.start_col)
-                self.black_long_castle -=1
-                self.black_short_castle -=1
 
             ### EN PASSANT LOGIC ###
-            (col, opp_col, i) = ('w', 'b', -1) if self.white_to_move else ('b', 'w', 1) 
+            (col, opp_col) = (WHITE, BLACK) if self.white_to_move else (BLACK, WHITE)
             if move.en_passant:
-                self.en_passant = [[(move.end_row+i, move.end_col+j), (-i,-j)] for j in [-1,1] if 0<=move.end_col+j<=7]
-                self.board[move.start_row, move.end_col] = col+'P'
-
-            try:
-                prev_move = self.move_log[-1] #we check for prev move to understand if we have to restore some en-passant rights
-                if prev_move.piece_moved == (opp_col+'P') and (abs(prev_move.end_row - prev_move.start_row) == 2): 
-                    self.en_passant = [[(prev_move.end_row, prev_move.end_col+j), (i,-j)] for j in [-1,1] if 0 <= prev_move.end_col+j <= 7]
-                else: self.en_passant = []
-            
-            except IndexError: #this handles the case in which we undo the very first move of the game
-                pass
-
+                mailbox[21 + 10*move.start_row + move.end_col] = col | PAWN
 
             ### CASTLING LOGIC ###
-            for i,j in [(move.start_row, move.start_col), (move.end_row, move.end_col)]:
-                if (i,j) in self._WHITE_ROOKS_SPOTS.keys():
-                    param = f'white_{self._WHITE_ROOKS_SPOTS[(i,j)]}_castle'
-                    self.__setattr__(param, self.__getattribute__(param)-1)
-                elif (i,j) in self._BLACK_ROOKS_SPOTS.keys():
-                    param = f'black_{self._BLACK_ROOKS_SPOTS[(i,j)]}_castle'
-                    self.__setattr__(param, self.__getattribute__(param)-1)
-
             if move.long_castle:
                 rook_row = 0 if self.white_to_move else 7
-                self.board[rook_row, 3] = '--'
-                self.board[rook_row, 0] = f'{opp_col}R'
+                mailbox[mailbox_index(rook_row, 3)] = EMPTY
+                mailbox[mailbox_index(rook_row, 0)] = opp_col | ROOK
             elif move.short_castle:
                 rook_row = 0 if self.white_to_move else 7
-                self.board[rook_row, 5] = '--'
-                self.board[rook_row, 7] = f'{opp_col}R'
-                
+                mailbox[mailbox_index(rook_row, 5)] = EMPTY
+                mailbox[mailbox_index(rook_row, 7)] = opp_col | ROOK
+
             #return the move to the previous player
             self.white_to_move = not self.white_to_move
     ##
@@ -283,129 +540,118 @@ class GameState():
 
     def check_for_pins_and_checks(self) -> Tuple[bool, List[Tuple[int, int, int, int]], List[List[Tuple[int,int]]]]: 
         in_check = False; pins = []; checks = []
+        mailbox = self.mailbox
 
         #check for initial king's and general PAWNS_CONDITIONS: initialization
         if self.white_to_move:
-            start_row = self.white_king_pos[0]
-            start_col = self.white_king_pos[1]
+            start_row, start_col = self.white_king_pos
+            ally, enemy = WHITE, BLACK
         else:
-            start_row = self.black_king_pos[0]
-            start_col = self.black_king_pos[1]
-
-        #utilities needed in the loop afterward
-        potential_pin = ()
-        directions: List[Tuple[int, int]] = [(i,j) for i in [-1,0,1] for j in [-1,0,1]]
-        directions.remove((0,0))
-        
-        #these consts are used to access check conditions in an easier way
-        CONDITIONS: Dict[str, Callable] = {
-            'R': lambda i,j,k: (i,j) in [(-1,0), (0,-1), (1,0), (0,1)],
-            'B': lambda i,j,k: (i,j) in [(-1,-1), (-1,1), (1,-1), (1,1)],
-            'Q': lambda i,j,k: True,
-            'K': lambda i,j,k: k==1,
-            'P': lambda i,j,k: all([k==1, (i,j) in [(-1,-1), (-1,1)]]) if self.opp_col() == 'b' else all([k==1, (i,j) in [(1,1), (1,-1)]]),
-            'N': lambda i,j,k: False
-        }
+            start_row, start_col = self.black_king_pos
+            ally, enemy = BLACK, WHITE
+        king_sq = 8*start_row + start_col
+        adjacent_attackers = ADJACENT_ATTACKERS[enemy] #see CHECK CONDITIONS at the top of the file
 
         ### CHECKS/PINS OF ANY KIND EXCEPT FOR THE KNIGHT ONES ###
-        for i,j in directions:
+        for d, (i,j) in enumerate(DIRECTIONS):
 
             potential_pin = () #cache
             current_dir_cells: List[Tuple[int, int]] = [] #cache
+            attackers = adjacent_attackers[d] #kinds of pieces giving check from the first square along the ray
 
-            for k in range(1,8): #we move along one of the possible directions, by max 8 places (I think this could be changed)
-                end_row = start_row + k*i
-                end_col = start_col + k*j
-
-                if all([0<=end_row<=7, 0<=end_col<=7]): #ensure the square is valid
-                    current_dir_cells.append((end_row, end_col))
-                    end_piece = self.board[end_row, end_col]
+            for idx, (end_row, end_col) in RAY_TARGETS[d][king_sq]: #the precomputed ray stops at the edge of the board
+                current_dir_cells.append((end_row, end_col))
+                end_piece = mailbox[idx]
 
-                    if end_piece[0] == self.col(): #if we find an ally piece, we look behind it to check for eventual pins
-                        if potential_pin == ():
-                            potential_pin = (end_row, end_col, i,j)
-                        else: #we found another ally piece along the direction, so we have no pin in that direction
-                            break #hence the break of the for cycle
+                if end_piece & ally: #if we find an ally piece, we look behind it to check for eventual pins
+                    if potential_pin == ():
+                        potential_pin = (end_row, end_col, i,j)
+                    else: #we found another ally piece along the direction, so we have no pin in that direction
+                        break #hence the break of the for cycle
+                
+                elif end_piece & enemy: #if we find a piece of the opponent, we investigate
+                    if attackers & (1 << (end_piece & KIND_MASK)): #we look if the check can indeed attack our king
+                        if potential_pin == (): #if it is the first piece along the direction, it is indeed a check
+                            in_check = True
+                            checks.append(current_dir_cells)
+
+                        else: #if we have a piece that blocked it, that is indeed pinned
+                            pins.append(potential_pin)
                     
-                    elif end_piece[0] == self.opp_col(): #if we find a piece of the opponent, we investigate
-
-                        opp_piece_type = end_piece[1] #we store the piece type
-                        if CONDITIONS[opp_piece_type](i,j,k): #we look if the check can indeed attack our king
-                            if potential_pin == (): #if it is the first piece along the direction, it is indeed a check
-                                in_check = True
-                                #checks.append((end_row, end_col, i, j)) 
-                                checks.append(current_dir_cells)
+                    break #If we found an harmful piece, we added it as check/pin. Nonetheless, we do not need to investigate further along that specific diagonal, regardless of the fact that we found a check/pin, because the piece we found shadows the rest of the direction.
 
-                            else: #if we have a piece that blocked it, that is indeed pinned
-                                pins.append(potential_pin)
-                        
-                        break #If we found an harmful piece, we added it as check/pin. Nonetheless, we do not need to investigate further along that specific diagonal, regardless of the fact that we found a check/pin, because the piece we found shadows the rest of the direction.
+                attackers = SLIDING_ATTACKERS[d] #past the first square, only sliders can reach the king
 
 
         ### KNIGHT CHECKS ###
         #IMPORTANT: KNIGHTS DO NOT CREATE ANY KIND OF PINS
-        directions: List[Tuple[int,int]] = []
-        for i in [-2,-1,1,2]:
-            j = 3 - abs(i)
-            directions.append((start_row+i, start_col-j))
-            directions.append((start_row+i, start_col+j))
-
-        KNIGHTS_CONDITIONS: Callable = lambda i,j: (self.board[i,j][0] == self.opp_col()) and self.board[i,j][1] == 'N'
-        for i,j in directions:
-            if all([0<=i<=7, 0<=j<=7]) and KNIGHTS_CONDITIONS(i,j): #if the square is valid and is indeed occupied by a night
+        for idx, square in KNIGHT_TARGETS[king_sq]:
+            if mailbox[idx] == enemy | KNIGHT:
                 in_check = True
-                #checks.append((i,j, i-start_row, j-start_col))
-                checks.append([(i,j)])
+                checks.append([square])
 
 
         #everything added, return
         return (in_check, pins, checks)
     ##
 
+    '''Opponent attack map, as a list of 120 booleans indexed as the mailbox. Our own king is taken off the board while the map is built, so that sliders see through it: a king in check along a line can not escape by stepping backwards along that same line. Every square the opponent attacks is flagged, whether it is empty or occupied, so the map tells at once where our king may go and which squares a castling king would cross under attack'''
+    def get_attacked_squares(self) -> List[bool]:
+        attacked = [False] * 120
+        mailbox = self.mailbox
+        if self.white_to_move:
+            king_idx, enemy, pawn_step = mailbox_index(*self.white_king_pos), BLACK, 10
+        else:
+            king_idx, enemy, pawn_step = mailbox_index(*self.black_king_pos), WHITE, -10
+
+        king = mailbox[king_idx]
+        mailbox[king_idx] = EMPTY #x-rays through our king
+        for sq, idx in enumerate(MAILBOX_SQUARES):
+            piece = mailbox[idx]
+            if not piece & enemy:
+                continue
+            kind = piece & KIND_MASK
+
+            if kind == PAWN:
+                attacked[idx + pawn_step - 1] = attacked[idx + pawn_step + 1] = True #a sentinel may be flagged, it is never looked up
+            elif kind == KNIGHT:
+                for target, _ in KNIGHT_TARGETS[sq]:
+                    attacked[target] = True
+            elif kind == KING:
+                for target, _, _ in KING_TARGETS[sq]:
+                    attacked[target] = True
+            else:
+                for d in (ROOK_DIRECTIONS if kind == ROOK else BISHOP_DIRECTIONS if kind == BISHOP else range(8)):
+                    for target, _ in RAY_TARGETS[d][sq]:
+                        attacked[target] = True
+                        if mailbox[target] != EMPTY: #the ray stops on the first piece, whichever its colour
+                            break
+        mailbox[king_idx] = king
+        return attacked
+    ##
+
+    '''Global legality constraints of the side to move: whether we are in check, pinned pieces, checking lines and the opponent attack map. Every move generation relies on them, so they are computed first, and returned so that callers generating moves in several steps (see MovePicker.py) can hand them back later on, once the search of other positions has overwritten them'''
+    def update_legality(self) -> Tuple[bool, list, list, List[bool]]:
+        self.in_check, self.pins, self.checks = self.check_for_pins_and_checks()
+        self.attacked = self.get_attacked_squares() #once per position, king moves and castling are filtered against it
+        return (self.in_check, self.pins, self.checks, self.attacked)
+    ##
+
     ''' Get all possible moves considering checks.
     
         Some of the parts of this method need to be discussed. Observe how global handling of pins and checks conditions is done at the beginning in order to update global costraints. This is done because the moves calculation actually require to be cleaned, specifically we want to avoid certain pinning directions. We can handle this thanks to an appropriate decorator, but we need global conditions to be updated BEFORE we calculate for valid moves.
-
-        TODO: handle the update of checkmate and stalemate update at the end of turn
     '''
     def get_valid_moves(self) -> List[Move]:
-        self.in_check, self.pins, self.checks = self.check_for_pins_and_checks()
-        moves: List[Move] = self.get_all_possible_moves()
-
-        #TODO: Update Kings moves calculation when in check. Very rusty at the moment.
-
-        if self.in_check: #we need to operate some filtering
-            if len(self.checks) == 1:
-                all_cells_check_direction: List[Tuple[int, int]] = self.checks[0]
-                check_cell: Tuple[int, int] = all_cells_check_direction[-1]
-                piece_checking: str = self.board[check_cell[0], check_cell[1]][1]
-
-                valid_squares: List[Tuple[int, int]] = [] 
-
-                if piece_checking == 'N':
-                    valid_squares.append((check_cell[0], check_cell[1]))
-
-                else: #literally every other piece, we need to cover the direction from which the check is coming
-                    valid_squares += all_cells_check_direction
-
-                moves =  [move for move in moves if ((move.end_row, move.end_col) in valid_squares)]
-            ##
-
-            if len(self.checks) >= 2: #here we navigate double (or even more complex) checks. Basically, if you are under double check you are forced to move your king
-                king_row = self.white_king_pos[0] if self.white_to_move else self.black_king_pos[0]
-                king_col = self.white_king_pos[1] if self.white_to_move else self.black_king_pos[1]
-                moves = self.get_king_moves(king_row, king_col) #if we are given double checks, we are forced to move our king
-            ##
-        
+        self.update_legality()
+        moves: List[Move] = self.get_stage_moves(ALL_MOVES)
 
         ## STALEMATE AND CHECKMATE UPDATE ##
+        #we only raise flags here, reporting the result is up to the caller (this method runs at every node of perft and search)
         if len(moves)==0:
             if self.in_check:
                 self.checkmate = True
-                print(f'!! PLAYER WINS BY CHECKMATE !!')
             else:
                 self.stalemate = True
-                print(f'!! STALEMATE !!')
         else:
             self.checkmate = False
             self.stalemate = False
@@ -413,17 +659,58 @@ class GameState():
         return moves
     ##
 
+    '''Valid moves of one generation stage (see GENERATION STAGES at the top of the file), or of the single piece standing on `square` if given. Legality constraints must be up to date: they are either the ones left by the last update_legality call, or the ones it returned, given back as `legality`'''
+    def get_stage_moves(self, stage: int, legality: Optional[Tuple[bool, list, list, List[bool]]] = None, square: Optional[Tuple[int, int]] = None) -> List[Move]:
+        if legality is not None:
+            self.in_check, self.pins, self.checks, self.attacked = legality
+
+        if self.in_check and len(self.checks) >= 2: #here we navigate double (or even more complex) checks. Basically, if you are under double check you are forced to move your king
+            king_pos = self.white_king_pos if self.white_to_move else self.black_king_pos
+            if square is not None and square != king_pos:
+                return []
+            return self.get_king_moves(king_pos[0], king_pos[1], stage)
+
+        if square is not None:
+            piece = self.piece_at(square[0], square[1])
+            if not piece & (WHITE if self.white_to_move else BLACK):
+                return []
+            moves: List[Move] = self.MOVES_FUNCTIONS[piece & KIND_MASK](square[0], square[1], stage)
+        else:
+            moves = self.get_all_possible_moves(stage)
+
+        if self.in_check: #single check, we need to operate some filtering
+            all_cells_check_direction: List[Tuple[int, int]] = self.checks[0]
+            check_cell: Tuple[int, int] = all_cells_check_direction[-1]
+            piece_checking: int = self.piece_at(check_cell[0], check_cell[1]) & KIND_MASK
+
+            valid_squares: List[Tuple[int, int]] = [] 
+
+            if piece_checking == KNIGHT:
+                valid_squares.append((check_cell[0], check_cell[1]))
+
+            else: #literally every other piece, we need to cover the direction from which the check is coming
+                valid_squares += all_cells_check_direction
+
+            #king moves are already safe thanks to the attack map, and an en passant capture may remove a checking pawn without landing on its square
+            king_row, king_col = self.white_king_pos if self.white_to_move else self.black_king_pos
+            king_sq = 8*king_row + king_col
+            valid_sqs = {8*row + col for row, col in valid_squares}
+            moves =  [move for move in moves if move.code & 63 == king_sq or (move.code >> 6) & 63 in valid_sqs or (move.en_passant and (move.start_row, move.end_col) == check_cell)]
+
+        return moves
+    ##
+
     '''Get all possible moves without considering checks. This method returns all of the valid moves based solely on our pieces positions. It does account for pins, thanks to the wrapping to all of the singular methods, but not for checks. These are handled in the get_valid_moves method'''
-    def get_all_possible_moves(self) -> List[Move]:
+    def get_all_possible_moves(self, stage: int = ALL_MOVES) -> List[Move]:
         moves = []
+        ally = WHITE if self.white_to_move else BLACK
 
         #go through the board to check for pieces
-        for r, row in enumerate(self.board):
-            for c, cell in enumerate(row):
-                turn = cell[0] #this basically is either 'w', 'b', or '-'
-                if (turn=='w' and self.white_to_move) or (turn=='b' and not self.white_to_move): #this basically checks for valid pieces
-                    piece = cell[1] #we get what kind of piece we are tracking
-                    moves += self.MOVES_FUNCTIONS[piece](r,c)
+        for idx in MAILBOX_SQUARES:
+            cell = self.mailbox[idx]
+            if cell & ally: #this basically checks for valid pieces, empty and OFFBOARD squares carry no colour bit
+                r, c = MAILBOX_TO_ROW_COL[idx]
+                moves += self.MOVES_FUNCTIONS[cell & KIND_MASK](r,c,stage) #we get what kind of piece we are tracking
  
         return moves
     ##
@@ -434,169 +721,152 @@ class GameState():
             (Move, dir)
             
         Where dir = Tuple[int, int] stores informations about the move directions in order for the wrapper to operate more smoothly. This really allows for the wrapper to operate with trivial logic. For further info, see clean_pinned_moves informations together with its docstring.
+
+        Targets of every square come from the precomputed tables of Tables.py: rays stop at the edge of the board and knight/king targets only list squares on the board, so none of the methods below needs bounds checks. Pawns use plain mailbox offsets, a step out of the board always landing on an OFFBOARD sentinel.
     '''
 
     '''We get all the possible pawn moves from pawn located at square [r,c]'''
     @clean_pinned_moves
-    def get_pawn_moves(self, r:int, c:int) -> List[Tuple[Move, Tuple[int, int]]]:
+    def get_pawn_moves(self, r:int, c:int, stage:int = ALL_MOVES) -> List[Tuple[Move, Tuple[int, int]]]:
         moves: List[Tuple[Move, Tuple[int, int]]] = []
+        mailbox = self.mailbox
+        start = mailbox_index(r, c)
+        start_sq = 8*r + c
 
         dir: Tuple[int, int]= (-1,0) if self.white_to_move else (1,0)
         i, j = dir[0], dir[1]
         pawns_starting_row: int = 6 if self.white_to_move else 1
-        opp_color: str = 'b' if self.white_to_move else 'w'
+        ally, opp_color = (WHITE, BLACK) if self.white_to_move else (BLACK, WHITE)
+        promotion = PROMOTIONS if r+i in [0,7] else NO_PROMOTION
+        noisy, quiet = stage & NOISY_MOVES, stage & QUIET_MOVES
+
+        if mailbox[start + 10*i] == EMPTY:
+            if (noisy if promotion is PROMOTIONS else quiet): #pushes are quiet, unless they promote
+                code = start_sq | (start_sq + 8*i) << 6
+                for flag in promotion:
+                    moves.append((Move.from_code(code | flag << 12, self), dir))
 
-        if self.board[r+i,c] == '--':
-            promotion = [(True, self.col() + piece) if piece!='--' else (True, '--') for piece in ['--', 'R', 'Q', 'N', 'B']] if r+i in [0,7] else [(False, '--')]
-            for move in promotion:
-                moves.append((Move((r,c), (r+i,c), self, pawn_promotion=move), dir))
+            if quiet and (r == pawns_starting_row) and (mailbox[start + 20*i] == EMPTY):
+                moves.append((Move.from_code(start_sq | (start_sq + 16*i) << 6, self), dir)) #double pushes can never result in promotion
 
-            if (r == pawns_starting_row) and (self.board[r+(2*i), c] == '--'):
-                moves.append((Move((r,c), (r+(2*i), c), self), dir)) #double pushes can never result in promotion
+        if not noisy:
+            return moves
             
         diags = [(i,1), (i,-1)]
         for diag_i, diag_j in diags:
-            if all([0<=r+diag_i<=7, 0<=c+diag_j<=7]):
-                promotion = [(True, self.col() + piece) if piece!='--' else (True, '--') for piece in ['--', 'R', 'Q', 'N', 'B']] if r+i in [0,7] else [(False, '--')]
-                if (self.board[r+diag_i, c+diag_j][0] == opp_color):
-                    for move in promotion: 
-                        moves.append((Move((r,c), (r+diag_i, c+diag_j), self, pawn_promotion=move), (diag_i, diag_j)))
+            target = mailbox[start + 10*diag_i + diag_j]
+            if target != OFFBOARD:
+                code = start_sq | (start_sq + 8*diag_i + diag_j) << 6
+                if (target & opp_color):
+                    for flag in promotion: 
+                        moves.append((Move.from_code(code | flag << 12, self), (diag_i, diag_j)))
 
                 if [(r,c), (diag_i, diag_j)] in self.en_passant: #if en-passant is allowed, we add
-                    moves.append((Move((r,c), (r+diag_i, c+diag_j), self, en_passant=True), (diag_i, diag_j))) #en passant can never result in a promotion
-                    pass
+                    move = Move.from_code(code | EN_PASSANT_MOVE << 12, self) #en passant can never result in a promotion
+                    if not self.king_is_in_check(move): #two pawns leave the same rank at once, which the pins detection can not see
+                        moves.append((move, (diag_i, diag_j)))
         return moves
     ##
 
-    @clean_pinned_moves
-    def get_rook_moves(self, start_row:int, start_col:int) -> List[Tuple[Move, Tuple[int, int]]]:
+    '''Sliding moves along the given directions (indexes of Tables.DIRECTIONS), shared by rooks and bishops'''
+    def _get_sliding_moves(self, start_row:int, start_col:int, directions: Tuple[int, ...], stage:int) -> List[Tuple[Move, Tuple[int, int]]]:
         moves: List[Tuple[Move, Tuple[int, int]]]= []
-        ROOK_DIRECTIONS = [(i,j) for i in (-1,0,1) for j in (-1,0,1) if abs(i+j) == 1]
-
-        for (i,j) in ROOK_DIRECTIONS:
-            for k in range(1,8):
-                end_row = start_row + k*i
-                end_col = start_col + k*j
-                opp_color = 'b' if self.white_to_move else 'w'
-
-                if all([0<=end_row<=7, 0<=end_col<=7]):
-                    if self.board[end_row, end_col][0] == opp_color: #if we find an opponent, we add the move but can't move further, hence the break
-                        moves.append((Move((start_row, start_col), (end_row, end_col), self), (i,j)))
-                        break
-
-                    elif self.board[end_row,end_col][0] == '-': #if we find an empty space, we add the move and keep goind
-                        moves.append((Move((start_row, start_col), (end_row, end_col), self), (i,j)))
+        mailbox = self.mailbox
+        start = 8*start_row + start_col
+        opp_color = BLACK if self.white_to_move else WHITE
+        noisy, quiet = stage & NOISY_MOVES, stage & QUIET_MOVES
+
+        for d in directions:
+            dir = DIRECTIONS[d]
+            for idx, _ in RAY_TARGETS[d][start]:
+                target = mailbox[idx]
+
+                if target == EMPTY: #if we find an empty space, we add the move and keep goind
+                    if quiet:
+                        moves.append((Move.from_code(start | MAILBOX_TO_SQUARE[idx] << 6, self), dir))
+
+                elif target & opp_color: #if we find an opponent, we add the move but can't move further, hence the break
+                    if noisy:
+                        moves.append((Move.from_code(start | MAILBOX_TO_SQUARE[idx] << 6, self), dir))
+                    break
 
-                    else: #if we find an ally, nothing we can do!
-                        break
-                else: #if we are here we are out of the board, so we can directly pass at next iter
+                else: #if we find an ally, nothing we can do!
                     break
         
         return moves
     ##
 
-    '''We get all the possible bishop moves from bishop located at square [r,c]'''
     @clean_pinned_moves
-    def get_bishop_moves(self, start_row:int, start_col: int) -> List[Tuple[Move, Tuple[int, int]]]:
-        moves: List[Tuple[Move, Tuple[int, int]]] = []
-        BISHOP_DIRECTIONS = [(i,j) for i in (-1,0,1) for j in (-1,0,1) if abs(i)+ abs(j) == 2] #check for this logic
-
-        for (i,j) in BISHOP_DIRECTIONS:
-            for k in range(1,8):
-                end_row = start_row + k*i
-                end_col = start_col + k*j
-                opp_color = 'b' if self.white_to_move else 'w'
-
-                if all([0<=end_row<=7, 0<=end_col<=7]):
-                    if self.board[end_row, end_col][0] == opp_color:
-                        moves.append((Move((start_row, start_col), (end_row, end_col), self), (i,j)))
-                        break
-
-                    elif self.board[end_row,end_col][0] == '-':
-                        moves.append((Move((start_row, start_col), (end_row, end_col), self), (i,j)))
+    def get_rook_moves(self, start_row:int, start_col:int, stage:int = ALL_MOVES) -> List[Tuple[Move, Tuple[int, int]]]:
+        return self._get_sliding_moves(start_row, start_col, ROOK_DIRECTIONS, stage)
+    ##
 
-                    else:
-                        break
-                else:
-                    break
-        return moves
+    '''We get all the possible bishop moves from bishop located at square [r,c]'''
+    @clean_pinned_moves
+    def get_bishop_moves(self, start_row:int, start_col: int, stage:int = ALL_MOVES) -> List[Tuple[Move, Tuple[int, int]]]:
+        return self._get_sliding_moves(start_row, start_col, BISHOP_DIRECTIONS, stage)
     ##
 
-    '''We get all the possible knight moves from knight located at square [r,c]'''
+    '''We get all the possible knight moves from knight located at square [r,c]. Knight jumps carry no direction: (0,0) never matches a pin direction, so that the wrapper drops every move of a pinned knight, which indeed can never move'''
     @clean_pinned_moves
-    def get_knight_moves(self,r:int ,c:int) -> List[Tuple[Move, Tuple[int, int]]]:
+    def get_knight_moves(self,r:int ,c:int, stage:int = ALL_MOVES) -> List[Tuple[Move, Tuple[int, int]]]:
         moves: List[Tuple[Move, Tuple[int, int]]] = []
-
-        directions: List[Tuple[int,int]] = []
-        for i in [-2,-1,1,2]:
-            j = 3 - abs(i)
-            directions.append((r+i, c-j))
-            directions.append((r+i, c+j))
-        
-        for i,j in directions:
-            if all([0<=i<=7, 0<=j<=7]): #if the square is on the board
-                if self.board[i,j] == '--': #if the square is free
-                    moves.append((Move((r,c), (i,j),self), (i,j))) #add the move
-
-                elif (self.white_to_move) and (self.board[i,j][0] == 'b'): #if the square is occupied but there's a black piece and white moves
-                    moves.append((Move((r,c), (i,j), self), (i,j)))
-
-                elif (not self.white_to_move) and (self.board[i,j][0] == 'w'): #same flipped
-                    moves.append((Move((r,c), (i,j), self), (i,j)))
+        mailbox = self.mailbox
+        opp_color = BLACK if self.white_to_move else WHITE
+        noisy, quiet = stage & NOISY_MOVES, stage & QUIET_MOVES
+
+        start = 8*r + c
+        for idx, _ in KNIGHT_TARGETS[start]:
+            target = mailbox[idx]
+            if (quiet and target == EMPTY) or (noisy and target & opp_color): #if the square is free or occupied by an opponent
+                moves.append((Move.from_code(start | MAILBOX_TO_SQUARE[idx] << 6, self), (0,0))) #add the move
         return moves
     ##
 
     '''We get all the possible queen moves from queen located at square [r,c]. IMPORTANT: queen moves do not need the wrapping since they use results from bishop and rook (already cleaned up by the wrapper itself when called)'''
-    def get_queen_moves(self,r:int ,c:int) -> List[Move]:
+    def get_queen_moves(self,r:int ,c:int, stage:int = ALL_MOVES) -> List[Move]:
         # Queen moves as rook + bishop so we can recycle already written gode
-        return self.get_rook_moves(r,c) + self.get_bishop_moves(r,c)
+        return self.get_rook_moves(r,c,stage) + self.get_bishop_moves(r,c,stage)
     ##
 
-    '''We evaluate if a given check move'''
+    '''We evaluate if a given move leaves our own king in check, by playing it. This is expensive, so it is only used for the rare en passant captures: king moves rely on the attack map instead'''
     def king_is_in_check(self, move) -> bool:
-        self.make_move(move); self.white_to_move = not self.white_to_move
+        self.make_move(move)
+        self.white_to_move = not self.white_to_move #we look at the king of the side that just moved
         in_check, _, _ = self.check_for_pins_and_checks()
-        self.undo_move(); self.white_to_move = not self.white_to_move
+        self.white_to_move = not self.white_to_move #undo_move relies on the turn being passed
+        self.undo_move()
         return in_check
     ##
 
     '''We get all the possible king moves from king located at square [r,c]'''
     @clean_pinned_moves
-    def get_king_moves(self, start_row:int, start_col:int) -> List[Tuple[Move, Tuple[int, int]]]:
+    def get_king_moves(self, start_row:int, start_col:int, stage:int = ALL_MOVES) -> List[Tuple[Move, Tuple[int, int]]]:
         moves: List[Tuple[Move, Tuple[int, int]]] = []
-        directions: List[Tuple[int, int]] = [(i,j) for i in [-1,0,1] for j in [-1,0,1] if (i,j)!=(0,0)]
-
-        for i,j in directions:
-            if all([0<=start_row+i<=7, 0<=start_col+j<=7]):
-                move = Move((start_row, start_col), (start_row+i, start_col+j), self)
-                if self.board[start_row+i, start_col+j] == '--' and not self.king_is_in_check(move):
-                        moves.append((move, (i,j)))
-
-                elif ((self.white_to_move) and (self.board[start_row+i,start_col+j][0] == 'b')) and not self.king_is_in_check(move):
-                        moves.append((move, (i,j)))
-
-                elif ((not self.white_to_move) and (self.board[start_row+i,start_col+j][0] == 'w')) and not self.king_is_in_check(move):
-                        moves.append((move, (i,j)))
-
-            # NEED TO BE CAREFUL WITH KING MOVES: ALWAYS NEED TO CHECK FOR EVENTUAL CHECKS IN PLACES IN WHICH WE MOVE
-            
-            #ADD CASTLING MOVES
-            if (self.white_to_move) and (not self.in_check):
-                if not self.white_short_castle: #if we are still able to castle-short
-                    if all([self.board[7,5] == '--', self.board[7,6] == '--']):
-                        moves.append((Move(self.white_king_pos, (7,6), self, short_castle=True), (0,1)))
-                if not self.white_long_castle: #if we are still able to castle-long
-                    if all([self.board[7,1] == '--', self.board[7,2] == '--', self.board[7,3] == '--']):
-                        moves.append((Move(self.white_king_pos, (7,2), self, long_castle=True), (0,-1)))
+        mailbox = self.mailbox
+        opp_color = BLACK if self.white_to_move else WHITE
+        noisy, quiet = stage & NOISY_MOVES, stage & QUIET_MOVES
+
+        # NEED TO BE CAREFUL WITH KING MOVES: THE KING CAN ONLY STEP ON SQUARES THE OPPONENT DOES NOT ATTACK
+        attacked = self.attacked
+        start = 8*start_row + start_col
+        for idx, _, dir in KING_TARGETS[start]:
+            target = mailbox[idx]
+            if ((quiet and target == EMPTY) or (noisy and target & opp_color)) and not attacked[idx]:
+                moves.append((Move.from_code(start | MAILBOX_TO_SQUARE[idx] << 6, self), dir))
             
-            if (not self.white_to_move) and (not self.in_check):
-                if not self.black_short_castle: #if we are still able to castle-short
-                    if all([self.board[0,5] == '--', self.board[0,6] == '--']):
-                        moves.append((Move(self.black_king_pos, (0,6), self, short_castle=True), (0,1)))
-                if not self.black_long_castle: #if we are still able to castle-long
-                    if all([self.board[7,1] == '--', self.board[7,2] == '--', self.board[7,3] == '--']):
-                        moves.append((Move(self.black_king_pos, (0,2), self, long_castle=True), (0,-1)))
-
+        #ADD CASTLING MOVES: the squares between king and rook must be empty, and the king can neither be in check nor cross or land on an attacked square
+        if quiet and not self.in_check:
+            row = 7 if self.white_to_move else 0
+            short_castle, long_castle = (self.white_short_castle, self.white_long_castle) if self.white_to_move else (self.black_short_castle, self.black_long_castle)
+            if not short_castle: #if we are still able to castle-short
+                f, g = mailbox_index(row, 5), mailbox_index(row, 6)
+                if mailbox[f] == EMPTY and mailbox[g] == EMPTY and not attacked[f] and not attacked[g]:
+                    moves.append((Move.from_code(start | (start+2) << 6 | SHORT_CASTLE_MOVE << 12, self), (0,1)))
+            if not long_castle: #if we are still able to castle-long
+                b, c, d = mailbox_index(row, 1), mailbox_index(row, 2), mailbox_index(row, 3)
+                if mailbox[b] == EMPTY and mailbox[c] == EMPTY and mailbox[d] == EMPTY and not attacked[c] and not attacked[d]: #b1/b8 may be attacked, the king never crosses it
+                    moves.append((Move.from_code(start | (start-2) << 6 | LONG_CASTLE_MOVE << 12, self), (0,-1)))
 
         return moves
     ##
@@ -620,147 +890,181 @@ class GameState():
         return 'black' if self.white_to_move else 'white'
     ##
 
-    '''Returns a string description of the game status to date, using FEM notation. Info are grabbed from the (italian) Wikipedia page: https://it.wikipedia.org/wiki/Notazione_Forsyth-Edwards. Result is still uncompleted since we do not have any memory to store half-moves (to force draw for unability to move)'''
-    def to_FEN(self) -> str:
-        s = ''
-
-        # 1. pieces
-        # TODO: add counter logic
-        for row in self.board:
-            count = 0
-            for cell in row:
-                if cell[0] == '-': 
-                    count += 1
-
-                if cell[0] == 'b':
-                    if count: s += str(count)
-                    count = 0
-                    s += cell[1].lower()
-
-                if cell[0] == 'w':
-                    if count: s += str(count)
-                    count = 0
-                    s += cell[1] #already written in CAPS LOCK
-            
-            if count: s += str(count)
-            s += '/'
-        s = s[:-1] + ' '
-
-        # 2. who to move
-        s += f'{self.col()} '
+    '''Castling rights as a 4-bit mask (see Zobrist.py for the bits), a right being available while its counter is still 0'''
+    def castling_rights(self) -> int:
+        return (
+            (WHITE_SHORT if not self.white_short_castle else 0)
+            | (WHITE_LONG if not self.white_long_castle else 0)
+            | (BLACK_SHORT if not self.black_short_castle else 0)
+            | (BLACK_LONG if not self.black_long_castle else 0)
+        )
+    ##
 
-        # 3. castling
-        s_castling = ''
-        
-        if not self.white_short_castle: 'K'
-        if not self.white_long_castle: 'Q'
-        if not self.black_short_castle: 'k'
-        if not self.black_long_castle: 'q'
-        if not s_castling: s_castling = '-'
-        s += f'{s_castling} '
-
-        # 4. en passant
-        for move in self.get_valid_moves():
-            if move.en_passant:
-                s += f'{move.get_rank_file(move.end_row, move.end_col)} '
-                break
-        else: s+='- '
+    '''File of the pawn that can be captured en passant, -1 if none. Each entry of self.en_passant stores a capturing pawn and its capture direction, so the captured pawn sits at col + direction[1]'''
+    def en_passant_file(self) -> int:
+        if not self.en_passant:
+            return -1
+        (_, col), (_, j) = self.en_passant[0]
+        return col + j
+    ##
 
-        # 5. half-moves counter
-        s += '0 '
+    '''En passant rights after a double push on file `end_col` (-1 for none), for the side to move. Rights are stored as the squares of the pawns that can capture, together with their capture direction'''
+    def _set_en_passant_file(self, end_col: int) -> None:
+        self.en_passant = []
+        if end_col >= 0:
+            (pawn_row, i) = (3, -1) if self.white_to_move else (4, 1) #row of the pawn that just double-pushed, and direction of the capture
+            self.en_passant = [[(pawn_row, end_col+j), (i,-j)] for j in [-1,1] if 0 <= end_col+j <= 7]
+    ##
 
-        # 6. total moves occured
-        s += f'{str(len(self.move_log))} '
+    def _castling_and_en_passant_key(self) -> int:
+        ep_file = self.en_passant_file()
+        return CASTLING_KEYS[self.castling_rights()] ^ (EN_PASSANT_KEYS[ep_file] if ep_file >= 0 else 0)
+    ##
 
-        return s
+    '''Zobrist key computed from scratch. make_move and undo_move never call it, but it is needed whenever a position is set up directly (e.g. from FEN) and it is the reference the incremental key can be checked against'''
+    def compute_zobrist_key(self) -> int:
+        key = SIDE_KEY if not self.white_to_move else 0
+        for sq, idx in enumerate(MAILBOX_SQUARES):
+            key ^= PIECE_KEYS[self.mailbox[idx]][sq]
+        return key ^ self._castling_and_en_passant_key()
     ##
-##
 
+    '''Evaluation terms from scratch: middlegame and endgame sums of the piece-square tables, and game phase (see Evaluation.py). As for the Zobrist key, this is only needed when a position is set up, make_move and undo_move keep them up to date afterwards'''
+    def compute_evaluation_terms(self) -> Tuple[int, int, int]:
+        mg = eg = phase = 0
+        for sq, idx in enumerate(MAILBOX_SQUARES):
+            piece = self.mailbox[idx]
+            mg += MG_TABLE[piece][sq]
+            eg += EG_TABLE[piece][sq]
+            phase += PIECE_PHASE[piece]
+        return mg, eg, phase
+    ##
 
+    '''FEN string of the position (https://en.wikipedia.org/wiki/Forsyth%E2%80%93Edwards_Notation): pieces, side to move, castling rights, en passant target square, halfmove clock and fullmove number'''
+    def to_fen(self) -> str:
+        mailbox = self.mailbox
+        ranks = []
+        for row in range(8):
+            rank, empty = '', 0
+            for idx in range(21 + 10*row, 29 + 10*row):
+                piece = mailbox[idx]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += FEN_LETTERS[piece]
+            ranks.append(rank + (str(empty) if empty else ''))
+
+        castling = ''.join(letter for letter, counter in (('K', self.white_short_castle), ('Q', self.white_long_castle), ('k', self.black_short_castle), ('q', self.black_long_castle)) if not counter) or '-'
+
+        #en passant rights are kept after every double push, as FEN expects them: the target square is the one the pawn skipped
+        ep_file = self.en_passant_file()
+        en_passant = Move.COLS_TO_FILES[ep_file] + ('6' if self.white_to_move else '3') if ep_file >= 0 else '-'
+
+        return f'{"/".join(ranks)} {self.col()} {castling} {en_passant} {self.halfmove_clock} {self.fullmove_number}'
+    ##
 
-'''Calculate how many possible moves combination are possible within the next `turns`. Serves as a check to understand whether our engine calculates the moves in the right manner, we can use lists available online to verify our results.
+    '''Kept for the callers of the old name'''
+    def to_FEN(self) -> str:
+        return self.to_fen()
+    ##
 
-    TODO: Understand recursion logic because right now we are not able to handle things in a good manner for our memory.
-'''
-def calc_moves_number(turns: int, gs: Optional[GameState] = None, tot: int = 0) -> int:
-    if gs is None:
-        gs = GameState()
-    
-    moves = gs.get_valid_moves()
-    if turns == 1: 
-        return len(moves)
-    return sum([calc_moves_number(turns-1, gs.__deepcopy__().make_move(move)) for move in moves])
+    '''Sets the position up from a FEN string, straight into the mailbox, and resets the history. Only the placement field is mandatory, the others default to white to move, no castling, no en passant and clocks 0 1. Raises ValueError on malformed strings'''
+    def _set_fen(self, fen: str) -> None:
+        fields = fen.split()
+        if not fields:
+            raise ValueError('Empty FEN string')
+        placement = fields[0]
+        side = fields[1] if len(fields) > 1 else 'w'
+        rights = fields[2] if len(fields) > 2 else '-'
+        ep = fields[3] if len(fields) > 3 else '-'
+
+        ## 1. PIECES ##
+        mailbox = [OFFBOARD] * 120
+        kings = {WHITE | KING: 0, BLACK | KING: 0}
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError(f'Invalid FEN placement, 8 ranks expected: {placement}')
+        for row, rank in enumerate(ranks):
+            idx, end = 21 + 10*row, 29 + 10*row
+            for char in rank:
+                if char in '12345678':
+                    for _ in range(int(char)):
+                        mailbox[idx] = EMPTY
+                        idx += 1
+                else:
+                    piece = FEN_PIECES.get(char)
+                    if piece is None or idx >= end:
+                        raise ValueError(f'Invalid FEN placement: {placement}')
+                    mailbox[idx] = piece
+                    if piece == WHITE | KING:
+                        self.white_king_pos = MAILBOX_TO_ROW_COL[idx]
+                        kings[piece] += 1
+                    elif piece == BLACK | KING:
+                        self.black_king_pos = MAILBOX_TO_ROW_COL[idx]
+                        kings[piece] += 1
+                    idx += 1
+            if idx != end:
+                raise ValueError(f'Invalid FEN placement, 8 squares expected on every rank: {placement}')
+        if kings[WHITE | KING] != 1 or kings[BLACK | KING] != 1: #check detection and search assume both kings are where white_king_pos and black_king_pos say
+            raise ValueError(f'Invalid FEN placement, exactly one king per side expected: {placement}')
+        self.mailbox = mailbox
+
+        ## 2. SIDE TO MOVE, CASTLING ##
+        if side not in ('w', 'b'):
+            raise ValueError(f'Invalid FEN side to move: {side}')
+        self.white_to_move = side == 'w'
+        if rights != '-' and not all(char in FEN_CASTLING for char in rights):
+            raise ValueError(f'Invalid FEN castling rights: {rights}')
+        for char in rights.strip('-'):
+            colour = WHITE if char.isupper() else BLACK
+            king_sq, rook_sq = FEN_CASTLING[char]
+            if mailbox[SQUARE_TO_MAILBOX[king_sq]] != colour | KING or mailbox[SQUARE_TO_MAILBOX[rook_sq]] != colour | ROOK: #castling would conjure the missing piece up
+                raise ValueError(f'Invalid FEN castling rights, {char} without its king and rook in place: {rights}')
+        self.white_short_castle = int('K' not in rights) #GameState counters are 0 while the right is still available
+        self.white_long_castle = int('Q' not in rights)
+        self.black_short_castle = int('k' not in rights)
+        self.black_long_castle = int('q' not in rights)
+
+        ## 3. EN PASSANT ##
+        if ep != '-' and (len(ep) != 2 or ep[0] not in Move.FILES_TO_COLS or ep[1] != ('6' if self.white_to_move else '3')): #the square a pawn of the side that just moved skipped
+            raise ValueError(f'Invalid FEN en passant square: {ep}')
+        self._set_en_passant_file(Move.FILES_TO_COLS[ep[0]] if ep != '-' else -1)
+
+        ## 4. CLOCKS ##
+        try:
+            self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f'Invalid FEN clocks: {" ".join(fields[4:])}') from None
+
+        ## 5. HISTORY AND DERIVED STATE ##
+        self.move_log = []
+        self.state_log = []
+        self.checkmate = self.stalemate = self.in_check = False
+        self.pins, self.checks = [], []
+        self.zobrist_key = self.compute_zobrist_key()
+        self.mg_score, self.eg_score, self.phase = self.compute_evaluation_terms()
+    ##
 ##
 
-'''Initialize a GameState object starting from a FEN string. IMPORTANT: we always assume that the final char of a string is the empty space ' '. This is done to enjoy an easier control. In general, we make strong assumptions about the format of such FEN strings, which we recall may not be uniform when scraping for real chess data. This is done in test mode as for now, and further implementations will evetnually be added later on.'''
-def FEN_to_chess(s: str) -> GameState:
-    
-    vert_board = []
-    white_to_move: bool = True
-    white_long_castle: bool = False
-    white_short_castle: bool = False
-    black_long_castle: bool = False
-    black_short_castle: bool = False
-
-    sect_counter = 1
-    for i in s:
-
-        if i == ' ': sect_counter += 1
-        if sect_counter == 7:
-            break
-        
-        # 1. Pieces
-        elif sect_counter == 1:
-            if i.islower(): vert_board.append('b' + i.upper()) #piece is black
-            elif i.isupper(): vert_board.append('w' + i) #piece is white
-            elif i=='/': pass #we do nothing here
-            else: vert_board += int(i) * ['--'] #i is an integer, need to handle
-
-        # 2. Who to move
-        elif sect_counter == 2:
-            white_to_move = (i=='w')
-
-        # 3. castling rights
-        elif sect_counter == 3:
-            if i=='Q': white_long_castle = True
-            if i=='K': white_short_castle = True
-            if i=='q': black_long_castle = True
-            if i=='k': black_short_castle = True
-
-        # 4. en-passant
-        elif sect_counter == 4:
-            pass
-        
-        # 5. Semi-moves
-        elif sect_counter == 5:
-            pass
-        
-        # 6. Number of moves
-        elif sect_counter == 6:
-            pass 
-    ##
 
-    game = GameState()
-    assert len(vert_board) == 64, 'Invalid board provided as input, check your data'
-    game.board = np.array(vert_board).reshape((8,8))
-
-    game.white_to_move = white_to_move
-    game.white_short_castle = white_short_castle
-    game.white_long_castle = white_long_castle
-    game.black_short_castle = black_short_castle
-    game.black_long_castle = black_long_castle
-        
-    return game
+
+'''Initialize a GameState object starting from a FEN string, see GameState.from_fen'''
+def FEN_to_chess(s: str) -> GameState:
+    return GameState.from_fen(s)
 ##
 
 '''Store a chess game using FEN portable notation'''
 def chess_to_FEN(game: GameState) -> str:
-    return game.to_FEN()
+    return game.to_fen()
 ##
 
 if __name__ == '__main__':
     game = GameState()
-    test_string = game.to_FEN()
+    test_string = game.to_fen()
     
     game_copy = FEN_to_chess(test_string)
     print(game_copy.board)
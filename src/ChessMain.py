@@ -2,7 +2,12 @@
 
 import pygame as p
 import ChessEngine
-from typing import Tuple, Optional, Union, List, Callable, Literal
+import Search
+from Book import OpeningBook
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Tuple, Optional, List
 
 import sys
 sys.path.append('/Users/simone/Library/Python/3.13/lib/python/site-packages')
@@ -13,6 +18,8 @@ MAX_FPS = 15
 DIMENSION = 8
 SQ_SIZE = HEIGHT // DIMENSION
 
+AI_MOVE_TIME = 1.0 #seconds the CPU is allowed to think about a move, whatever its level
+
 
 GRAPHICS_PALETTE = [p.Color("white"), p.Color("gray")]
 HIGHLIGHT_COLOR = p.Color("chocolate4")
@@ -40,12 +47,18 @@ class Game():
             player2: int = 0,
             themes_settings: dict = DEFAULT_SETTINGS,
             IMAGES = {},
+            book_path: Optional[str] = None,
     ) -> None:
         
         # control flow and logic
         '''Player are flagged as player/AI by an integer spanning from 0 to xx (yet to be defined), where 0 identifies human player, while numbers 1 to xx identify AIs at different levels. It is still unknown whether these values describe the network model at different stages of training, or if different algorithms will be used to distinguish between different levels. Maybe, a mixture of the 2 approaches will be present, even though this is still unclear. The 0/int design option allows for an easier flow control with basic ifs.'''
-        self.player1: int
-        self.player2: int
+        self.player1: int = player1
+        self.player2: int = player2
+        self.searcher: Search.Searcher = Search.Searcher() #shared by both AI players, the transposition table carries over between moves
+        self.ai_worker = ThreadPoolExecutor(max_workers=1) #the AI thinks in here, so that the window keeps being drawn and handling events meanwhile
+        self.ai_future: Optional[Future] = None #the search in progress, polled by self.update
+        self.ai_cancel: Optional[threading.Event] = None #set to drop the search in progress, each search gets its own
+        self.book: Optional[OpeningBook] = OpeningBook(book_path) if book_path else None #the AI plays book moves while there are, without searching
         self.game: ChessEngine.GameState = ChessEngine.GameState()
         self.move_made: bool = True #has to be instantiated as true so we first draw the board
         self.valid_moves: List[ChessEngine.Move] = []
@@ -81,6 +94,7 @@ class Game():
     ) -> None:
         
         if e.type == p.QUIT:
+            self.close()
             self.game.checkmate = True #TODO: edit this, rn just to avoid infinite looping
         ##
          
@@ -98,7 +112,11 @@ class Game():
         ##
 
         if e.type == p.KEYDOWN and e.key == p.K_z:
-            self.game.undo_move()
+            self.cancel_ai_move()
+            if self.game.move_log:
+                self.game.undo_move()
+            if self.game.move_log and (self.player1 if self.game.white_to_move else self.player2): #the AI would replay at once, we take back the human move before it too
+                self.game.undo_move()
             self.move_made = True
             self.selected_square = ()
             self.player_clicks = []
@@ -114,16 +132,31 @@ class Game():
         #if a move has been made, we handle the case in which next move must be made by AI, etc...
         if self.move_made:
             self.valid_moves = self.game.get_valid_moves()
+            ai_level = self.player1 if self.game.white_to_move else self.player2
+
+            if ai_level and self.valid_moves: #the level is used as maximum search depth, within AI_MOVE_TIME anyway
+                self.start_ai_move(ai_level)
+            self.move_made = False
+
+        ## the AI is thinking: we only check whether it is done, clicks are ignored meanwhile
+        elif self.ai_future is not None:
+            self.player_clicks = []
+            if self.ai_future.done():
+                try:
+                    move = self.ai_future.result()
+                except Exception: #a failing search must not take the window down with it
+                    traceback.print_exc()
+                    move = None
+                self.ai_future = None
+                if move is not None:
+                    self.game.make_move(ChessEngine.Move.from_code(move.code, self.game)) #the move was built on the copy of the position
+                    print(move)
+                    self.move_made = True
 
-            if 'AI_TO_MOVE':
-                self.game.make_random_move(self.valid_moves)
-            else:
-                self.move_made = False
-        
         ## if a move has been done, we need to monitor the output and do graphical handling
         else:
             if (len(self.player_clicks) == 1):
-                if self.game.board[self.player_clicks[0][0], self.player_clicks[0][1]] == '--':
+                if self.game.piece_at(self.player_clicks[0][0], self.player_clicks[0][1]) == ChessEngine.EMPTY:
                     self.selected_square = ()
                     self.player_clicks = []
             
@@ -136,7 +169,7 @@ class Game():
                     )
                     
                     for engine_move in self.valid_moves:
-                        if move == engine_move:
+                        if move.move_id == engine_move.move_id: #clicks only give the squares, promotions go to the queen which is generated first
                             if engine_move.pawn_promotion[0]:
                                 #engine_move.pawn_promotion = (True, handle_pawn_promotion(screen, self.game, engine_move)) # we first want to handle pawn promotion separately in order to interact correctly with the game
                                 pass
@@ -153,6 +186,36 @@ class Game():
                         self.player_clicks = [self.selected_square] if self.selected_square else []
     ##
 
+    '''AI MOVES. The search runs on a worker thread, on a copy of the position: the window draws and undoes moves on self.game meanwhile, which the search must not see changing under its feet'''
+    def start_ai_move(self, depth: int) -> None:
+        position = self.game.copy()
+        self.ai_cancel = threading.Event()
+        self.ai_future = self.ai_worker.submit(self._think, position, depth, self.ai_cancel)
+    ##
+
+    '''The search polls `cancel` itself (see Searcher.search), so a cancellation that comes before it even started is not lost, as a call to Searcher.stop would be'''
+    def _think(self, position: ChessEngine.GameState, depth: int, cancel: threading.Event) -> Optional[ChessEngine.Move]:
+        move = self.book.pick(position) if self.book is not None else None
+        if move is not None:
+            return move
+        return self.searcher.search(position, max_depth=depth, time_limit=AI_MOVE_TIME, should_stop=cancel.is_set).move
+    ##
+
+    '''Drops the search in progress, if any. It is asked to stop as soon as possible, and its result is never played: the next search only starts once the worker is free'''
+    def cancel_ai_move(self) -> None:
+        if self.ai_future is not None:
+            self.ai_cancel.set()
+            self.ai_future.cancel() #never started, it will not run at all
+            self.ai_future = self.ai_cancel = None
+    ##
+
+    def close(self) -> None:
+        self.cancel_ai_move()
+        self.ai_worker.shutdown(wait=False, cancel_futures=True)
+        if self.book is not None:
+            self.book.close()
+    ##
+
     def draw(
             self,
             surface: p.surface.Surface,
@@ -170,9 +233,10 @@ class Game():
             self,
             surface: p.surface.Surface
     ) -> None:
+        board = self.game.board #strings conversion of the engine mailbox, built once per frame
         for r in range(DIMENSION):
             for c in range(DIMENSION):
-                piece = self.game.board[r,c]
+                piece = board[r,c]
                 if piece != '--': #if the cell is not empty
                     surface.blit(self.IMAGES[piece], p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
         pass
@@ -197,7 +261,7 @@ class Game():
 
                 # highlighted square
                 if (r,c) == highlighted: 
-                    if self.game.board[r,c][0] == self.game.col(): #if selected square is one of the pieces to move
+                    if self.game.piece_at(r,c) & (ChessEngine.WHITE if self.game.white_to_move else ChessEngine.BLACK): #if selected square is one of the pieces to move
                         p.draw.rect(surface, HIGHLIGHT_COLOR, p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
                     else:
                         p.draw.rect(surface, color, p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
@@ -227,7 +291,7 @@ if __name__ == "__main__":
     #main()
     p.init()
     screen = p.display.set_mode((HEIGHT, WIDTH))
-    game = Game(0,0)
+    game = Game(0,4) #human (white) against CPU (black)
 
 
     while not(game.game.checkmate or game.game.stalemate):
@@ -242,5 +306,12 @@ if __name__ == "__main__":
         game.update(mouse_pos)
         game.draw(screen, auto_display=False)
         p.display.flip()
+    game.close()
+
+    if game.game.checkmate and game.game.in_check: #quitting the window also raises the checkmate flag, see Game.get_event
+        winner_level = game.player2 if game.game.white_to_move else game.player1 #the side to move is the one mated
+        print(f'!! {"BLACK" if game.game.white_to_move else "WHITE"} ({"CPU" if winner_level else "PLAYER"}) WINS BY CHECKMATE !!')
+    elif game.game.stalemate:
+        print(f'!! STALEMATE !!')
 
 #print("PROCESS ENDED CORRECTLY")
\ No newline at end of file
@@ -0,0 +1,126 @@
+'''Tensor encoding of positions and moves, for reinforcement-learning pipelines.
+
+A position becomes NUM_PLANES planes of 8x8, in board order (row 0 is the 8th rank, as everywhere in the engine):
+
+    0-5     white pawns, knights, bishops, rooks, queens, king
+    6-11    black pawns, knights, bishops, rooks, queens, king
+    12      side to move, all ones when white is to move
+    13-16   castling rights: white short, white long, black short, black long, all ones while available
+    17      en passant target square
+
+The encoders write straight into a buffer that the caller allocates once (see new_buffer) and reuses for every batch: no intermediate array is built, the planes are cleared and the pieces are set one by one on a flat view of the buffer.
+
+A move becomes an index in [0, POLICY_SIZE): start_sq*64 + end_sq for every move (castling is a king move of two squares, queen promotions are plain pawn moves), and a block of 144 entries after the first 4096 for under-promotions, which would otherwise collide with them.
+'''
+import numpy as np
+from typing import Optional, Sequence
+
+from ChessEngine import GameState, Move, WHITE, BLACK, PAWN, KING, KNIGHT, ROOK
+from Tables import MAILBOX_SQUARES
+from Zobrist import WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG
+
+
+
+PIECE_PLANES: int = 12
+SIDE_PLANE: int = 12
+CASTLING_PLANES: int = 13
+EN_PASSANT_PLANE: int = 17
+NUM_PLANES: int = 18
+
+CASTLING_ORDER = [WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG] #one plane each, from CASTLING_PLANES on
+
+UNDERPROMOTIONS: int = 4096 #first policy index of the under-promotions: (kind, promotion rank, end file, capture direction)
+POLICY_SIZE: int = UNDERPROMOTIONS + 3 * 2 * 8 * 3
+
+'''PLANE_OF[piece] is the plane of the integer piece code (see ChessEngine), -1 for empty squares'''
+PLANE_OF = [-1] * 32
+for _kind in range(PAWN, KING+1):
+    PLANE_OF[WHITE | _kind] = _kind - PAWN
+    PLANE_OF[BLACK | _kind] = 6 + _kind - PAWN
+
+
+
+'''A zeroed buffer for `n` positions, shaped (n, NUM_PLANES, 8, 8). Allocate it once and pass it, or any row of it, to the encoders'''
+def new_buffer(n: int, dtype: np.dtype = np.float32) -> np.ndarray:
+    return np.zeros((n, NUM_PLANES, 8, 8), dtype=dtype)
+##
+
+'''Writes the planes of `game` into `out`, a C-contiguous (NUM_PLANES, 8, 8) array such as a row of new_buffer. Nothing is allocated: every value goes through a flat view of `out`'''
+def encode_position(game: GameState, out: np.ndarray) -> np.ndarray:
+    if out.shape != (NUM_PLANES, 8, 8) or not out.flags.c_contiguous:
+        raise ValueError(f"Expected a C-contiguous ({NUM_PLANES}, 8, 8) buffer, got shape {out.shape}")
+    flat = out.reshape(-1) #a view, since the buffer is contiguous
+    flat.fill(0)
+
+    ## 1. PIECES ##
+    mailbox = game.mailbox
+    for sq, idx in enumerate(MAILBOX_SQUARES):
+        plane = PLANE_OF[mailbox[idx]]
+        if plane >= 0:
+            flat[plane*64 + sq] = 1
+
+    ## 2. SIDE TO MOVE ##
+    if game.white_to_move:
+        out[SIDE_PLANE].fill(1)
+
+    ## 3. CASTLING RIGHTS ##
+    rights = game.castling_rights()
+    for i, right in enumerate(CASTLING_ORDER):
+        if rights & right:
+            out[CASTLING_PLANES + i].fill(1)
+
+    ## 4. EN PASSANT ##
+    if game.en_passant:
+        (row, _), _ = game.en_passant[0] #the capturing pawn sits on the row of the pawn that just moved two squares
+        target_row = row - 1 if game.white_to_move else row + 1
+        flat[EN_PASSANT_PLANE*64 + 8*target_row + game.en_passant_file()] = 1
+    return out
+##
+
+'''Writes the planes of every game into the matching row of `out`, a buffer of at least len(games) rows from new_buffer'''
+def encode_batch(games: Sequence[GameState], out: np.ndarray) -> np.ndarray:
+    if len(out) < len(games):
+        raise ValueError(f"The buffer holds {len(out)} positions, {len(games)} given")
+    for i, game in enumerate(games):
+        encode_position(game, out[i])
+    return out[:len(games)]
+##
+
+
+
+## POLICY ##
+
+'''Index of `move` in the policy vector, see the top of the file'''
+def policy_index(move: Move) -> int:
+    code = move.code
+    start_sq, end_sq, flag = code & 63, (code >> 6) & 63, code >> 12
+    if not KNIGHT <= flag <= ROOK:
+        return start_sq*64 + end_sq
+    end_col = end_sq & 7
+    capture = (start_sq & 7) - end_col + 1 #0, 1 or 2
+    black = end_sq >> 3 == 7 #black promotes on the last row of the board
+    return UNDERPROMOTIONS + (((flag - KNIGHT)*2 + black)*8 + end_col)*3 + capture
+##
+
+'''Writes the policy indices of `moves` into `out`, an integer array at least as long, and returns the filled part. With a boolean mask instead, see legal_mask'''
+def policy_indices(moves: Sequence[Move], out: np.ndarray) -> np.ndarray:
+    for i, move in enumerate(moves):
+        out[i] = policy_index(move)
+    return out[:len(moves)]
+##
+
+'''Sets `out`, a (POLICY_SIZE,) boolean array, to the mask of the given legal moves, to restrict the output of a policy network'''
+def legal_mask(moves: Sequence[Move], out: np.ndarray) -> np.ndarray:
+    out.fill(False)
+    for move in moves:
+        out[policy_index(move)] = True
+    return out
+##
+
+'''The valid move of `game` with the given policy index, None if there is no such move'''
+def move_from_policy(game: GameState, index: int, moves: Optional[Sequence[Move]] = None) -> Optional[Move]:
+    for move in (moves if moves is not None else game.get_valid_moves()):
+        if policy_index(move) == index:
+            return move
+    return None
+##
@@ -0,0 +1,224 @@
+'''Tapered evaluation: material plus piece-square tables, with separate middlegame and endgame values blended according to the material left on the board (the game phase).
+
+The evaluation is a plain sum over the pieces, so GameState keeps its three terms (mg_score, eg_score and phase) up to date in make_move/undo_move, the same way it keeps the Zobrist key: only the pieces a move actually touches are added or removed. Evaluating a position is then O(1), see evaluate.
+
+Values and tables are the PeSTO ones by Ronald Friederich, tuned for exactly this kind of evaluation.
+
+For labelling and analysis jobs over many positions at once, evaluate_batch scores a whole stack of boards with NumPy gathers over the same tables, without any Python loop per position.
+'''
+import numpy as np
+from typing import List, Optional, Sequence
+
+from Tables import MAILBOX_SQUARES
+
+
+
+'''Piece codes, as in ChessEngine (colour | kind). They are repeated here so that this module only holds tables and does not import the engine'''
+_PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING = 1, 2, 3, 4, 5, 6
+_WHITE, _BLACK = 8, 16
+_NAMES = {0: '--', **{colour | kind: col + name for colour, col in [(_WHITE, 'w'), (_BLACK, 'b')] for kind, name in zip(range(_PAWN, _KING+1), 'PNBRQK')}} #as the strings of GameState.board
+
+MG_VALUES: List[int] = [0, 82, 337, 365, 477, 1025, 0] #indexed by kind
+EG_VALUES: List[int] = [0, 94, 281, 297, 512, 936, 0]
+PHASE_WEIGHTS: List[int] = [0, 0, 1, 1, 2, 4, 0] #minor pieces count 1, rooks 2, queens 4
+MAX_PHASE: int = 24 #all the pieces on the board, pure middlegame
+
+
+
+## PIECE-SQUARE TABLES ##
+#from white's point of view, indexed by sq = 8*row + col: the first line is the 8th rank, as on the board
+
+MG_PAWN: List[int] = [
+      0,   0,   0,   0,   0,   0,  0,   0,
+     98, 134,  61,  95,  68, 126, 34, -11,
+     -6,   7,  26,  31,  65,  56, 25, -20,
+    -14,  13,   6,  21,  23,  12, 17, -23,
+    -27,  -2,  -5,  12,  17,   6, 10, -25,
+    -26,  -4,  -4, -10,   3,   3, 33, -12,
+    -35,  -1, -20, -23, -15,  24, 38, -22,
+      0,   0,   0,   0,   0,   0,  0,   0,
+]
+EG_PAWN: List[int] = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+    178, 173, 158, 134, 147, 132, 165, 187,
+     94, 100,  85,  67,  56,  53,  82,  84,
+     32,  24,  13,   5,  -2,   4,  17,  17,
+     13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+      4,   7,  -6,   1,   0,  -5,  -1,  -8,
+     13,   8,   8,  10,  13,   0,   2,  -7,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+MG_KNIGHT: List[int] = [
+    -167, -89, -34, -49,  61, -97, -15, -107,
+     -73, -41,  72,  36,  23,  62,   7,  -17,
+     -47,  60,  37,  65,  84, 129,  73,   44,
+      -9,  17,  19,  53,  37,  69,  18,   22,
+     -13,   4,  16,  13,  28,  19,  21,   -8,
+     -23,  -9,  12,  10,  19,  17,  25,  -16,
+     -29, -53, -12,  -3,  -1,  18, -14,  -19,
+    -105, -21, -58, -33, -17, -28, -19,  -23,
+]
+EG_KNIGHT: List[int] = [
+    -58, -38, -13, -28, -31, -27, -63, -99,
+    -25,  -8, -25,  -2,  -9, -25, -24, -52,
+    -24, -20,  10,   9,  -1,  -9, -19, -41,
+    -17,   3,  22,  22,  22,  11,   8, -18,
+    -18,  -6,  16,  25,  16,  17,   4, -18,
+    -23,  -3,  -1,  15,  10,  -3, -20, -22,
+    -42, -20, -10,  -5,  -2, -20, -23, -44,
+    -29, -51, -23, -15, -22, -18, -50, -64,
+]
+MG_BISHOP: List[int] = [
+    -29,   4, -82, -37, -25, -42,   7,  -8,
+    -26,  16, -18, -13,  30,  59,  18, -47,
+    -16,  37,  43,  40,  35,  50,  37,  -2,
+     -4,   5,  19,  50,  37,  37,   7,  -2,
+     -6,  13,  13,  26,  34,  12,  10,   4,
+      0,  15,  15,  15,  14,  27,  18,  10,
+      4,  15,  16,   0,   7,  21,  33,   1,
+    -33,  -3, -14, -21, -13, -12, -39, -21,
+]
+EG_BISHOP: List[int] = [
+    -14, -21, -11,  -8, -7,  -9, -17, -24,
+     -8,  -4,   7, -12, -3, -13,  -4, -14,
+      2,  -8,   0,  -1, -2,   6,   0,   4,
+     -3,   9,  12,   9, 14,  10,   3,   2,
+     -6,   3,  13,  19,  7,  10,  -3,  -9,
+    -12,  -3,   8,  10, 13,   3,  -7, -15,
+    -14, -18,  -7,  -1,  4,  -9, -15, -27,
+    -23,  -9, -23,  -5, -9, -16,  -5, -17,
+]
+MG_ROOK: List[int] = [
+     32,  42,  32,  51, 63,  9,  31,  43,
+     27,  32,  58,  62, 80, 67,  26,  44,
+     -5,  19,  26,  36, 17, 45,  61,  16,
+    -24, -11,   7,  26, 24, 35,  -8, -20,
+    -36, -26, -12,  -1,  9, -7,   6, -23,
+    -45, -25, -16, -17,  3,  0,  -5, -33,
+    -44, -16, -20,  -9, -1, 11,  -6, -71,
+    -19, -13,   1,  17, 16,  7, -37, -26,
+]
+EG_ROOK: List[int] = [
+    13, 10, 18, 15, 12,  12,   8,   5,
+    11, 13, 13, 11, -3,   3,   8,   3,
+     7,  7,  7,  5,  4,  -3,  -5,  -3,
+     4,  3, 13,  1,  2,   1,  -1,   2,
+     3,  5,  8,  4, -5,  -6,  -8, -11,
+    -4,  0, -5, -1, -7, -12,  -8, -16,
+    -6, -6,  0,  2, -9,  -9, -11,  -3,
+    -9,  2,  3, -1, -5, -13,   4, -20,
+]
+MG_QUEEN: List[int] = [
+    -28,   0,  29,  12,  59,  44,  43,  45,
+    -24, -39,  -5,   1, -16,  57,  28,  54,
+    -13, -17,   7,   8,  29,  56,  47,  57,
+    -27, -27, -16, -16,  -1,  17,  -2,   1,
+     -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+    -14,   2, -11,  -2,  -5,   2,  14,   5,
+    -35,  -8,  11,   2,   8,  15,  -3,   1,
+     -1, -18,  -9,  10, -15, -25, -31, -50,
+]
+EG_QUEEN: List[int] = [
+     -9,  22,  22,  27,  27,  19,  10,  20,
+    -17,  20,  32,  41,  58,  25,  30,   0,
+    -20,   6,   9,  49,  47,  35,  19,   9,
+      3,  22,  24,  45,  57,  40,  57,  36,
+    -18,  28,  19,  47,  31,  34,  39,  23,
+    -16, -27,  15,   6,   9,  17,  10,   5,
+    -22, -23, -30, -16, -16, -23, -36, -32,
+    -33, -28, -22, -43,  -5, -32, -20, -41,
+]
+MG_KING: List[int] = [
+    -65,  23,  16, -15, -56, -34,   2,  13,
+     29,  -1, -20,  -7,  -8,  -4, -38, -29,
+     -9,  24,   2, -16, -20,   6,  22, -22,
+    -17, -20, -12, -27, -30, -25, -14, -36,
+    -49,  -1, -27, -39, -46, -44, -33, -51,
+    -14, -14, -22, -46, -44, -30, -15, -27,
+      1,   7,  -8, -64, -43, -16,   9,   8,
+    -15,  36,  12, -54,   8, -28,  24,  14,
+]
+EG_KING: List[int] = [
+    -74, -35, -18, -18, -11,  15,   4, -17,
+    -12,  17,  14,  17,  17,  38,  23,  11,
+     10,  17,  23,  15,  20,  45,  44,  13,
+     -8,  22,  24,  27,  26,  33,  26,   3,
+    -18,  -4,  21,  24,  27,  23,   9, -11,
+    -19,  -3,  11,  21,  23,  16,   7,  -9,
+    -27, -11,   4,  13,  14,   4,  -5, -17,
+    -53, -34, -21, -11, -28, -14, -24, -43,
+]
+
+
+
+'''MG_TABLE[piece][sq] and EG_TABLE[piece][sq], with `piece` the integer code of ChessEngine: material plus square bonus, positive for white pieces and negative for black ones (which read the white tables upside down). As for the Zobrist keys, the rows of EMPTY and of unused codes are all zeros, so adding or removing an empty square is a no-op. PIECE_PHASE[piece] is the phase weight of the piece.'''
+def _build_table(values: List[int], tables: List[List[int]]) -> List[List[int]]:
+    table = [[0] * 64 for _ in range(32)]
+    for kind, pst in zip(range(_PAWN, _KING+1), tables):
+        table[_WHITE | kind] = [values[kind] + pst[sq] for sq in range(64)]
+        table[_BLACK | kind] = [-(values[kind] + pst[sq ^ 56]) for sq in range(64)] #sq ^ 56 mirrors the rows
+    return table
+##
+
+MG_TABLE: List[List[int]] = _build_table(MG_VALUES, [MG_PAWN, MG_KNIGHT, MG_BISHOP, MG_ROOK, MG_QUEEN, MG_KING])
+EG_TABLE: List[List[int]] = _build_table(EG_VALUES, [EG_PAWN, EG_KNIGHT, EG_BISHOP, EG_ROOK, EG_QUEEN, EG_KING])
+PIECE_PHASE: List[int] = [PHASE_WEIGHTS[code & 7] if code & (_WHITE | _BLACK) and code & 7 <= _KING else 0 for code in range(32)]
+
+
+
+'''Score of the position in centipawns, from the point of view of the side to move. Middlegame and endgame terms are blended linearly on the phase, which is capped in case promotions brought extra pieces on the board'''
+def evaluate(game) -> int:
+    phase = min(game.phase, MAX_PHASE)
+    score = (game.mg_score * phase + game.eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if game.white_to_move else -score
+##
+
+
+
+### BATCH EVALUATION ###
+
+MG_ARRAY: np.ndarray = np.array(MG_TABLE, dtype=np.int32) #(32, 64), same layout as the lists above
+EG_ARRAY: np.ndarray = np.array(EG_TABLE, dtype=np.int32)
+PHASE_ARRAY: np.ndarray = np.array(PIECE_PHASE, dtype=np.int32)
+
+_SORTED_NAMES: np.ndarray = np.array(sorted(_NAMES.values()))
+_SORTED_CODES: np.ndarray = np.array([{v: k for k,v in _NAMES.items()}[name] for name in _SORTED_NAMES], dtype=np.int32)
+
+'''Integer codes of a stack of strings boards, as returned by GameState.board ('wP', 'bK', '--', ...), through a single vectorized search over the sorted piece names'''
+def codes_from_names(boards: np.ndarray) -> np.ndarray:
+    idx = np.searchsorted(_SORTED_NAMES, boards).clip(0, len(_SORTED_NAMES)-1)
+    unknown = _SORTED_NAMES[idx] != boards
+    if np.any(unknown):
+        raise ValueError(f"Unknown pieces on the boards: {np.unique(boards[unknown])}")
+    return _SORTED_CODES[idx]
+##
+
+'''(N, 8, 8) array of the integer codes of N games, read straight from their mailboxes: much cheaper than stacking their GameState.board strings'''
+def stack_boards(games: Sequence) -> np.ndarray:
+    mailboxes = np.array([game.mailbox for game in games], dtype=np.int32).reshape((-1, 120))
+    return mailboxes[:, MAILBOX_SQUARES].reshape((-1, 8, 8))
+##
+
+'''Scores of N positions at once. `boards` is an (N, 8, 8) array of integer piece codes (see ChessEngine and stack_boards) or of strings, e.g. a stack of GameState.board arrays. Every board is flattened to its 64 squares, the tables are gathered at (piece, square) and summed per board, then the terms are tapered exactly as evaluate does.
+
+Boards do not know whose turn it is: scores are from white's point of view, unless `white_to_move` (N booleans) is given, in which case they are from the point of view of the side to move, as evaluate returns them'''
+def evaluate_batch(boards: np.ndarray, white_to_move: Optional[np.ndarray] = None) -> np.ndarray:
+    boards = np.asarray(boards)
+    if boards.ndim != 3 or boards.shape[1:] != (8, 8):
+        raise ValueError(f"Expected an (N, 8, 8) array of boards, got shape {boards.shape}")
+    if boards.dtype.kind in 'US':
+        boards = codes_from_names(boards.astype(str))
+    pieces = boards.reshape((-1, 64)).astype(np.intp)
+    if pieces.size and (pieces.min() < 0 or pieces.max() >= len(MG_ARRAY)):
+        raise ValueError("Piece codes out of range")
+
+    squares = np.arange(64)
+    mg = MG_ARRAY[pieces, squares].sum(axis=1, dtype=np.int64)
+    eg = EG_ARRAY[pieces, squares].sum(axis=1, dtype=np.int64)
+    phase = np.minimum(PHASE_ARRAY[pieces].sum(axis=1, dtype=np.int64), MAX_PHASE)
+    scores = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE #floor division, as in evaluate
+
+    if white_to_move is not None:
+        scores = np.where(np.asarray(white_to_move, dtype=bool), scores, -scores)
+    return scores
+##
@@ -0,0 +1,115 @@
+'''Move ordering heuristics. Alpha-beta prunes the most when the best move is tried first, so that moves are scored and tried best first:
+
+    - captures with MVV-LVA (Most Valuable Victim, Least Valuable Attacker): taking a queen with a pawn comes before taking a pawn with a queen;
+    - killer moves: quiet moves that caused a cutoff at the same ply in another branch, two slots per ply;
+    - history heuristic: a butterfly table, indexed by side to move, start and end square, counting how often every quiet move caused a cutoff, weighted by the depth of the search, minus how often it was tried before the move that did.
+
+MoveOrdering keeps the state of the last two across a whole search, and works for any search built on GameState: either plug it in MovePicker.pick_moves, as Searcher does, or sort a whole move list with order_moves.
+'''
+from typing import List, Sequence
+
+from ChessEngine import Move, EMPTY, KIND_MASK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, EN_PASSANT_MOVE, SQUARE_TO_MAILBOX
+
+
+
+MAX_PLY: int = 128
+KILLER_SLOTS: int = 2
+PIECE_VALUES: List[int] = [0] * 8
+PIECE_VALUES[PAWN], PIECE_VALUES[KNIGHT], PIECE_VALUES[BISHOP], PIECE_VALUES[ROOK], PIECE_VALUES[QUEEN], PIECE_VALUES[KING] = 100, 320, 330, 500, 900, 0
+
+HISTORY_LIMIT: int = 1 << 14 #history scores stay within [-HISTORY_LIMIT, HISTORY_LIMIT], see MoveOrdering.update
+
+
+
+'''MVV-LVA score of a capture or promotion: the kind of the victim dominates (kinds grow with the value of the pieces), the kind of the attacker breaks ties. Promotions count as capturing the new piece'''
+def mvv_lva(move: Move) -> int:
+    flag = move.code >> 12
+    victim = PAWN if flag == EN_PASSANT_MOVE else move.piece_captured & KIND_MASK
+    if KNIGHT <= flag <= QUEEN:
+        victim += flag
+    return 16*victim - (move.piece_moved & KIND_MASK)
+##
+
+'''A capture that can only lose material: a piece worth more than its victim lands on a square the opponent attacks (`attacked`, the map of GameState.update_legality), and gets taken back. This is a cheap stand-in for a static exchange evaluation, exact on the common cases (a queen taking a defended pawn) and blind to what happens after the recapture. Promotions are never bad'''
+def is_bad_capture(move: Move, attacked: List[bool]) -> bool:
+    flag = move.code >> 12
+    if KNIGHT <= flag <= QUEEN:
+        return False
+    victim = PAWN if flag == EN_PASSANT_MOVE else move.piece_captured & KIND_MASK
+    return PIECE_VALUES[move.piece_moved & KIND_MASK] > PIECE_VALUES[victim] and attacked[SQUARE_TO_MAILBOX[(move.code >> 6) & 63]]
+##
+
+'''Quiet moves neither capture nor promote (castling is quiet)'''
+def is_quiet(move: Move) -> bool:
+    flag = move.code >> 12
+    return move.piece_captured == EMPTY and flag != EN_PASSANT_MOVE and not KNIGHT <= flag <= QUEEN
+##
+
+
+
+class MoveOrdering():
+
+    def __init__(self) -> None:
+        self.killers: List[List[int]] = [[0] * KILLER_SLOTS for _ in range(MAX_PLY)] #move codes, per ply
+        self.history: List[int] = [0] * (2 * 4096) #side << 12 | start square | end square << 6
+    ##
+
+    def clear(self) -> None:
+        self.killers = [[0] * KILLER_SLOTS for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 4096)
+    ##
+
+    '''To be called once per search: killers belong to the previous position and are dropped, history is kept but halved'''
+    def new_search(self) -> None:
+        self.killers = [[0] * KILLER_SLOTS for _ in range(MAX_PLY)]
+        self.history = [h >> 1 for h in self.history]
+    ##
+
+    def killers_at(self, ply: int) -> List[int]:
+        return self.killers[ply] if ply < MAX_PLY else []
+    ##
+
+    def history_score(self, move: Move, white_to_move: bool) -> int:
+        return self.history[(not white_to_move) << 12 | (move.code & 0xFFF)]
+    ##
+
+    '''Book-keeping after `move` caused a beta cutoff. Only quiet moves are recorded: captures are well ordered by MVV-LVA already. The quiet moves tried before it, which failed to cut, lose as much history score as it gains. Scores move with "gravity": every update is scaled down by how close the score already is to the bound it goes towards, so that they stay within HISTORY_LIMIT on both sides and an old score is quickly overturned by recent results'''
+    def update(self, move: Move, depth: int, ply: int, white_to_move: bool, quiets_tried: Sequence[Move] = ()) -> None:
+        if not is_quiet(move):
+            return
+
+        ## KILLERS ##
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move.code:
+                killers[1:] = killers[:-1]
+                killers[0] = move.code
+
+        ## HISTORY ##
+        side = (not white_to_move) << 12
+        bonus = min(depth * depth, HISTORY_LIMIT)
+        self._add_history(side | (move.code & 0xFFF), bonus)
+        for other in quiets_tried:
+            if other.code != move.code:
+                self._add_history(side | (other.code & 0xFFF), -bonus)
+    ##
+
+    def _add_history(self, index: int, bonus: int) -> None:
+        h = self.history[index]
+        self.history[index] = h + bonus - h * abs(bonus) // HISTORY_LIMIT
+    ##
+
+    '''Sorts a whole move list, best candidates first: hash move, captures and promotions by MVV-LVA, killers, then quiet moves by history. Meant for searches that work on full lists, see MovePicker.pick_moves for the staged version'''
+    def order_moves(self, moves: List[Move], white_to_move: bool, hash_move: int = 0, ply: int = 0) -> List[Move]:
+        killers = self.killers_at(ply)
+        def key(move: Move) -> int:
+            if move.code == hash_move:
+                return -(1 << 30)
+            if not is_quiet(move):
+                return -(1 << 28) - mvv_lva(move)
+            if move.code in killers:
+                return -(1 << 26) + killers.index(move.code)
+            return -self.history_score(move, white_to_move)
+        return sorted(moves, key=key)
+    ##
+##
@@ -0,0 +1,70 @@
+'''Staged move picker for the search. Instead of generating every valid move of a position up front, moves are handed out in stages, and each stage is only generated once the previous one is exhausted:
+
+    1. the hash move, the best move the transposition table knows for this position
+    2. captures and promotions, by MVV-LVA
+    3. killer moves, quiet moves that caused a cutoff in sibling positions
+    4. all the remaining quiet moves, by history score when a MoveOrdering is given (see MoveOrdering.py)
+
+Alpha-beta cutoffs mostly happen on one of the first moves tried, so that the search often stops before the quiet moves are even generated. Hash and killer moves come from other positions, so they are checked against the moves of their own piece only, which is much cheaper than a full generation.
+'''
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from ChessEngine import GameState, Move, ALL_MOVES, NOISY_MOVES, QUIET_MOVES
+from MoveOrdering import MoveOrdering, is_bad_capture, mvv_lva
+
+
+
+'''Staged moves of `game`, ready to be iterated. Legality constraints (in_check, pins, ...) are computed right away, so that game.in_check tells whether the position is a checkmate or a stalemate when no move comes out'''
+def pick_moves(game: GameState, hash_move: int = 0, killers: Sequence[int] = (), ordering: Optional[MoveOrdering] = None) -> Iterator[Move]:
+    legality = game.update_legality()
+    return _staged_moves(game, legality, hash_move, killers, ordering)
+##
+
+'''The generator behind pick_moves. The position is searched in between two moves, which overwrites the legality constraints stored in the game: we give them back at every stage'''
+def _staged_moves(game: GameState, legality: Tuple[bool, list, list, List[bool]], hash_move: int, killers: Sequence[int], ordering: Optional[MoveOrdering]) -> Iterator[Move]:
+
+    ## 1. HASH MOVE ##
+    if hash_move:
+        move = _find_move(game, hash_move, ALL_MOVES, legality)
+        if move is not None:
+            yield move
+
+    ## 2. CAPTURES AND PROMOTIONS ##
+    captures = game.get_stage_moves(NOISY_MOVES, legality)
+    captures.sort(key=mvv_lva, reverse=True)
+    bad_captures: List[Move] = []
+    for move in captures:
+        if move.code == hash_move:
+            continue
+        if is_bad_capture(move, legality[3]):
+            bad_captures.append(move)
+        else:
+            yield move
+
+    ## 3. KILLER MOVES ##
+    for killer in killers:
+        if killer and killer != hash_move:
+            move = _find_move(game, killer, QUIET_MOVES, legality)
+            if move is not None:
+                yield move
+
+    ## 4. QUIET MOVES ##
+    quiets = game.get_stage_moves(QUIET_MOVES, legality)
+    if ordering is not None:
+        white_to_move = game.white_to_move
+        quiets.sort(key=lambda move: ordering.history_score(move, white_to_move), reverse=True)
+    for move in quiets:
+        if move.code != hash_move and move.code not in killers:
+            yield move
+
+    ## 5. BAD CAPTURES ##
+    yield from bad_captures
+##
+
+'''The valid move of the given stage with the given code, if any, looked for among the moves of the piece on its start square'''
+def _find_move(game: GameState, code: int, stage: int, legality: Tuple[bool, list, list, List[bool]]) -> Optional[Move]:
+    for move in game.get_stage_moves(stage, legality, square=divmod(code & 63, 8)):
+        if move.code == code:
+            return move
+    return None
+##
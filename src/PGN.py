@@ -0,0 +1,252 @@
+'''PGN (Portable Game Notation) reading and writing, for game collections of any size.
+
+The reader is a generator: the input, a path, an open file or an mmap, is consumed line by line and games are yielded one at a time, so memory only ever holds the game being read. Games come out as PGNGame, their tags and their moves as SAN strings, and are only played on a GameState when asked to (PGNGame.replay): skimming the tags of a database costs no move generation at all.
+
+SAN (Standard Algebraic Notation, Nf3, exd5, O-O, e8=Q+) depends on the position, since a move only gets as many disambiguation characters as needed. parse_san resolves a SAN string against get_valid_moves, move_to_san writes one, and write_game streams the move_log of a game out as PGN.
+
+    with open('games.pgn') as f:
+        for pgn_game in read_games(f):
+            game = pgn_game.replay()
+'''
+import mmap
+import re
+from typing import Dict, IO, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from ChessEngine import GameState, Move, START_FEN, EMPTY, KIND_MASK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result') #tags every PGN game carries, in this order
+LINE_LENGTH: int = 80
+
+SAN_LETTERS: Dict[int, str] = {KNIGHT: 'N', BISHOP: 'B', ROOK: 'R', QUEEN: 'Q', KING: 'K'}
+SAN_KINDS: Dict[str, int] = {v: k for k,v in SAN_LETTERS.items()}
+
+_TAG = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_TOKEN = re.compile(r'\{[^}]*\}?|;[^\n]*|[()]|\$\d+|[^\s(){};]+') #comments, variations, NAGs, and everything else
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+_SAN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+
+
+## SAN ##
+
+'''The valid move of `game` written as `san`. Check and annotation suffixes (+, #, !, ?) are ignored, castling may be written with zeros. Raises ValueError when no move, or more than one, matches'''
+def parse_san(game: GameState, san: str, moves: Optional[List[Move]] = None) -> Move:
+    moves = moves if moves is not None else game.get_valid_moves()
+    text = san.rstrip('+#!?')
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        candidates = [move for move in moves if (move.long_castle if len(text) == 5 else move.short_castle)]
+    else:
+        match = _SAN.match(text)
+        if match is None:
+            raise ValueError(f'Invalid SAN move: {san}')
+        letter, from_file, from_rank, to_square, promotion = match.groups()
+        kind = SAN_KINDS[letter] if letter else PAWN
+        end_sq = 8*Move.RANKS_TO_ROWS[to_square[1]] + Move.FILES_TO_COLS[to_square[0]]
+        flag = SAN_KINDS[promotion] if promotion else None
+
+        candidates = [
+            move for move in moves
+            if move.end_sq == end_sq and move.piece_moved & KIND_MASK == kind
+            and (from_file is None or move.start_col == Move.FILES_TO_COLS[from_file])
+            and (from_rank is None or move.start_row == Move.RANKS_TO_ROWS[from_rank])
+            and (move.pawn_promotion[1] & KIND_MASK if move.pawn_promotion[0] else None) == flag
+        ]
+
+    if len(candidates) != 1:
+        raise ValueError(f'{"Ambiguous" if candidates else "Illegal"} SAN move {san} in {game.to_fen()}')
+    return candidates[0]
+##
+
+'''SAN of `move`, a valid move of `game` not played yet. The move is played and taken back to tell checks and mates apart'''
+def move_to_san(game: GameState, move: Move, moves: Optional[List[Move]] = None) -> str:
+    moves = moves if moves is not None else game.get_valid_moves()
+
+    if move.short_castle:
+        san = 'O-O'
+    elif move.long_castle:
+        san = 'O-O-O'
+    else:
+        kind = move.piece_moved & KIND_MASK
+        capture = move.piece_captured != EMPTY or move.en_passant
+        target = move.get_rank_file(move.end_row, move.end_col)
+
+        if kind == PAWN:
+            san = (Move.COLS_TO_FILES[move.start_col] + 'x' if capture else '') + target
+            if move.pawn_promotion[0]:
+                san += '=' + SAN_LETTERS[move.pawn_promotion[1] & KIND_MASK]
+        else:
+            #disambiguation: the file if enough, else the rank, else both
+            rivals = [other for other in moves if other.end_sq == move.end_sq and other.start_sq != move.start_sq and other.piece_moved == move.piece_moved]
+            origin = ''
+            if rivals:
+                if all(other.start_col != move.start_col for other in rivals):
+                    origin = Move.COLS_TO_FILES[move.start_col]
+                elif all(other.start_row != move.start_row for other in rivals):
+                    origin = Move.ROWS_TO_RANKS[move.start_row]
+                else:
+                    origin = move.get_rank_file(move.start_row, move.start_col)
+            san = SAN_LETTERS[kind] + origin + ('x' if capture else '') + target
+
+    game.make_move(move)
+    replies = game.get_valid_moves()
+    if game.in_check:
+        san += '+' if replies else '#'
+    game.undo_move()
+    return san
+##
+
+
+
+## READING ##
+
+class PGNGame(NamedTuple):
+    tags: Dict[str, str]
+    moves: List[str] #SAN, as written in the file
+    result: str
+
+    '''The final position of the game, played from its FEN tag if any, from the start position otherwise. Raises ValueError on illegal moves'''
+    def replay(self) -> GameState:
+        game = GameState(self.tags.get('FEN', START_FEN))
+        for san in self.moves:
+            game.make_move(parse_san(game, san))
+        return game
+    ##
+##
+
+'''Lines of a path, of a text or binary file, or of an mmap, decoded one at a time'''
+def _lines(source: Union[str, IO, mmap.mmap]) -> Iterator[str]:
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from _lines(f)
+        return
+    lines = iter(source.readline, b'') if isinstance(source, mmap.mmap) else source
+    for line in lines:
+        yield line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+##
+
+'''Turns the movetext of a game into SAN moves and its result. Comments, variations, NAGs and move numbers are dropped'''
+def _parse_movetext(movetext: str) -> Tuple[List[str], str]:
+    moves: List[str] = []
+    result = '*'
+    depth = 0 #nesting of variations
+    for token in _TOKEN.findall(movetext):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(depth - 1, 0)
+        elif depth or token[0] in '{;$':
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            token = _MOVE_NUMBER.sub('', token) #numbers may be glued to the move, as in 1.e4
+            if token and not token.isdigit():
+                moves.append(token)
+    return moves, result
+##
+
+'''Games of a PGN collection, yielded one at a time. `source` is a path, an open file (text or binary) or an mmap'''
+def read_games(source: Union[str, IO, mmap.mmap]) -> Iterator[PGNGame]:
+    tags: Dict[str, str] = {}
+    movetext: List[str] = []
+    in_comment = False #a brace comment may span several lines, which must not be taken as tags
+
+    for line in _lines(source):
+        line = line.lstrip('\ufeff') #byte order mark of some exports
+        stripped = line.strip()
+
+        if not in_comment and stripped.startswith('['):
+            if movetext: #tags after moves: a new game starts
+                yield PGNGame(tags, *_parse_movetext(''.join(movetext)))
+                tags, movetext = {}, []
+            match = _TAG.match(stripped)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            continue
+        if line.startswith('%'): #escape mechanism, the line is to be ignored
+            continue
+
+        if stripped:
+            movetext.append(line if line.endswith('\n') else line + '\n')
+            in_comment = _still_in_comment(line, in_comment)
+
+    if movetext or tags:
+        yield PGNGame(tags, *_parse_movetext(''.join(movetext)))
+##
+
+def _still_in_comment(line: str, in_comment: bool) -> bool:
+    for char in line:
+        if in_comment:
+            in_comment = char != '}'
+        elif char == '{':
+            in_comment = True
+        elif char == ';':
+            break
+    return in_comment
+##
+
+
+
+## WRITING ##
+
+'''The move_log of `game` in SAN, together with the side to move and the fullmove number of its first position, and that position as FEN. The game is taken back to its first position and played again: it is left as it was'''
+def _replay_san(game: GameState) -> Tuple[List[str], str, bool, int]:
+    played = list(game.move_log)
+    for _ in played:
+        game.undo_move()
+    first = (game.to_fen(), game.white_to_move, game.fullmove_number)
+
+    sans: List[str] = []
+    for move in played:
+        sans.append(move_to_san(game, move))
+        game.make_move(move)
+    return (sans, *first)
+##
+
+'''SAN of every move of the move_log of `game`'''
+def san_moves(game: GameState) -> List[str]:
+    return _replay_san(game)[0]
+##
+
+'''Writes `game` as a PGN game: the seven tag roster (unknown values as '?'), then any other tag, the starting FEN when it is not the start position, and the moves of move_log in SAN. Call it once per game on an open file to stream a whole collection out'''
+def write_game(out: IO[str], game: GameState, tags: Optional[Dict[str, str]] = None, result: str = '*') -> None:
+    sans, first_fen, white, number = _replay_san(game)
+
+    tags = dict(tags or {})
+    tags['Result'] = result
+    header = {name: tags.pop(name, '????.??.??' if name == 'Date' else '?') for name in SEVEN_TAG_ROSTER}
+    header.update(tags)
+    if first_fen != START_FEN:
+        header['SetUp'], header['FEN'] = '1', first_fen
+    for name, value in header.items():
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        out.write(f'[{name} "{value}"]\n')
+    out.write('\n')
+
+    ## MOVETEXT ##
+    tokens: List[str] = []
+    for i, san in enumerate(sans): #move numbers stay on the line of their move
+        if white:
+            tokens.append(f'{number}. {san}')
+        elif i == 0:
+            tokens.append(f'{number}... {san}')
+        else:
+            tokens.append(san)
+        if not white:
+            number += 1
+        white = not white
+    tokens.append(result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            out.write(line + '\n')
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    out.write(line + '\n\n')
+##
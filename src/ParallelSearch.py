@@ -0,0 +1,162 @@
+'''Lazy SMP: the same root searched by several processes at once, sharing one transposition table.
+
+Python threads never run the search in parallel, processes do. Every worker owns a Searcher whose table is attached to the same multiprocessing.shared_memory block, and all of them search the root independently; what one worker stores, the others find when they reach the same position through the shared table. Workers run into each other's cutoffs and hash moves, so that together they reach a given depth sooner than a single process, without any explicit split of the tree. To make them diverge, odd workers search one ply deeper than asked.
+
+The first worker done ends the search: the others are stopped through a shared event, and the result of the deepest completed iteration among them all is kept. This only makes sense if the workers really search at the same time, so they are exactly `workers` processes started once and kept for the whole life of the searcher, each with a task queue of its own that receives one root per search (a process pool might run two tasks of the same search one after the other).
+
+    with ParallelSearcher(workers=8) as searcher:
+        result = searcher.search(game, max_depth=6)
+
+From the command line, time-to-depth for 1, 2, ... up to --workers processes:
+
+    python ParallelSearch.py --depth 5 --workers 8
+'''
+import argparse
+import os
+import time
+from multiprocessing import Event, Process, SimpleQueue, shared_memory
+from multiprocessing.synchronize import Event as EventType
+from typing import List, Optional, Tuple, Union
+
+from ChessEngine import GameState, Move, FEN_to_chess
+from Search import Searcher, SearchResult, MAX_DEPTH
+from TranspositionTable import TranspositionTable, table_bytes
+
+
+
+'''Per process state of the workers, set by _init_worker'''
+_searcher: Optional[Searcher] = None
+_stop: Optional[EventType] = None
+_shm: Optional[shared_memory.SharedMemory] = None
+
+
+
+'''A Searcher that also stops when the shared event is set by the main process'''
+class _WorkerSearcher(Searcher):
+
+    def _check_limits(self) -> None:
+        if _stop is not None and _stop.is_set():
+            self.stop_requested = True
+        super()._check_limits()
+    ##
+##
+
+def _init_worker(shm_name: str, tt_size_mb: int, stop: EventType) -> None:
+    global _searcher, _stop, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _stop = stop
+    _searcher = _WorkerSearcher(tt=TranspositionTable(tt_size_mb, buffer=_shm.buf))
+##
+
+'''Worker side: searches the packed position (see GameState.pack), and sends back the result as move codes, since moves only make sense next to their position'''
+def _search_root(args: Tuple[bytes, int, Optional[float], int]) -> Tuple[int, int, int, List[int], int]:
+    payload, depth, time_limit, generation = args
+    game: GameState = GameState.unpack(payload)
+    _searcher.tt.generation = generation #every worker ages entries the same way, whatever the number of searches it took part in
+    result = _searcher.search(game, max_depth=depth, time_limit=time_limit)
+    return (result.move.code if result.move is not None else 0), result.score, result.depth, [move.code for move in result.pv], result.nodes
+##
+
+'''Body of a worker process: searches every root it receives on `tasks`, until None, and puts (worker index, result) on `results`. An exception is sent back in place of the result, so that the main process never waits for a result that will not come'''
+def _worker_loop(index: int, shm_name: str, tt_size_mb: int, stop: EventType, tasks: SimpleQueue, results: SimpleQueue) -> None:
+    _init_worker(shm_name, tt_size_mb, stop)
+    while (task := tasks.get()) is not None:
+        try:
+            results.put((index, _search_root(task)))
+        except Exception as error:
+            results.put((index, error))
+    _searcher.tt.table.release()
+    _shm.close()
+##
+
+
+
+class ParallelSearcher():
+
+    def __init__(self, workers: int = os.cpu_count() or 1, tt_size_mb: int = 64) -> None:
+        self.workers = workers
+        self._shm = shared_memory.SharedMemory(create=True, size=table_bytes(tt_size_mb))
+        self.tt = TranspositionTable(tt_size_mb, buffer=self._shm.buf) #the main process only keeps the generation and clears the table
+        self._stop = Event()
+        self._tasks: List[SimpleQueue] = [SimpleQueue() for _ in range(workers)]
+        self._results = SimpleQueue()
+        self._processes: List[Process] = [Process(target=_worker_loop, args=(i, self._shm.name, tt_size_mb, self._stop, self._tasks[i], self._results), daemon=True) for i in range(workers)]
+        for process in self._processes:
+            process.start()
+    ##
+
+    '''Searches `game` over all the workers, same interface as Searcher.search. The position is left as it was given'''
+    def search(self, game: GameState, max_depth: int = MAX_DEPTH, time_limit: Optional[float] = None) -> SearchResult:
+        start = time.perf_counter()
+        self._stop.clear()
+        self.tt.new_search()
+        payload = game.pack() #a position is all the workers need, without the history a pickle would carry
+
+        for i, tasks in enumerate(self._tasks):
+            tasks.put((payload, min(max_depth + (i & 1), MAX_DEPTH), time_limit, self.tt.generation))
+        results: List[Optional[Union[Tuple[int, int, int, List[int], int], Exception]]] = [None] * self.workers
+        index, results[index] = self._results.get() #the first worker done stops the others
+        self._stop.set()
+        for _ in range(self.workers - 1):
+            index, results[index] = self._results.get()
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        code, score, depth, pv_codes, _ = max(results, key=lambda result: result[2]) #deepest iteration, the first worker wins ties
+        nodes = sum(result[4] for result in results)
+        return SearchResult(Move.from_code(code, game) if code else None, score, depth, self._replay_pv(game, pv_codes), nodes, time.perf_counter() - start)
+    ##
+
+    '''Moves of the principal variation, each one built in its own position'''
+    def _replay_pv(self, game: GameState, codes: List[int]) -> List[Move]:
+        pv: List[Move] = []
+        for code in codes:
+            move = Move.from_code(code, game)
+            game.make_move(move) #which also looks up the pieces of the move, while the board is in the right position
+            pv.append(move)
+        for _ in pv:
+            game.undo_move()
+        return pv
+    ##
+
+    def clear(self) -> None:
+        self.tt.clear()
+    ##
+
+    def close(self) -> None:
+        self._stop.set()
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join()
+        self.tt.table.release() #the shared block can not be closed while a view on it is alive
+        self._shm.close()
+        self._shm.unlink()
+    ##
+
+    def __enter__(self) -> 'ParallelSearcher':
+        return self
+    ##
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+    ##
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time-to-depth of the Lazy SMP search for an increasing number of worker processes')
+    parser.add_argument('--fen', default=None)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    game = FEN_to_chess(args.fen) if args.fen else GameState()
+    counts = sorted({1 << i for i in range(args.workers.bit_length()) if 1 << i <= args.workers} | {args.workers})
+    for workers in counts:
+        with ParallelSearcher(workers) as searcher:
+            result = searcher.search(game, max_depth=args.depth)
+        print(f'workers {workers:>3}  depth {result.depth}  score {result.score}  nodes {result.nodes:>9}  time {result.time:6.2f}s  best {result.move}')
+##
@@ -0,0 +1,131 @@
+'''Perft (performance test) driver. It walks the legal moves tree of a position down to a given depth and counts the leaf nodes: comparing those counts against the well known reference values is the standard way to validate a move generator, and timing them gives the raw throughput of get_valid_moves/make_move/undo_move.
+
+Any backend exposing those three methods can be tested, positions are always given as FEN strings. From the command line:
+
+    python Perft.py --depth 4                           #start position
+    python Perft.py --fen "<fen>" --depth 3 --divide    #per root move counts
+    python Perft.py --suite --depth 3 --workers 8       #reference positions, root moves split across 8 processes
+'''
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from ChessEngine import FEN_to_chess
+from Bitboard import BitboardGameState
+
+
+
+START_FEN: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+'''Reference positions with their known node counts at depth 1, 2, 3, ... (from the Chess Programming Wiki "Perft Results" page). Each one stresses a different part of the generator: kiwipete castling and pins, position 3 en passant and discovered checks along ranks, position 4 promotions and checks, position 5 promotions with captures.'''
+REFERENCE_POSITIONS: List[Tuple[str, str, List[int]]] = [
+    ('start', START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890, 3894594]),
+]
+
+'''Every backend is described by the function building it from a FEN string'''
+BACKENDS: Dict[str, Callable] = {
+    'mailbox': FEN_to_chess,
+    'bitboard': BitboardGameState.from_fen,
+}
+
+
+
+'''Count the leaf nodes of the legal moves tree. At depth 1 we simply count the generated moves instead of playing them (bulk counting), which is what every reference table assumes anyway'''
+def perft(game, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = game.get_valid_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        game.make_move(move)
+        nodes += perft(game, depth-1)
+        game.undo_move()
+    return nodes
+##
+
+'''Perft split by root move. Keys are coordinate notations of the moves (e.g. e2e4, e7e8q), so the output can be diffed line by line against any other engine's divide to locate the offending move'''
+def divide(game, depth: int) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for move in game.get_valid_moves():
+        game.make_move(move)
+        counts[move.get_uci_notation()] = perft(game, depth-1)
+        game.undo_move()
+    return counts
+##
+
+'''Worker side of the parallel split. Positions cross the process boundary as FEN strings and root moves as their index inside get_valid_moves, which is deterministic for a given position'''
+def _perft_root_move(args: Tuple[str, str, int, int]) -> Tuple[str, int]:
+    backend, fen, move_index, depth = args
+    game = BACKENDS[backend](fen)
+    move = game.get_valid_moves()[move_index]
+    game.make_move(move)
+    return move.get_uci_notation(), perft(game, depth-1)
+##
+
+'''Same as divide, but root moves are distributed over a pool of `workers` processes. Worth it from depth 4 on, below that spawning the pool costs more than the search itself'''
+def parallel_divide(fen: str, depth: int, workers: int, backend: str = 'mailbox') -> Dict[str, int]:
+    root_moves = len(BACKENDS[backend](fen).get_valid_moves())
+    tasks = [(backend, fen, i, depth) for i in range(root_moves)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_perft_root_move, tasks))
+##
+
+def run_perft(fen: str, depth: int, backend: str = 'mailbox', workers: int = 1) -> Dict[str, int]:
+    if workers > 1:
+        return parallel_divide(fen, depth, workers, backend)
+    return divide(BACKENDS[backend](fen), depth)
+##
+
+'''Run the reference positions up to `max_depth` and report for each of them whether the node count matches, together with the nodes per second. Returns True if every count matched'''
+def run_suite(max_depth: int, backend: str = 'mailbox', workers: int = 1) -> bool:
+    all_passed = True
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        for depth, expected in enumerate(expected_counts[:max_depth], start=1):
+            start = time.perf_counter()
+            nodes = sum(run_perft(fen, depth, backend, workers).values())
+            elapsed = time.perf_counter() - start
+
+            passed = nodes == expected
+            all_passed = all_passed and passed
+            print(f'{name:<10} depth {depth}  {nodes:>10} / {expected:<10} {"OK  " if passed else "FAIL"}  {elapsed:7.2f}s  {nodes / max(elapsed, 1e-9):>10.0f} nodes/s')
+    return all_passed
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count leaf nodes of the legal moves tree')
+    parser.add_argument('--fen', default=START_FEN)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--backend', choices=BACKENDS.keys(), default='mailbox')
+    parser.add_argument('--workers', type=int, default=1, help='split root moves across this many processes')
+    parser.add_argument('--divide', action='store_true', help='print node counts for every root move')
+    parser.add_argument('--suite', action='store_true', help='run the reference positions up to --depth')
+    args = parser.parse_args()
+
+    if args.suite:
+        ok = run_suite(args.depth, args.backend, args.workers)
+        print('ALL OK' if ok else 'SOME COUNTS DO NOT MATCH')
+
+    else:
+        start = time.perf_counter()
+        counts = run_perft(args.fen, args.depth, args.backend, args.workers)
+        elapsed = time.perf_counter() - start
+
+        if args.divide:
+            for move, nodes in sorted(counts.items()):
+                print(f'{move}: {nodes}')
+        total = sum(counts.values())
+        print(f'\nNodes searched: {total}')
+        print(f'Time: {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} nodes/s)')
+##
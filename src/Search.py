@@ -0,0 +1,331 @@
+'''Alpha-beta search on top of GameState. The searcher only relies on get_valid_moves, make_move, undo_move and zobrist_key, and looks for the best move with a negamax alpha-beta driven by iterative deepening: depth 1, 2, 3, ... are searched in turn until the depth or time budget runs out. Every iteration seeds the transposition table with the best moves of the previous one, which are then tried first, so the deeper searches prune much more than a plain fixed depth search would.
+
+Leaf nodes are not evaluated as they are: a quiescence search first plays out captures and promotions until the position is quiet, so that the evaluation never stops in the middle of an exchange (the horizon effect).
+
+Scores are in centipawns from the point of view of the side to move. Mates are scored as MATE - plies to mate, so that shorter mates are preferred.
+'''
+import argparse
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from ChessEngine import GameState, Move, FEN_to_chess, MAILBOX_SQUARES, ALL_MOVES, NOISY_MOVES, KIND_MASK, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from TranspositionTable import TranspositionTable, encode_move, EXACT, LOWER, UPPER
+from MovePicker import pick_moves
+from MoveOrdering import MoveOrdering, PIECE_VALUES, is_quiet, is_bad_capture, mvv_lva
+from Evaluation import evaluate
+from Tablebase import Tablebases
+
+
+
+INFINITY: int = 1_000_000
+MATE: int = 100_000
+MATE_BOUND: int = MATE - 1000 #any score above this is a mate score
+MAX_DEPTH: int = 64
+CHECK_EVERY: int = 64 #nodes between two looks at the clock and at stop requests, a power of 2 (quiescence nodes cost up to a millisecond or so)
+
+DELTA_MARGIN: int = 200 #delta pruning: a capture that can not bring the score within this margin of alpha is not worth searching
+
+
+
+'''Plain material count, from the point of view of the side to move. The default evaluation is the tapered one of Evaluation.py, this one is kept as a simple reference'''
+def material_evaluation(game: GameState) -> int:
+    mailbox = game.mailbox
+    score = 0
+    for idx in MAILBOX_SQUARES:
+        piece = mailbox[idx]
+        if piece & WHITE:
+            score += PIECE_VALUES[piece & KIND_MASK]
+        elif piece & BLACK:
+            score -= PIECE_VALUES[piece & KIND_MASK]
+    return score if game.white_to_move else -score
+##
+
+'''Mate scores depend on the distance from the root, while the transposition table stores positions regardless of where they were met. We store them as distance from the position itself, and convert back when probing'''
+def _score_to_tt(score: int, ply: int) -> int:
+    if score > MATE_BOUND: return score + ply
+    if score < -MATE_BOUND: return score - ply
+    return score
+##
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score > MATE_BOUND: return score - ply
+    if score < -MATE_BOUND: return score + ply
+    return score
+##
+
+
+class SearchResult(NamedTuple):
+    move: Optional[Move]
+    score: int
+    depth: int
+    pv: List[Move]
+    nodes: int
+    time: float
+##
+
+class _SearchAborted(Exception):
+    pass
+##
+
+
+
+class Searcher():
+
+    def __init__(
+            self,
+            tt_size_mb: int = 16,
+            evaluate: Callable[[GameState], int] = evaluate,
+            move_ordering: bool = True,
+            tt: Optional[TranspositionTable] = None,
+            tablebases: Optional[Tablebases] = None,
+    ) -> None:
+        self.tt = tt if tt is not None else TranspositionTable(tt_size_mb) #an existing table can be given to share it, see ParallelSearch.py
+        self.evaluate = evaluate
+        self.tablebases = tablebases #positions found in the endgame tablebases get their exact score, see Tablebase.py
+        self.ordering: Optional[MoveOrdering] = MoveOrdering() if move_ordering else None #killers and history, without them moves only get the hash move and MVV-LVA
+        self.nodes: int = 0
+        self.deadline: Optional[float] = None
+        self.stop_requested: bool = False
+        self._should_stop: Optional[Callable[[], bool]] = None
+        self._root_best: Optional[Tuple[Move, int, List[Move]]] = None #best root move of the running iteration so far, what we play if the search is stopped before depth 1 is complete
+    ##
+
+    '''Ask a running search to return as soon as possible (safe to call from another thread)'''
+    def stop(self) -> None:
+        self.stop_requested = True
+    ##
+
+    ''' Iterative deepening driver. Searches `game` up to `max_depth` plies, or until `time_limit` seconds have elapsed, and returns the best move of the deepest completed iteration together with its score and principal variation. An iteration that gets interrupted is thrown away, apart from what it left in the transposition table. The search may be stopped at any time, even during depth 1: the best root move found so far is returned then (with depth 0).
+
+        The position is left exactly as it was given, flags set by get_valid_moves included.
+    '''
+    def search(
+            self,
+            game: GameState,
+            max_depth: int = MAX_DEPTH,
+            time_limit: Optional[float] = None,
+            on_iteration: Optional[Callable[[SearchResult], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+    ) -> SearchResult:
+
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.stop_requested = False
+        self._should_stop = should_stop #polled with the clock, for callers that may want the search over before it even started (stop would be cleared just above)
+        self._root_best = None
+        self.nodes = 0
+        self.tt.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+
+        saved_flags = (game.checkmate, game.stalemate, game.in_check, game.pins, game.checks)
+        log_length = len(game.move_log)
+        result = SearchResult(None, 0, 0, [], 0, 0.0)
+
+        root_moves = game.get_valid_moves()
+        if len(root_moves) == 1: #forced move, no need to think about it
+            max_depth = 1
+
+        for depth in range(1, max_depth+1):
+            pv: List[Move] = []
+            self._root_best = None
+            try:
+                self._check_limits() #the previous iteration may have used up the time
+                score = self._negamax(game, depth, -INFINITY, INFINITY, 0, pv)
+            except _SearchAborted:
+                while len(game.move_log) > log_length: #unwind whatever the interrupted iteration left on the board
+                    game.undo_move()
+                if result.move is None and self._root_best is not None: #no iteration completed, the partial one is better than nothing
+                    move, score, pv = self._root_best
+                    result = SearchResult(move, score, 0, pv, self.nodes, time.perf_counter() - start)
+                break
+
+            result = SearchResult(pv[0] if pv else None, score, depth, pv, self.nodes, time.perf_counter() - start)
+            if on_iteration is not None:
+                on_iteration(result)
+
+            if abs(score) > MATE_BOUND: #a mate has been found, searching deeper would not change our mind
+                break
+
+        if result.move is None and root_moves: #stopped before the first root move was searched, or mated lines only: pick any legal move
+            result = result._replace(move=root_moves[0])
+
+        game.checkmate, game.stalemate, game.in_check, game.pins, game.checks = saved_flags
+        return result._replace(nodes=self.nodes, time=time.perf_counter() - start)
+    ##
+
+    def _check_limits(self) -> None:
+        if (self.stop_requested or (self._should_stop is not None and self._should_stop()) or (self.deadline is not None and time.perf_counter() > self.deadline)):
+            raise _SearchAborted()
+    ##
+
+    def _negamax(self, game: GameState, depth: int, alpha: int, beta: int, ply: int, pv: List[Move]) -> int:
+        self.nodes += 1
+        if not self.nodes & (CHECK_EVERY - 1):
+            self._check_limits()
+
+        ## TABLEBASES ##
+        if ply > 0 and self.tablebases is not None:
+            result = self.tablebases.probe(game)
+            if result is not None:
+                return result.wdl * (MATE - ply - result.plies) #0 for draws, mate scores counted from the root otherwise
+
+        if depth <= 0: #quiescence probes the table on its own
+            return self._quiescence(game, alpha, beta, ply)
+
+        ## TRANSPOSITION TABLE ##
+        original_alpha = alpha
+        hash_move = 0
+        entry = self.tt.probe(game.zobrist_key)
+        if entry is not None:
+            tt_depth, tt_score, bound, hash_move = entry
+            if ply > 0 and tt_depth >= depth: #at the root we always search, we need the move and not only the score
+                tt_score = _score_from_tt(tt_score, ply)
+                if bound == EXACT or (bound == LOWER and tt_score >= beta) or (bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        #moves come in stages (hash move, captures, killers, quiet moves), see MovePicker.py
+        ordering = self.ordering
+        killers = tuple(ordering.killers_at(ply)) if ordering is not None else ()
+        moves = pick_moves(game, hash_move, killers, ordering)
+        in_check = game.in_check
+        quiets_tried: List[Move] = []
+
+        best_score = -INFINITY
+        best_move: Optional[Move] = None
+        for move in moves:
+            child_pv: List[Move] = []
+            game.make_move(move)
+            score = -self._negamax(game, depth-1, -beta, -alpha, ply+1, child_pv)
+            game.undo_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + child_pv
+                    if ply == 0:
+                        self._root_best = (move, score, pv[:])
+                    if alpha >= beta: #cutoff, the opponent will never allow this line
+                        if ordering is not None:
+                            ordering.update(move, depth, ply, game.white_to_move, quiets_tried)
+                        break
+
+            if ordering is not None and is_quiet(move):
+                quiets_tried.append(move)
+
+        if best_move is None: #no valid move at all
+            return -MATE + ply if in_check else 0
+
+        bound = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self.tt.store(game.zobrist_key, depth, _score_to_tt(best_score, ply), bound, encode_move(best_move) if best_move is not None and bound != UPPER else 0)
+        return best_score
+    ##
+
+    '''Quiescence search: only captures and promotions are searched, until none is left. The side to move may always decline them and keep the static evaluation (stand pat), so the score can only go up from there. When in check there is no such choice: every evasion is searched, and having none is a mate.
+
+        Results go to the transposition table with depth 0, so any entry found answers a quiescence probe. Captures that can only lose material are skipped (see BAD CAPTURES below): they are the bulk of the tree, and the stand pat already covers declining them.
+    '''
+    def _quiescence(self, game: GameState, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if not self.nodes & (CHECK_EVERY - 1):
+            self._check_limits()
+
+        ## TRANSPOSITION TABLE ##
+        original_alpha = alpha
+        entry = self.tt.probe(game.zobrist_key)
+        if entry is not None:
+            _, tt_score, bound, _ = entry
+            tt_score = _score_from_tt(tt_score, ply)
+            if bound == EXACT or (bound == LOWER and tt_score >= beta) or (bound == UPPER and tt_score <= alpha):
+                return tt_score
+
+        in_check, _, _, attacked = game.update_legality()
+        if in_check:
+            stand_pat = -INFINITY
+            moves = game.get_stage_moves(ALL_MOVES)
+            if not moves:
+                return -MATE + ply
+
+        else:
+            ## STAND PAT ##
+            stand_pat = self.evaluate(game)
+            if stand_pat >= beta:
+                self.tt.store(game.zobrist_key, 0, _score_to_tt(stand_pat, ply), LOWER)
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = game.get_stage_moves(NOISY_MOVES)
+            moves.sort(key=mvv_lva, reverse=True)
+
+        best_score = stand_pat
+        best_move: Optional[Move] = None
+        for move in moves:
+            if not in_check:
+                ## DELTA PRUNING ##
+                gain = PIECE_VALUES[PAWN] if move.en_passant else PIECE_VALUES[move.piece_captured & KIND_MASK]
+                promotion = move.pawn_promotion[0]
+                if promotion:
+                    gain += PIECE_VALUES[move.pawn_promotion[1] & KIND_MASK] - PIECE_VALUES[PAWN]
+                if stand_pat + gain + DELTA_MARGIN <= alpha: #even winning the piece for free leaves us below alpha
+                    continue
+
+                ## BAD CAPTURES ##
+                if is_bad_capture(move, attacked): #the recapture loses us material
+                    continue
+
+            game.make_move(move)
+            score = -self._quiescence(game, -beta, -alpha, ply+1)
+            game.undo_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        bound = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self.tt.store(game.zobrist_key, 0, _score_to_tt(best_score, ply), bound, encode_move(best_move) if best_move is not None and bound != UPPER else 0)
+        return best_score
+    ##
+##
+
+
+
+
+'''Nodes needed to search every position to a fixed depth, the usual way to measure move ordering: the better the ordering, the fewer the nodes'''
+def bench(fens: List[str], depth: int, move_ordering: bool = True) -> Tuple[int, float]:
+    nodes, elapsed = 0, 0.0
+    for fen in fens:
+        result = Searcher(move_ordering=move_ordering).search(FEN_to_chess(fen), max_depth=depth)
+        nodes += result.nodes
+        elapsed += result.time
+    return nodes, elapsed
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search a position, or benchmark the search on the perft reference positions')
+    parser.add_argument('--fen', default=None)
+    parser.add_argument('--depth', type=int, default=None, help=f'maximum depth, defaults to {MAX_DEPTH} (4 with --bench)')
+    parser.add_argument('--time', type=float, default=1.0, help='seconds per search, ignored by --bench')
+    parser.add_argument('--bench', action='store_true', help='nodes to reach --depth with and without killers and history')
+    parser.add_argument('--tablebases', default=None, help='directory of tables generated with Tablebase.py')
+    args = parser.parse_args()
+
+    if args.bench:
+        from Perft import REFERENCE_POSITIONS
+        fens = [args.fen] if args.fen else [fen for _, fen, _ in REFERENCE_POSITIONS]
+        depth = args.depth or 4
+        for move_ordering in (False, True):
+            nodes, elapsed = bench(fens, depth, move_ordering)
+            print(f'move ordering {"on " if move_ordering else "off"}  depth {depth}  nodes {nodes:>10}  time {elapsed:6.2f}s')
+
+    else:
+        game = FEN_to_chess(args.fen) if args.fen else GameState()
+        result = Searcher(tablebases=Tablebases(args.tablebases) if args.tablebases else None).search(game, max_depth=args.depth or MAX_DEPTH, time_limit=args.time, on_iteration=lambda r: print(f'depth {r.depth}  score {r.score}  nodes {r.nodes}  time {r.time:.2f}s  pv {" ".join(m.get_uci_notation() for m in r.pv)}'))
+        print('best move:', result.move)
+##
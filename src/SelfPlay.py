@@ -0,0 +1,169 @@
+'''Self-play game generator, to produce training data. Games are played from the start position by a move-selection policy:
+
+    - random:  uniformly random legal moves
+    - search:  the best move of a fixed depth Searcher, after a few random opening moves so that games do not all repeat
+
+Games are sharded across a ProcessPoolExecutor in chunks of consecutive game numbers, and every game seeds a random generator of its own with base seed + game number (the random module itself is never touched): the games played do not depend on the number of workers nor on the order in which chunks complete, and any of them can be replayed alone. Workers share nothing and only send back finished games, as move codes packed in 2 bytes each (see GameRecord), so the throughput grows with the number of cores.
+
+From the command line:
+
+    python SelfPlay.py --games 1000 --workers 32 --out games.bin
+    python SelfPlay.py --games 100 --policy search --depth 2
+'''
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from ChessEngine import GameState, Move, MAILBOX_SQUARES, KIND_MASK, KING, EMPTY
+from Search import Searcher
+
+
+
+WHITE_WINS, DRAW, BLACK_WINS = 1, 0, -1
+RESULT_STRINGS: Dict[int, str] = {WHITE_WINS: '1-0', DRAW: '1/2-1/2', BLACK_WINS: '0-1'}
+
+POLICIES: Tuple[str, ...] = ('random', 'search')
+MAX_PLIES: int = 400 #games still running after this many plies are adjudicated as draws
+REPETITIONS: int = 3
+FIFTY_MOVES_PLIES: int = 100 #plies without captures nor pawn moves that draw the game
+RANDOM_OPENING_PLIES: int = 8 #random moves played before a search policy takes over
+
+_HEADER = struct.Struct('<QbH') #seed, result, number of moves
+
+
+
+'''A finished game in compact form: the seed it was played with, its result (WHITE_WINS, DRAW or BLACK_WINS) and its moves as packed 16-bit Move codes'''
+class GameRecord(NamedTuple):
+    seed: int
+    result: int
+    moves: bytes
+
+    def move_codes(self) -> List[int]:
+        return array('H', self.moves).tolist()
+    ##
+
+    '''The final position of the game, replayed from the start position'''
+    def replay(self) -> GameState:
+        game = GameState()
+        for code in self.move_codes():
+            game.make_move(Move.from_code(code, game))
+        return game
+    ##
+##
+
+
+
+## PLAYING ##
+
+'''Nothing but the two kings left on the board'''
+def _bare_kings(game: GameState) -> bool:
+    mailbox = game.mailbox
+    return all(mailbox[idx] == EMPTY or mailbox[idx] & KIND_MASK == KING for idx in MAILBOX_SQUARES)
+##
+
+'''Plays one game with `policy`, all of its randomness coming from `seed`. Games end on mate, stalemate, threefold repetition, the fifty-move rule, bare kings or after `max_plies`, all but mate being draws'''
+def play_game(seed: int, policy: str = 'random', depth: int = 2, max_plies: int = MAX_PLIES, searcher: Optional[Searcher] = None) -> GameRecord:
+    rng = random.Random(seed)
+    game = GameState()
+    seen: Dict[int, int] = {game.zobrist_key: 1}
+    codes = array('H')
+    result = DRAW
+
+    for ply in range(max_plies):
+        moves = game.get_valid_moves()
+        if not moves:
+            result = (BLACK_WINS if game.white_to_move else WHITE_WINS) if game.in_check else DRAW
+            break
+        if game.halfmove_clock >= FIFTY_MOVES_PLIES: #checked after mate, which wins even on the hundredth ply
+            break
+
+        if policy == 'random' or ply < RANDOM_OPENING_PLIES:
+            game.make_move(moves[rng.randrange(len(moves))])
+        else:
+            searcher = searcher or Searcher(tt_size_mb=1)
+            game.make_move(searcher.search(game, max_depth=depth).move)
+        codes.append(game.move_log[-1].code)
+
+        seen[game.zobrist_key] = seen.get(game.zobrist_key, 0) + 1
+        if seen[game.zobrist_key] >= REPETITIONS or _bare_kings(game):
+            break
+
+    return GameRecord(seed, result, codes.tobytes())
+##
+
+'''Worker side: plays the games numbered [first, first + count), with one searcher reused across the whole chunk'''
+def _play_chunk(args: Tuple[int, int, int, str, int, int]) -> List[GameRecord]:
+    base_seed, first, count, policy, depth, max_plies = args
+    searcher = Searcher(tt_size_mb=1) if policy == 'search' else None
+    return [play_game(base_seed + n, policy, depth, max_plies, searcher) for n in range(first, first + count)]
+##
+
+'''Plays `games` games over `workers` processes and yields them as soon as their chunk is done, in completion order. Chunks are small enough to keep every worker busy until the end, and large enough that shipping them back costs nothing'''
+def self_play(games: int, workers: int = os.cpu_count() or 1, policy: str = 'random', depth: int = 2, seed: int = 0, chunk_size: int = 0, max_plies: int = MAX_PLIES) -> Iterator[GameRecord]:
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy}, expected one of {POLICIES}")
+    chunk_size = chunk_size or max(1, min(64, games // (4 * workers)))
+    tasks = [(seed, first, min(chunk_size, games - first), policy, depth, max_plies) for first in range(0, games, chunk_size)]
+
+    if workers <= 1:
+        for task in tasks:
+            yield from _play_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(_play_chunk, task) for task in tasks]):
+            yield from future.result()
+##
+
+
+
+## STORAGE ##
+
+def write_game(file: BinaryIO, record: GameRecord) -> None:
+    file.write(_HEADER.pack(record.seed, record.result, len(record.moves) // 2))
+    file.write(record.moves)
+##
+
+'''Streams back the games written by write_game, one at a time'''
+def read_games(file: BinaryIO) -> Iterator[GameRecord]:
+    while header := file.read(_HEADER.size):
+        seed, result, n_moves = _HEADER.unpack(header)
+        yield GameRecord(seed, result, file.read(2 * n_moves))
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate self-play games over a pool of processes')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--depth', type=int, default=2, help='search depth of the search policy')
+    parser.add_argument('--seed', type=int, default=0, help='game n is played with seed + n')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--out', default=None, help='file the games are appended to')
+    args = parser.parse_args()
+
+    out = open(args.out, 'ab') if args.out else None
+    results = {result: 0 for result in RESULT_STRINGS}
+    plies = 0
+    start = time.perf_counter()
+    for n, record in enumerate(self_play(args.games, args.workers, args.policy, args.depth, args.seed, max_plies=args.max_plies), start=1):
+        if out is not None:
+            write_game(out, record)
+        results[record.result] += 1
+        plies += len(record.moves) // 2
+        elapsed = time.perf_counter() - start
+        print(f'\r{n}/{args.games} games  {n / max(elapsed, 1e-9):.1f} games/s  {plies / max(elapsed, 1e-9):.0f} plies/s', end='', file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    if out is not None:
+        out.close()
+    print(f'\n{args.games} games in {elapsed:.2f}s ({args.games / max(elapsed, 1e-9):.1f} games/s)  ' + '  '.join(f'{RESULT_STRINGS[result]}: {count}' for result, count in results.items()))
+##
@@ -0,0 +1,487 @@
+'''Endgame tablebases: exact distance to mate of every position of a small material signature, generated by retrograde analysis and probed through mmap.
+
+Supported signatures are a white king with up to MAX_PIECES - 2 other white pieces against the bare black king (KQK, KRK, KPK, KBNK, ...). Positions with the colours the other way around are probed on the vertically mirrored board. A table covers both sides to move, and is indexed by piece placement,
+
+    index = sum(sq_i * 64 ** (n-1-i))   over the white king, the black king, then the other pieces in KIND_ORDER
+
+so that a table of n pieces holds 2 * 64**n one-byte entries: 0 for draws (and illegal placements), plies to mate + 1 otherwise. The file is a small header followed by the white-to-move and black-to-move halves, see TablebaseFile.
+
+Generation works on NumPy arrays over the whole placement space. Mates are found first, then the analysis walks backwards one ply at a time, on the frontier of positions resolved at the previous ply only: white-to-move positions with a move into a lost position are won, black-to-move positions are lost once every one of their moves leads to a won position, which is tracked with a counter of moves still unresolved. Captures by the black king and promotions lead to smaller signatures, which are generated first.
+
+    python Tablebase.py generate KQK KRK KPK KBNK --dir tablebases
+    python Tablebase.py probe --dir tablebases --fen "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+'''
+import argparse
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ChessEngine import GameState, WHITE, BLACK, EMPTY, KIND_MASK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, MAILBOX_SQUARES
+from Tables import DIRECTIONS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, KNIGHT_JUMPS, BETWEEN, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, ROOK_RAYS, BISHOP_RAYS
+
+
+
+MAX_PIECES: int = 4 #kings included: a table of n pieces takes 2 * 64**n bytes
+KIND_ORDER: List[int] = [QUEEN, ROOK, BISHOP, KNIGHT, PAWN] #order of the pieces in signatures and indexes
+LETTERS: Dict[int, str] = {QUEEN: 'Q', ROOK: 'R', BISHOP: 'B', KNIGHT: 'N', PAWN: 'P'}
+KINDS: Dict[str, int] = {v: k for k,v in LETTERS.items()}
+PHASE: Dict[int, int] = {QUEEN: 4, ROOK: 2, BISHOP: 1, KNIGHT: 1, PAWN: 0} #as in Evaluation.py
+
+TABLEBASE_DIR: str = 'tablebases'
+EXTENSION: str = '.tbd'
+HEADER = struct.Struct('<4sB7s') #magic, number of pieces, kinds of the pieces other than the kings
+MAGIC: bytes = b'CETB'
+
+_CHUNK: int = 1 << 18 #positions handled by a single NumPy operation, to bound memory
+_NEVER: int = 100 #counter of black positions that can not be lost (stalemates, drawing captures)
+
+
+
+## SIGNATURES ##
+
+'''Kinds of the white pieces other than the king, in index order, out of a signature such as KBNK'''
+def parse_signature(signature: str) -> Tuple[int, ...]:
+    if len(signature) < 2 or signature[0] != 'K' or signature[-1] != 'K' or any(letter not in KINDS for letter in signature[1:-1]):
+        raise ValueError(f'Unsupported signature {signature}: a white king, some white pieces and the bare black king are expected, as in KQK')
+    kinds = tuple(sorted((KINDS[letter] for letter in signature[1:-1]), key=KIND_ORDER.index))
+    if len(kinds) + 2 > MAX_PIECES:
+        raise ValueError(f'Signature {signature} has more than {MAX_PIECES} pieces')
+    return kinds
+##
+
+def signature_of(kinds: Sequence[int]) -> str:
+    return 'K' + ''.join(LETTERS[kind] for kind in sorted(kinds, key=KIND_ORDER.index)) + 'K'
+##
+
+
+
+## LOOKUP TABLES ##
+
+def _bit_matrix(masks: Sequence[int]) -> np.ndarray:
+    return np.array([[bool(mask >> t & 1) for t in range(64)] for mask in masks])
+##
+
+KING_ADJ: np.ndarray = _bit_matrix(KING_ATTACKS) #[a, t]: a piece of this kind on a attacks t
+KNIGHT_ADJ: np.ndarray = _bit_matrix(KNIGHT_ATTACKS)
+PAWN_ADJ: np.ndarray = _bit_matrix(PAWN_ATTACKS[0]) #white pawns only
+ROOK_LINE: np.ndarray = _bit_matrix(ROOK_RAYS)
+BISHOP_LINE: np.ndarray = _bit_matrix(BISHOP_RAYS)
+BETWEEN_BITS: np.ndarray = np.array(BETWEEN, dtype=np.uint64)
+
+def _steps(offsets: Sequence[Tuple[int, int]], distance: int = 1) -> np.ndarray:
+    steps = np.full((64, len(offsets)), -1, dtype=np.int64)
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        for d, (i, j) in enumerate(offsets):
+            if 0 <= row + distance*i < 8 and 0 <= col + distance*j < 8:
+                steps[sq, d] = 8*(row + distance*i) + col + distance*j
+    return steps
+##
+
+KING_STEPS: np.ndarray = _steps(DIRECTIONS) #[sq, direction]: square one step away, -1 off the board
+KNIGHT_STEPS: np.ndarray = _steps(KNIGHT_JUMPS)
+RAY_STEPS: List[np.ndarray] = [_steps(DIRECTIONS, distance) for distance in range(1, 8)] #[distance-1][sq, direction]
+SLIDER_DIRECTIONS: Dict[int, Tuple[int, ...]] = {QUEEN: tuple(range(8)), ROOK: ROOK_DIRECTIONS, BISHOP: BISHOP_DIRECTIONS}
+
+
+
+## GENERATION ##
+
+'''True where a white piece of `kind` on `a` attacks `t`, the squares in `blockers` being occupied'''
+def _attacks(kind: int, a: np.ndarray, t: np.ndarray, blockers: Sequence[np.ndarray]) -> np.ndarray:
+    if kind == KNIGHT:
+        return KNIGHT_ADJ[a, t]
+    if kind == PAWN:
+        return PAWN_ADJ[a, t]
+    if kind == KING:
+        return KING_ADJ[a, t]
+    aligned = ROOK_LINE[a, t] if kind == ROOK else BISHOP_LINE[a, t] if kind == BISHOP else ROOK_LINE[a, t] | BISHOP_LINE[a, t]
+    between = BETWEEN_BITS[a, t]
+    for b in blockers:
+        aligned &= (between >> b.astype(np.uint64)) & np.uint64(1) == 0
+    return aligned
+##
+
+def _attacked(t: np.ndarray, kinds: Sequence[int], squares: Sequence[np.ndarray], blockers: Sequence[np.ndarray]) -> np.ndarray:
+    attacked = np.zeros(len(t), dtype=bool)
+    for kind, a in zip(kinds, squares):
+        attacked |= _attacks(kind, a, t, blockers)
+    return attacked
+##
+
+class _Generator():
+
+    def __init__(self, kinds: Tuple[int, ...], tables: Dict[Tuple[int, ...], Tuple[np.ndarray, np.ndarray]]) -> None:
+        self.kinds = kinds
+        self.n = len(kinds) + 2
+        self.size = 64 ** self.n
+        self.weights = [64 ** (self.n - 1 - i) for i in range(self.n)] #index weight of every piece: white king, black king, then kinds
+        self.tables = tables #plies to mate of the smaller signatures, (white to move, black to move), -1 for draws
+    ##
+
+    def decode(self, idx: np.ndarray) -> List[np.ndarray]:
+        return [(idx // w) % 64 for w in self.weights]
+    ##
+
+    '''Index of the positions of another signature, given by the kinds and squares of its pieces other than the kings'''
+    def encode_other(self, wk: np.ndarray, bk: np.ndarray, pieces: List[Tuple[int, np.ndarray]]) -> Tuple[Tuple[int, ...], np.ndarray]:
+        pieces = sorted(pieces, key=lambda piece: KIND_ORDER.index(piece[0]))
+        kinds = tuple(kind for kind, _ in pieces)
+        idx = wk * 64 + bk
+        for _, sq in pieces:
+            idx = idx * 64 + sq
+        return kinds, idx
+    ##
+
+    def other_values(self, kinds: Tuple[int, ...], white_to_move: bool, idx: np.ndarray) -> np.ndarray:
+        if not kinds: #bare kings
+            return np.full(len(idx), -1, dtype=np.int16)
+        return self.tables[kinds][0 if white_to_move else 1][idx]
+    ##
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        for start in range(0, self.size, _CHUNK):
+            yield np.arange(start, min(start + _CHUNK, self.size), dtype=np.int64)
+    ##
+
+    def run(self) -> Tuple[np.ndarray, np.ndarray]:
+        size, kinds = self.size, self.kinds
+        self.dtm_w = np.full(size, -1, dtype=np.int16)
+        self.dtm_b = np.full(size, -1, dtype=np.int16)
+        self.legal_w = np.zeros(size, dtype=bool)
+        self.legal_b = np.zeros(size, dtype=bool)
+        self.counter = np.zeros(size, dtype=np.int8) #black moves not known to lose yet
+        self.capture_events: Dict[int, List[np.ndarray]] = {} #ply -> black positions with a capture into a position won in that many plies
+        self.promotion_events: Dict[int, List[np.ndarray]] = {} #ply -> white positions with a promotion winning in that many plies
+
+        ## 1. LEGALITY, BLACK MOVES, MATES ##
+        for idx in self.chunks():
+            self._scan(idx)
+
+        ## 2. RETROGRADE ANALYSIS ##
+        frontier_b = np.flatnonzero(self.dtm_b == 0)
+        ply = 1
+        while len(frontier_b) or any(level >= ply for level in list(self.capture_events) + list(self.promotion_events)):
+            frontier_w = self._white_wins(frontier_b, ply)
+            frontier_b = self._black_losses(frontier_w, ply)
+            ply += 2
+        return self.dtm_w, self.dtm_b
+    ##
+
+    def _scan(self, idx: np.ndarray) -> None:
+        kinds = self.kinds
+        sq = self.decode(idx)
+        wk, bk, pieces = sq[0], sq[1], sq[2:]
+
+        legal = (wk != bk) & ~KING_ADJ[wk, bk]
+        for i in range(self.n):
+            for j in range(i+1, self.n):
+                legal &= sq[i] != sq[j]
+        for kind, s in zip(kinds, pieces):
+            if kind == PAWN:
+                legal &= (s >= 8) & (s < 56) #no pawn on the first or last rank
+        in_check = _attacked(bk, kinds, pieces, [wk] + pieces)
+        self.legal_w[idx] = legal & ~in_check #the side not to move can not be in check
+        self.legal_b[idx] = legal
+
+        ## BLACK KING MOVES ##
+        counter = np.zeros(len(idx), dtype=np.int8)
+        never = ~legal #illegal positions are never lost, they simply do not exist
+        for d in range(8):
+            dest = KING_STEPS[bk, d]
+            on_board = dest >= 0
+            dest = np.where(on_board, dest, 0)
+            ok = legal & on_board & (dest != wk) & ~KING_ADJ[wk, dest]
+            captured = [dest == s for s in pieces]
+            quiet = ok & ~np.logical_or.reduce(captured) if pieces else ok
+            counter += quiet & ~_attacked(dest, kinds, pieces, [wk] + pieces) #the black king left its square, which does not block any more
+
+            for j, capture in enumerate(captured):
+                capture &= ok
+                if not capture.any():
+                    continue
+                rest = pieces[:j] + pieces[j+1:]
+                rest_kinds = kinds[:j] + kinds[j+1:]
+                capture &= ~_attacked(dest, rest_kinds, rest, [wk] + rest)
+                counter += capture
+                other_kinds, other_idx = self.encode_other(wk[capture], dest[capture], list(zip(rest_kinds, [s[capture] for s in rest])))
+                values = self.other_values(other_kinds, True, other_idx)
+                never[np.flatnonzero(capture)[values < 0]] = True #the capture draws
+                for level in np.unique(values[values >= 0]):
+                    self.capture_events.setdefault(int(level), []).append(idx[capture][values == level])
+
+        self.counter[idx] = np.where(never, _NEVER, counter)
+        mated = legal & in_check & (counter == 0) & ~never
+        self.dtm_b[idx[mated]] = 0
+
+        ## PROMOTIONS ##
+        for j, (kind, s) in enumerate(zip(kinds, pieces)):
+            if kind != PAWN:
+                continue
+            dest = s - 8
+            ok = self.legal_w[idx] & (s >= 8) & (s < 16)
+            for other in [wk, bk] + pieces[:j] + pieces[j+1:]:
+                ok &= other != dest
+            if not ok.any():
+                continue
+            for promoted in (QUEEN, ROOK, BISHOP, KNIGHT):
+                rest = [(k, p[ok]) for i, (k, p) in enumerate(zip(kinds, pieces)) if i != j] + [(promoted, dest[ok])]
+                other_kinds, other_idx = self.encode_other(wk[ok], bk[ok], rest)
+                values = self.other_values(other_kinds, False, other_idx)
+                for level in np.unique(values[values >= 0]):
+                    self.promotion_events.setdefault(int(level) + 1, []).append(idx[ok][values == level])
+    ##
+
+    '''White positions won in `ply` plies: those with a move into a black position lost at ply - 1, and those with a promotion winning in `ply`'''
+    def _white_wins(self, frontier_b: np.ndarray, ply: int) -> np.ndarray:
+        found = [events for events in self.promotion_events.pop(ply, [])]
+        for start in range(0, len(frontier_b), _CHUNK // 8):
+            found.extend(self._white_unmoves(frontier_b[start:start + _CHUNK // 8]))
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(found))
+        candidates = candidates[self.legal_w[candidates] & (self.dtm_w[candidates] < 0)]
+        self.dtm_w[candidates] = ply
+        return candidates
+    ##
+
+    '''Black positions lost in ply + 1 plies: their last unresolved move led to a white position won in `ply` plies'''
+    def _black_losses(self, frontier_w: np.ndarray, ply: int) -> np.ndarray:
+        found = [events for events in self.capture_events.pop(ply, [])]
+        for start in range(0, len(frontier_w), _CHUNK // 8):
+            found.extend(self._black_unmoves(frontier_w[start:start + _CHUNK // 8]))
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        predecessors, moves = np.unique(np.concatenate(found), return_counts=True)
+        keep = self.legal_b[predecessors] & (self.dtm_b[predecessors] < 0) & (self.counter[predecessors] < _NEVER)
+        predecessors, moves = predecessors[keep], moves[keep]
+        self.counter[predecessors] -= moves.astype(np.int8)
+        lost = predecessors[self.counter[predecessors] == 0]
+        self.dtm_b[lost] = ply + 1
+        return lost
+    ##
+
+    '''Positions one white move before `idx` (black to move), white to move'''
+    def _white_unmoves(self, idx: np.ndarray) -> List[np.ndarray]:
+        sq = self.decode(idx)
+        found: List[np.ndarray] = []
+
+        def add(i: int, origin: np.ndarray, valid: np.ndarray) -> None:
+            for j, other in enumerate(sq):
+                if j != i:
+                    valid &= origin != other
+            pred = idx[valid] + (origin[valid] - sq[i][valid]) * self.weights[i]
+            found.append(pred[self.legal_w[pred]])
+
+        for i, kind in enumerate((KING, None) + self.kinds):
+            if kind is None: #the black king does not belong to white
+                continue
+            s = sq[i]
+            if kind in (KING, KNIGHT):
+                steps = KING_STEPS if kind == KING else KNIGHT_STEPS
+                for d in range(steps.shape[1]):
+                    origin = steps[s, d]
+                    add(i, np.where(origin >= 0, origin, 0), origin >= 0)
+            elif kind == PAWN:
+                origin = s + 8 #white pawns walk up the board, towards row 0
+                add(i, np.minimum(origin, 63), origin < 56)
+                origin = s + 16
+                empty = (s >= 32) & (s < 40) #double push from the second rank
+                for j, other in enumerate(sq):
+                    if j != i:
+                        empty &= other != s + 8
+                add(i, np.minimum(origin, 63), empty)
+            else:
+                for d in SLIDER_DIRECTIONS[kind]:
+                    open_ray = np.ones(len(idx), dtype=bool)
+                    for distance in range(7):
+                        origin = RAY_STEPS[distance][s, d]
+                        open_ray &= origin >= 0
+                        origin = np.where(open_ray, origin, 0)
+                        for j, other in enumerate(sq):
+                            if j != i:
+                                open_ray &= origin != other #the ray stops on the first piece
+                        if not open_ray.any():
+                            break
+                        add(i, origin, open_ray.copy())
+        return found
+    ##
+
+    '''Positions one black king move before `idx` (white to move), black to move. There are as many of them as moves leading to `idx`'''
+    def _black_unmoves(self, idx: np.ndarray) -> List[np.ndarray]:
+        sq = self.decode(idx)
+        bk = sq[1]
+        found: List[np.ndarray] = []
+        for d in range(8):
+            origin = KING_STEPS[bk, d]
+            valid = origin >= 0
+            origin = np.where(valid, origin, 0)
+            for j, other in enumerate(sq):
+                if j != 1:
+                    valid &= origin != other
+            pred = idx[valid] + (origin[valid] - bk[valid]) * self.weights[1]
+            found.append(pred[self.legal_b[pred]])
+        return found
+    ##
+##
+
+'''Generates the tables of `kinds` and of every smaller signature it depends on (captures, promotions), those found in `tables` excepted. Returns them all, as plies to mate (-1 for draws) for white and black to move'''
+def generate(kinds: Tuple[int, ...], tables: Optional[Dict[Tuple[int, ...], Tuple[np.ndarray, np.ndarray]]] = None, verbose: bool = False) -> Dict[Tuple[int, ...], Tuple[np.ndarray, np.ndarray]]:
+    tables = tables if tables is not None else {}
+    if not kinds or kinds in tables:
+        return tables
+
+    for j, kind in enumerate(kinds):
+        generate(kinds[:j] + kinds[j+1:], tables, verbose)
+        if kind == PAWN:
+            for promoted in (QUEEN, ROOK, BISHOP, KNIGHT):
+                generate(parse_signature(signature_of(kinds[:j] + kinds[j+1:] + (promoted,))), tables, verbose)
+
+    start = time.perf_counter()
+    tables[kinds] = _Generator(kinds, tables).run()
+    if verbose:
+        dtm_w, dtm_b = tables[kinds]
+        print(f'{signature_of(kinds)}: {int((dtm_w >= 0).sum())} white wins, longest mate {int(max(dtm_w.max(), dtm_b.max()))} plies, {time.perf_counter() - start:.1f}s')
+    return tables
+##
+
+'''Writes a table: header, then plies to mate + 1 (0 for draws) for white to move and for black to move'''
+def write_table(path: str, kinds: Tuple[int, ...], dtm_w: np.ndarray, dtm_b: np.ndarray) -> None:
+    if max(dtm_w.max(), dtm_b.max()) >= 255:
+        raise ValueError('Mates longer than 254 plies do not fit in a byte')
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(kinds) + 2, bytes(kinds)))
+        out.write((dtm_w + 1).astype(np.uint8).tobytes())
+        out.write((dtm_b + 1).astype(np.uint8).tobytes())
+##
+
+
+
+## PROBING ##
+
+class TBResult(NamedTuple):
+    wdl: int #1 the side to move wins, 0 draw, -1 it loses
+    plies: int #plies to mate, with best play from both sides
+##
+
+'''A table file, mapped in memory: probing reads a single byte'''
+class TablebaseFile():
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, kinds = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a tablebase file')
+        self.kinds: Tuple[int, ...] = tuple(kinds[:n-2])
+        self.size: int = 64 ** n
+    ##
+
+    '''Raw entry: plies to mate + 1, 0 for draws'''
+    def entry(self, strong_to_move: bool, idx: int) -> int:
+        return self._map[HEADER.size + (0 if strong_to_move else self.size) + idx]
+    ##
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+    ##
+##
+
+'''All the tables found in a directory, opened when first needed'''
+class Tablebases():
+
+    def __init__(self, directory: str = TABLEBASE_DIR) -> None:
+        self.directory = directory
+        self.available: Dict[Tuple[int, ...], str] = {}
+        for name in (os.listdir(directory) if os.path.isdir(directory) else []):
+            if name.endswith(EXTENSION):
+                self.available[parse_signature(name[:-len(EXTENSION)])] = os.path.join(directory, name)
+        self.files: Dict[Tuple[int, ...], TablebaseFile] = {}
+        self.max_pieces: int = max((len(kinds) + 2 for kinds in self.available), default=0)
+        self.max_phase: int = max((sum(PHASE[kind] for kind in kinds) for kinds in self.available), default=0) #cheap filter on GameState.phase before counting pieces
+    ##
+
+    '''Exact result of `game` from the point of view of the side to move, None if it is not covered by the tables (too many pieces, material on both sides, castling rights)'''
+    def probe(self, game: GameState) -> Optional[TBResult]:
+        if not self.available or game.phase > self.max_phase or game.castling_rights():
+            return None
+
+        ## MATERIAL ##
+        mailbox = game.mailbox
+        pieces: List[Tuple[int, int]] = []
+        for sq, idx in enumerate(MAILBOX_SQUARES):
+            piece = mailbox[idx]
+            if piece != EMPTY:
+                pieces.append((piece, sq))
+                if len(pieces) > self.max_pieces:
+                    return None
+
+        white = [(piece & KIND_MASK, sq) for piece, sq in pieces if piece & WHITE and piece & KIND_MASK != KING]
+        black = [(piece & KIND_MASK, sq) for piece, sq in pieces if piece & BLACK and piece & KIND_MASK != KING]
+        if white and black:
+            return None
+        if not white and not black:
+            return TBResult(0, 0)
+
+        #the tables have the pieces on white's side: otherwise we look at the board upside down, with the colours swapped
+        strong_is_white = bool(white)
+        flip = 0 if strong_is_white else 56
+        strong_king = game.white_king_pos if strong_is_white else game.black_king_pos
+        weak_king = game.black_king_pos if strong_is_white else game.white_king_pos
+        others = sorted(((kind, sq ^ flip) for kind, sq in (white or black)), key=lambda piece: KIND_ORDER.index(piece[0]))
+        kinds = tuple(kind for kind, _ in others)
+        if kinds not in self.available:
+            return None
+        if kinds not in self.files:
+            self.files[kinds] = TablebaseFile(self.available[kinds])
+
+        idx = (8*strong_king[0] + strong_king[1]) ^ flip
+        idx = idx * 64 + ((8*weak_king[0] + weak_king[1]) ^ flip)
+        for _, sq in others:
+            idx = idx * 64 + sq
+        strong_to_move = game.white_to_move == strong_is_white
+        entry = self.files[kinds].entry(strong_to_move, idx)
+        if not entry:
+            return TBResult(0, 0)
+        return TBResult(1 if strong_to_move else -1, entry - 1)
+    ##
+
+    def close(self) -> None:
+        for table in self.files.values():
+            table.close()
+        self.files = {}
+    ##
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate endgame tablebases, or probe a position')
+    commands = parser.add_subparsers(dest='command', required=True)
+    gen = commands.add_parser('generate')
+    gen.add_argument('signatures', nargs='+', help='e.g. KQK KRK KPK KBNK')
+    gen.add_argument('--dir', default=TABLEBASE_DIR)
+    probe = commands.add_parser('probe')
+    probe.add_argument('--fen', required=True)
+    probe.add_argument('--dir', default=TABLEBASE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        os.makedirs(args.dir, exist_ok=True)
+        tables: Dict[Tuple[int, ...], Tuple[np.ndarray, np.ndarray]] = {}
+        for signature in args.signatures:
+            generate(parse_signature(signature), tables, verbose=True)
+        for kinds, (dtm_w, dtm_b) in tables.items():
+            write_table(os.path.join(args.dir, signature_of(kinds) + EXTENSION), kinds, dtm_w, dtm_b)
+        print(f'{len(tables)} tables written to {args.dir}')
+    else:
+        result = Tablebases(args.dir).probe(GameState(args.fen))
+        print('not in the tablebases' if result is None else ['loss', 'draw', 'win'][result.wdl + 1] + (f' in {result.plies} plies' if result.wdl else ''))
+##
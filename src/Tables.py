@@ -0,0 +1,118 @@
+'''Precomputed per-square tables shared by every move generator of the engine. They are built once, when the module is first imported, so that the generators never rebuild directions lists or check board bounds at run time.
+
+Squares are indexed as sq = 8*row + col (row 0 being the 8th rank). Two families of tables are provided:
+    - target lists, used by the mailbox GameState: for every square, the reachable squares already expressed as (mailbox index, (row, col)), ray lists being ordered from the nearest square outwards;
+    - 64-bit masks, used by the bitboard backend: attack sets, rays, and between/line masks.
+'''
+from typing import Dict, List, Tuple
+
+
+
+##################
+## BOARD LAYOUT ##
+##################
+
+'''Directions as (row, col) increments. The first four are rook-like, the last four bishop-like. A direction is "positive" when it walks towards higher square indexes: along such a ray the nearest blocker is the least significant bit of a mask, otherwise the most significant one.'''
+DIRECTIONS: List[Tuple[int, int]] = [(-1,0), (1,0), (0,-1), (0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
+ROOK_DIRECTIONS: Tuple[int, ...] = (0, 1, 2, 3)
+BISHOP_DIRECTIONS: Tuple[int, ...] = (4, 5, 6, 7)
+POSITIVE: List[bool] = [8*i + j > 0 for i, j in DIRECTIONS]
+
+KNIGHT_JUMPS: List[Tuple[int, int]] = [(i, j) for i in (-2,-1,1,2) for j in (-2,-1,1,2) if abs(i) != abs(j)]
+
+'''The 10x12 mailbox of GameState: square (row, col) lives at index 21 + 10*row + col, the border being filled with sentinels'''
+def mailbox_index(row: int, col: int) -> int:
+    return 21 + 10*row + col
+##
+
+SQUARE_TO_ROW_COL: List[Tuple[int, int]] = [divmod(sq, 8) for sq in range(64)]
+SQUARE_TO_MAILBOX: List[int] = [mailbox_index(row, col) for row, col in SQUARE_TO_ROW_COL]
+MAILBOX_SQUARES: List[int] = SQUARE_TO_MAILBOX
+MAILBOX_TO_ROW_COL: Dict[int, Tuple[int, int]] = {idx: rc for idx, rc in zip(SQUARE_TO_MAILBOX, SQUARE_TO_ROW_COL)}
+MAILBOX_TO_SQUARE: List[int] = [SQUARE_TO_MAILBOX.index(idx) if idx in SQUARE_TO_MAILBOX else -1 for idx in range(120)] #-1 on the sentinels
+
+def _on_board(row: int, col: int) -> bool:
+    return 0 <= row <= 7 and 0 <= col <= 7
+##
+
+
+
+##################
+## TARGET LISTS ##
+##################
+
+Target = Tuple[int, Tuple[int, int]] #(mailbox index, (row, col))
+
+def _target(row: int, col: int) -> Target:
+    return (mailbox_index(row, col), (row, col))
+##
+
+def _build_ray_targets() -> List[List[List[Target]]]:
+    rays: List[List[List[Target]]] = []
+    for i, j in DIRECTIONS:
+        direction_rays: List[List[Target]] = []
+        for row, col in SQUARE_TO_ROW_COL:
+            ray: List[Target] = []
+            row, col = row+i, col+j
+            while _on_board(row, col):
+                ray.append(_target(row, col))
+                row, col = row+i, col+j
+            direction_rays.append(ray)
+        rays.append(direction_rays)
+    return rays
+##
+
+RAY_TARGETS: List[List[List[Target]]] = _build_ray_targets() #RAY_TARGETS[direction][sq]
+KNIGHT_TARGETS: List[List[Target]] = [[_target(row+i, col+j) for i, j in KNIGHT_JUMPS if _on_board(row+i, col+j)] for row, col in SQUARE_TO_ROW_COL]
+KING_TARGETS: List[List[Tuple[int, Tuple[int, int], Tuple[int, int]]]] = [[_target(row+i, col+j) + ((i, j),) for i, j in DIRECTIONS if _on_board(row+i, col+j)] for row, col in SQUARE_TO_ROW_COL] #(mailbox index, (row, col), direction)
+
+
+
+###########
+## MASKS ##
+###########
+
+def _build_leaper_masks(offsets: List[Tuple[int, int]]) -> List[int]:
+    table: List[int] = []
+    for row, col in SQUARE_TO_ROW_COL:
+        mask = 0
+        for i, j in offsets:
+            if _on_board(row+i, col+j):
+                mask |= 1 << (8*(row+i) + col+j)
+        table.append(mask)
+    return table
+##
+
+def _ray_mask(ray: List[Target]) -> int:
+    mask = 0
+    for _, (row, col) in ray:
+        mask |= 1 << (8*row + col)
+    return mask
+##
+
+'''BETWEEN[a][b] holds the squares strictly between a and b, LINE[a][b] the whole board line passing through both of them. Both are empty when the squares are not aligned.'''
+def _build_between_and_line() -> Tuple[List[List[int]], List[List[int]]]:
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+
+    for d, (i, j) in enumerate(DIRECTIONS):
+        opposite = DIRECTIONS.index((-i, -j))
+        for a in range(64):
+            full_line = RAYS[d][a] | RAYS[opposite][a] | (1 << a)
+            path = 0
+            for _, (row, col) in RAY_TARGETS[d][a]:
+                b = 8*row + col
+                between[a][b] = path
+                line[a][b] = full_line
+                path |= 1 << b
+    return between, line
+##
+
+FULL: int = (1 << 64) - 1
+KNIGHT_ATTACKS: List[int] = _build_leaper_masks(KNIGHT_JUMPS)
+KING_ATTACKS: List[int] = _build_leaper_masks(DIRECTIONS)
+PAWN_ATTACKS: List[List[int]] = [_build_leaper_masks([(-1,-1), (-1,1)]), _build_leaper_masks([(1,-1), (1,1)])] #indexed by colour of the attacking pawn, 0 white and 1 black
+RAYS: List[List[int]] = [[_ray_mask(ray) for ray in direction_rays] for direction_rays in RAY_TARGETS] #RAYS[direction][sq]
+ROOK_RAYS: List[int] = [RAYS[0][sq] | RAYS[1][sq] | RAYS[2][sq] | RAYS[3][sq] for sq in range(64)]
+BISHOP_RAYS: List[int] = [RAYS[4][sq] | RAYS[5][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in range(64)]
+BETWEEN, LINE = _build_between_and_line()
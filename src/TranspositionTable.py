@@ -0,0 +1,113 @@
+'''Fixed size transposition table, keyed by the Zobrist key of GameState.
+
+The whole table is allocated once as a flat array of unsigned 64-bit words, so its memory footprint is exactly the size asked for and never grows during a search. Every entry takes two words:
+
+    word 0: key XOR data (so a torn or foreign entry fails the key check instead of returning garbage)
+    word 1: data, packed as
+              bits  0-15  best move (see encode_move, 0 = no move)
+              bits 16-23  depth
+              bits 24-25  bound type (EXACT, LOWER, UPPER, 0 = empty slot)
+              bits 26-31  search generation, used to age out old entries
+              bits 32-63  score + SCORE_OFFSET
+
+Entries are grouped in buckets of two slots: the first one is depth-preferred (only overwritten by deeper searches, the same position, or stale entries from a previous search), the second one is always replaced. Deep and expensive results are then kept around, while recent shallow ones still find a place.
+
+The words can also live in a buffer provided by the caller, e.g. a multiprocessing.shared_memory block, so that several processes search with the same table (see ParallelSearch.py). No lock is needed: a word is written at once, and an entry half overwritten by another process fails the key check like any foreign entry.
+'''
+from array import array
+from typing import Optional, Tuple, Union
+
+
+
+EXACT, LOWER, UPPER = 1, 2, 3 #bound types: exact score, fail-high (score >= beta), fail-low (score <= alpha)
+
+SCORE_OFFSET: int = 1 << 31
+_MASK_64: int = (1 << 64) - 1
+_WORDS_PER_ENTRY: int = 2
+_ENTRIES_PER_BUCKET: int = 2
+_BYTES_PER_ENTRY: int = 8 * _WORDS_PER_ENTRY
+_GENERATIONS: int = 64
+
+
+
+'''Moves are stored on 16 bits, as their own packed code (start square, end square and flag, see MOVES ENCODING in ChessEngine). A code is never 0, the start and end squares of a move being different'''
+def encode_move(move) -> int:
+    return move.code
+##
+
+
+
+'''Bytes taken by the words of a table of `size_mb` megabytes: the number of buckets is rounded down to a power of two, so that indexing is a single bitwise and'''
+def table_bytes(size_mb: int) -> int:
+    buckets = max(1, (size_mb * (1 << 20)) // (_BYTES_PER_ENTRY * _ENTRIES_PER_BUCKET))
+    return (1 << (buckets.bit_length() - 1)) * _ENTRIES_PER_BUCKET * _BYTES_PER_ENTRY
+##
+
+
+
+class TranspositionTable():
+
+    '''`buffer`, if given, must hold at least table_bytes(size_mb) bytes. It is used in place, not copied, and its content is kept: attaching to a table another process is filling is the whole point'''
+    def __init__(self, size_mb: int = 16, buffer: Optional[Union[bytearray, memoryview]] = None) -> None:
+        n_bytes = table_bytes(size_mb)
+
+        self.size_mb = size_mb
+        self.entries: int = n_bytes // _BYTES_PER_ENTRY
+        self.bucket_mask: int = self.entries // _ENTRIES_PER_BUCKET - 1
+        self.table: Union[array, memoryview] = array('Q', bytes(n_bytes)) if buffer is None else memoryview(buffer)[:n_bytes].cast('Q')
+        self.generation: int = 0
+    ##
+
+    def clear(self) -> None:
+        self.table[:] = array('Q', bytes(self.entries * _BYTES_PER_ENTRY))
+        self.generation = 0
+    ##
+
+    '''To be called once per search (i.e. per move played): entries written by previous searches become replaceable'''
+    def new_search(self) -> None:
+        self.generation = (self.generation + 1) % _GENERATIONS
+    ##
+
+    '''Look for the position, returns (depth, score, bound, move) or None if it is not stored'''
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        table = self.table
+        i = (key & self.bucket_mask) * (_ENTRIES_PER_BUCKET * _WORDS_PER_ENTRY)
+
+        for slot in (i, i + _WORDS_PER_ENTRY):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                return (data >> 16) & 0xFF, (data >> 32) - SCORE_OFFSET, (data >> 24) & 0x3, data & 0xFFFF
+        return None
+    ##
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = 0) -> None:
+        table = self.table
+        i = (key & self.bucket_mask) * (_ENTRIES_PER_BUCKET * _WORDS_PER_ENTRY)
+
+        ## REPLACEMENT POLICY ##
+        old_data = table[i + 1]
+        same_position = old_data and table[i] ^ old_data == key
+        if not old_data or same_position or depth >= (old_data >> 16) & 0xFF or (old_data >> 26) & 0x3F != self.generation:
+            slot = i #depth-preferred slot
+        else:
+            slot = i + _WORDS_PER_ENTRY #always-replace slot
+            old_data = table[slot + 1]
+            same_position = old_data and table[slot] ^ old_data == key
+
+        if not move and same_position: #a search that failed low has no best move, we keep the one we already knew
+            move = old_data & 0xFFFF
+
+        data = move | (min(depth, 0xFF) << 16) | (bound << 24) | (self.generation << 26) | ((score + SCORE_OFFSET) << 32)
+        table[slot] = (key ^ data) & _MASK_64
+        table[slot + 1] = data
+    ##
+
+    '''Permille of depth-preferred slots written during the current search, as reported by UCI engines. We only sample the first thousand buckets'''
+    def hashfull(self) -> int:
+        table = self.table
+        step = _ENTRIES_PER_BUCKET * _WORDS_PER_ENTRY
+        sample = min(1000, self.bucket_mask + 1)
+        used = sum(1 for b in range(sample) if table[b*step + 1] and (table[b*step + 1] >> 26) & 0x3F == self.generation)
+        return used * 1000 // sample
+    ##
+##
@@ -0,0 +1,228 @@
+'''UCI (Universal Chess Interface) front end, to drive the engine headless from a GUI or a test harness over stdin/stdout:
+
+    python UCI.py
+
+Supported commands: uci, isready, ucinewgame, position [startpos | fen <fen>] [moves <m1> <m2> ...], go [depth <d>] [movetime <ms>] [wtime <ms> btime <ms> winc <ms> binc <ms> movestogo <n>] [infinite | ponder], ponderhit, stop, quit. In infinite and ponder mode bestmove is held back until stop, even if the search ends by itself (a mate found, a book move, the depth cap), as the protocol asks. A ponderhit turns the ponder search into a normal one: from then on it gets the time the clock of its go command allows, and bestmove is sent as soon as it is over.
+
+Commands are read by an asyncio loop, while the search runs in a background thread: stop and isready are answered at once even when the engine is thinking. A stop sets the event the search polls (safe from another thread), and the search only ever touches the position of the last position command, which waits for a running search to be over before replacing it.
+'''
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from ChessEngine import GameState, Move, FEN_to_chess
+from Search import Searcher, SearchResult, MAX_DEPTH, MATE, MATE_BOUND
+from Book import OpeningBook
+from Tablebase import Tablebases
+
+
+
+ENGINE_NAME: str = 'ChessEngine'
+ENGINE_AUTHOR: str = 'ChessEngine developers'
+
+MOVES_TO_GO: int = 30 #moves we expect to still play when the GUI does not tell us
+MOVE_OVERHEAD: float = 0.05 #seconds kept for the communication with the GUI
+
+
+
+'''Time to spend on a move, in seconds, out of the `go` arguments (times in milliseconds). None means no time limit'''
+def time_for_move(white_to_move: bool, movetime: Optional[int] = None, wtime: Optional[int] = None, btime: Optional[int] = None, winc: int = 0, binc: int = 0, movestogo: Optional[int] = None) -> Optional[float]:
+    if movetime is not None:
+        return max(movetime / 1000 - MOVE_OVERHEAD, 0.01)
+    remaining, increment = (wtime, winc) if white_to_move else (btime, binc)
+    if remaining is None:
+        return None
+    budget = remaining / (movestogo or MOVES_TO_GO) + increment * 0.8
+    return max(min(budget, remaining * 0.5) / 1000 - MOVE_OVERHEAD, 0.01) #never more than half of what is left
+##
+
+'''The valid move of `game` written in coordinate notation (e2e4, e7e8q), None if there is none'''
+def parse_uci_move(game: GameState, text: str) -> Optional[Move]:
+    for move in game.get_valid_moves():
+        if move.get_uci_notation() == text:
+            return move
+    return None
+##
+
+'''Score as UCI wants it: centipawns, or moves (not plies) to mate'''
+def format_score(score: int) -> str:
+    if score > MATE_BOUND:
+        return f'mate {(MATE - score + 1) // 2}'
+    if score < -MATE_BOUND:
+        return f'mate -{(MATE + score + 1) // 2}'
+    return f'cp {score}'
+##
+
+
+
+class UCIEngine():
+
+    def __init__(self, tt_size_mb: int = 64, book_path: Optional[str] = None, tablebase_dir: Optional[str] = None) -> None:
+        self.game: GameState = GameState()
+        self.tablebases: Optional[Tablebases] = Tablebases(tablebase_dir) if tablebase_dir else None
+        self.searcher: Searcher = Searcher(tt_size_mb, tablebases=self.tablebases)
+        self.book: Optional[OpeningBook] = OpeningBook(book_path) if book_path else None #book moves are played without searching
+        self._executor = ThreadPoolExecutor(max_workers=1) #the search thread
+        self._search: Optional[asyncio.Future] = None
+        self._stop: threading.Event = threading.Event() #one per search, polled by it (see Searcher.search) so that a stop received before the search thread even started does not get lost
+        self._release: threading.Event = threading.Event() #one per search, bestmove may be sent once it is set (at once, unless infinite or ponder)
+        self._pondering: bool = False
+        self._ponder_time: Optional[float] = None #time for the move once the ponder search becomes a normal one
+        self._deadline: Optional[float] = None #set by ponderhit, polled by the search along with stop
+        self._output_lock = threading.Lock()
+    ##
+
+    '''Both the command loop and the search thread write, one whole line at a time'''
+    def send(self, line: str) -> None:
+        with self._output_lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+    ##
+
+    '''Reads commands until quit or the end of the input. stdin is read in a thread of its own, so that the loop stays free to handle the end of a search'''
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        reader = ThreadPoolExecutor(max_workers=1)
+        try:
+            while True:
+                line = await loop.run_in_executor(reader, sys.stdin.readline)
+                if not line or not await self.handle(line.strip()):
+                    break
+        finally:
+            await self._stop_search()
+            reader.shutdown(wait=False)
+            self._executor.shutdown()
+    ##
+
+    '''Executes a single command, returns False on quit'''
+    async def handle(self, line: str) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            await self._stop_search()
+            self.searcher = Searcher(self.searcher.tt.size_mb, tablebases=self.tablebases)
+        elif command == 'position':
+            await self._stop_search()
+            self.set_position(args)
+        elif command == 'go':
+            await self._stop_search()
+            self.go(args)
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'stop':
+            await self._stop_search()
+        elif command == 'quit':
+            return False
+        return True #unknown commands are ignored, as the protocol asks
+    ##
+
+    ## COMMANDS ##
+
+    '''An invalid FEN is reported and ignored, the previous position is kept'''
+    def set_position(self, args: List[str]) -> None:
+        moves_at = args.index('moves') if 'moves' in args else len(args)
+        if args and args[0] == 'fen':
+            fen = ' '.join(args[1:moves_at])
+            try:
+                self.game = FEN_to_chess(fen)
+            except ValueError:
+                self.send(f'info string invalid fen {fen}')
+                return
+        else:
+            self.game = GameState()
+
+        for text in args[moves_at+1:]:
+            move = parse_uci_move(self.game, text)
+            if move is None:
+                self.send(f'info string illegal move {text}')
+                break
+            self.game.make_move(move)
+    ##
+
+    '''A go with a non integer value is reported and ignored, no search is started'''
+    def go(self, args: List[str]) -> None:
+        values = {}
+        for name in ('depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+            if name in args[:-1]:
+                try:
+                    values[name] = int(args[args.index(name) + 1])
+                except ValueError:
+                    self.send(f'info string invalid go argument {name} {args[args.index(name) + 1]}')
+                    return
+        depth = min(values.pop('depth', MAX_DEPTH), MAX_DEPTH)
+        clock_time = time_for_move(self.game.white_to_move, **values)
+        self._pondering = 'ponder' in args
+        wait_for_stop = 'infinite' in args or self._pondering
+        time_limit = None if wait_for_stop else clock_time
+
+        loop = asyncio.get_running_loop()
+        self._stop, self._release = threading.Event(), threading.Event()
+        if not wait_for_stop:
+            self._release.set()
+        self._ponder_time = clock_time if self._pondering else None
+        self._deadline = None
+        self._search = loop.run_in_executor(self._executor, self._think, depth, time_limit, self._stop, self._release)
+    ##
+
+    '''The move we pondered on has been played: the search goes on, with the time of the go command from now on (no limit if it gave no clock), and sends bestmove as soon as it is done'''
+    def ponderhit(self) -> None:
+        if self._search is None or not self._pondering:
+            return
+        self._pondering = False
+        if self._ponder_time is not None:
+            self._deadline = time.perf_counter() + self._ponder_time
+        self._release.set()
+    ##
+
+    ## SEARCH THREAD ##
+
+    def _think(self, depth: int, time_limit: Optional[float], stop: threading.Event, release: threading.Event) -> None:
+        move = self.book.pick(self.game) if self.book is not None else None
+        if move is not None:
+            self.send('info string book move')
+        else:
+            should_stop = lambda: stop.is_set() or (self._deadline is not None and time.perf_counter() > self._deadline)
+            move = self.searcher.search(self.game, max_depth=depth, time_limit=time_limit, on_iteration=self._info, should_stop=should_stop).move
+        release.wait() #infinite or ponder: the GUI decides when we are done
+        self.send(f'bestmove {move.get_uci_notation() if move is not None else "0000"}')
+    ##
+
+    def _info(self, result: SearchResult) -> None:
+        ms = max(int(result.time * 1000), 1)
+        pv = ' '.join(move.get_uci_notation() for move in result.pv)
+        self.send(f'info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} nps {result.nodes * 1000 // ms} time {ms} hashfull {self.searcher.tt.hashfull()} pv {pv}')
+    ##
+
+    '''Stops the running search, if any, and waits for its bestmove to be sent'''
+    async def _stop_search(self) -> None:
+        if self._search is not None:
+            self._stop.set()
+            self._release.set()
+            await self._search
+            self._search = None
+    ##
+##
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='UCI engine on stdin/stdout')
+    parser.add_argument('--hash', type=int, default=64, help='transposition table size, in MB')
+    parser.add_argument('--book', default=None, help='opening book built with Book.py')
+    parser.add_argument('--tablebases', default=None, help='directory of endgame tables generated with Tablebase.py')
+    args = parser.parse_args()
+    asyncio.run(UCIEngine(args.hash, args.book, args.tablebases).run())
+##
@@ -0,0 +1,5 @@
+'''The engine modules import each other by bare name (they are run from src/), so the tests do the same'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,48 @@
+'''Polyglot keys and opening books'''
+import pytest
+
+from ChessEngine import GameState
+from PGN import parse_san
+from Book import OpeningBook, build_book, polyglot_key, encode_book_move
+
+
+
+'''Reference keys of the Polyglot specification, after each move of the line'''
+@pytest.mark.parametrize('sans, key', [
+    ([], 0x463B96181691FC9C),
+    (['e4'], 0x823C9B50FD114196),
+    (['e4', 'd5'], 0x0756B94461C50FB0),
+    (['e4', 'd5', 'e5'], 0x662FAFB965DB29D4),
+    (['e4', 'd5', 'e5', 'f5'], 0x22A48B5A8E47FF78), #en passant counts, a white pawn can take on f6
+    (['e4', 'd5', 'e5', 'f5', 'Ke2'], 0x652A607CA3F242C1),
+    (['e4', 'd5', 'e5', 'f5', 'Ke2', 'Kf7'], 0x00FDD303C946BDD9),
+    (['a4', 'b5', 'h4', 'b4', 'c4'], 0x3C8123EA7B067637),
+    (['a4', 'b5', 'h4', 'b4', 'c4', 'bxc3', 'Ra3'], 0x5C3F9B829B279560),
+])
+def test_polyglot_key(sans, key: int) -> None:
+    game = GameState()
+    for san in sans:
+        game.make_move(parse_san(game, san))
+    assert polyglot_key(game) == key
+##
+
+def test_castling_is_king_takes_rook() -> None:
+    game = GameState('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    codes = {move.get_uci_notation(): encode_book_move(move) for move in game.get_valid_moves()}
+    assert codes['e1g1'] == 7 | 0 << 3 | 4 << 6 | 0 << 9 #e1h1
+    assert codes['e1c1'] == 0 | 0 << 3 | 4 << 6 | 0 << 9 #e1a1
+##
+
+def test_build_and_probe(tmp_path) -> None:
+    pgn = tmp_path / 'games.pgn'
+    pgn.write_text('[Result "1-0"]\n\n1. e4 e5 2. Nf3 1-0\n\n[Result "1-0"]\n\n1. e4 c5 1-0\n\n[Result "0-1"]\n\n1. d4 d5 0-1\n')
+    path = str(tmp_path / 'book.bin')
+    assert build_book([str(pgn)], path) == 3 #e4 twice, Nf3 and d5: black points are 0 in the white wins
+
+    with OpeningBook(path) as book:
+        start = GameState()
+        assert [(move.get_uci_notation(), weight) for move, weight in book.moves(start)] == [('e2e4', 4)]
+        assert book.pick(start, best=True).get_uci_notation() == 'e2e4'
+        start.make_move(book.pick(start))
+        assert book.moves(start) == []
+##
@@ -0,0 +1,46 @@
+'''Policy indices and input planes of the neural network encoding'''
+import numpy as np
+import pytest
+
+from ChessEngine import GameState
+from Perft import REFERENCE_POSITIONS
+from Encoding import POLICY_SIZE, NUM_PLANES, SIDE_PLANE, new_buffer, encode_position, policy_index, legal_mask, move_from_policy
+
+
+
+@pytest.mark.parametrize('name, fen', [(name, fen) for name, fen, _ in REFERENCE_POSITIONS], ids=[name for name, _, _ in REFERENCE_POSITIONS])
+def test_policy_indices_are_unique(name: str, fen: str) -> None:
+    game = GameState(fen)
+    moves = game.get_valid_moves()
+    indices = [policy_index(move) for move in moves]
+    assert len(set(indices)) == len(moves)
+    assert all(0 <= index < POLICY_SIZE for index in indices)
+    for move, index in zip(moves, indices):
+        assert move_from_policy(game, index) == move
+
+    mask = legal_mask(moves, np.empty(POLICY_SIZE, dtype=bool))
+    assert mask.sum() == len(moves)
+    assert all(mask[indices])
+##
+
+@pytest.mark.parametrize('fen', ['1r5k/P7/8/8/8/8/8/K7 w - - 0 1', 'k7/8/8/8/8/8/p7/1R5K b - - 0 1'])
+def test_promotions(fen: str) -> None:
+    moves = [move for move in GameState(fen).get_valid_moves() if move.get_uci_notation()[-1] in 'qrbn']
+    assert len(moves) == 8 #push and capture, to four pieces each
+    assert len({policy_index(move) for move in moves}) == 8
+##
+
+def test_index_not_legal() -> None:
+    assert move_from_policy(GameState(), 0) is None #a1a1
+##
+
+def test_planes() -> None:
+    out = new_buffer(1)
+    white = encode_position(GameState(), out[0]).copy()
+    assert white.shape[0] == NUM_PLANES
+    assert white[:12].sum() == 32
+    game = GameState()
+    game.make_move(game.get_valid_moves()[0])
+    black = encode_position(game, out[0])
+    assert white[SIDE_PLANE].any() != black[SIDE_PLANE].any()
+##
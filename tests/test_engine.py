@@ -0,0 +1,112 @@
+'''Correctness checks of the move generator and of the state GameState keeps up to date incrementally. Run from the repository root with
+
+    python -m pytest -q
+'''
+import random
+
+import pytest
+
+from ChessEngine import GameState
+from Perft import REFERENCE_POSITIONS, BACKENDS, perft
+
+
+
+PERFT_DEPTH: int = 3
+POSITIONS = [(name, fen) for name, fen, _ in REFERENCE_POSITIONS]
+
+
+
+'''Every position reached from `game` within `depth` plies, checked by `check` after each move and after each undo'''
+def _walk(game: GameState, depth: int, check) -> None:
+    if depth == 0:
+        return
+    for move in game.get_valid_moves():
+        game.make_move(move)
+        check(game)
+        _walk(game, depth-1, check)
+        game.undo_move()
+        check(game)
+##
+
+def _assert_incremental_state(game: GameState) -> None:
+    assert game.zobrist_key == game.compute_zobrist_key()
+    assert (game.mg_score, game.eg_score, game.phase) == game.compute_evaluation_terms()
+##
+
+
+
+## MOVE GENERATION ##
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+@pytest.mark.parametrize('name, fen, counts', REFERENCE_POSITIONS, ids=[name for name, _, _ in REFERENCE_POSITIONS])
+def test_perft(backend: str, name: str, fen: str, counts) -> None:
+    assert perft(BACKENDS[backend](fen), PERFT_DEPTH) == counts[PERFT_DEPTH - 1]
+##
+
+
+
+## FEN ##
+
+@pytest.mark.parametrize('name, fen', POSITIONS, ids=[name for name, _ in POSITIONS])
+def test_fen_round_trip(name: str, fen: str) -> None:
+    assert GameState.from_fen(fen).to_fen() == fen
+##
+
+def test_fen_after_moves() -> None:
+    game = GameState()
+    for text in ('e2e4', 'c7c5', 'g1f3'):
+        game.make_move(next(move for move in game.get_valid_moves() if move.get_uci_notation() == text))
+        assert GameState.from_fen(game.to_fen()).to_fen() == game.to_fen()
+    assert game.to_fen() == 'rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2'
+##
+
+@pytest.mark.parametrize('fen', [
+    '8/8/8/8/8/8/8/K7 w - - 0 1', #no black king
+    'k7/8/8/8/8/8/8/KK6 w - - 0 1',
+    'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e4 0 1', #en passant square off rank 3
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1',
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1',
+    '4k3/8/8/8/8/8/8/4K3 w K - 0 1', #castling right without its rook
+    'r3k2r/8/8/8/8/8/8/R2K3R w KQ - 0 1', #castling rights without the king on e1
+    'r3k2r/8/8/8/8/8/8/R3K2R w KQkqX - 0 1',
+])
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_invalid_fen(backend: str, fen: str) -> None:
+    with pytest.raises(ValueError):
+        BACKENDS[backend](fen)
+##
+
+
+
+## INCREMENTAL STATE ##
+
+@pytest.mark.parametrize('name, fen', POSITIONS, ids=[name for name, _ in POSITIONS])
+def test_make_undo_restores_key_and_evaluation(name: str, fen: str) -> None:
+    game = GameState.from_fen(fen)
+    before = (game.to_fen(), game.zobrist_key, game.mg_score, game.eg_score, game.phase)
+    _walk(game, 2, _assert_incremental_state)
+    assert (game.to_fen(), game.zobrist_key, game.mg_score, game.eg_score, game.phase) == before
+    assert not game.move_log and not game.state_log
+##
+
+
+
+## SNAPSHOTS ##
+
+@pytest.mark.parametrize('seed', range(4))
+def test_pack_unpack_identity(seed: int) -> None:
+    rng = random.Random(seed)
+    game = GameState()
+    for _ in range(80):
+        moves = game.get_valid_moves()
+        if not moves:
+            break
+        game.make_move(moves[rng.randrange(len(moves))])
+
+        data = game.pack()
+        clone = GameState.unpack(data)
+        assert clone.pack() == data
+        assert clone.to_fen() == game.to_fen()
+        _assert_incremental_state(clone)
+        assert sorted(move.code for move in clone.get_valid_moves()) == sorted(move.code for move in game.get_valid_moves())
+##
@@ -0,0 +1,80 @@
+'''SAN conversion and PGN reading/writing'''
+import io
+import random
+
+import pytest
+
+from ChessEngine import GameState
+from Perft import REFERENCE_POSITIONS
+from PGN import parse_san, move_to_san, read_games, write_game
+
+
+
+@pytest.mark.parametrize('name, fen', [(name, fen) for name, fen, _ in REFERENCE_POSITIONS], ids=[name for name, _, _ in REFERENCE_POSITIONS])
+def test_san_round_trip(name: str, fen: str) -> None:
+    game = GameState(fen)
+    moves = game.get_valid_moves()
+    sans = [move_to_san(game, move, moves) for move in moves]
+    assert len(set(sans)) == len(moves)
+    for move, san in zip(moves, sans):
+        assert parse_san(game, san, moves) == move
+##
+
+@pytest.mark.parametrize('fen, san', [
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 'O-O'),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 'O-O-O'),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 'Bxa6'),
+    ('R6R/8/8/8/8/8/8/k3K3 w - - 0 1', 'Rad8'), #file disambiguation
+    ('R7/8/8/8/8/8/8/R3K2k w - - 0 1', 'R1a4'), #rank disambiguation
+    ('1r5k/P7/8/8/8/8/8/K7 w - - 0 1', 'axb8=N'),
+    ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'Ra8#'),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 'exf6'), #en passant
+])
+def test_san_notation(fen: str, san: str) -> None:
+    game = GameState(fen)
+    assert move_to_san(game, parse_san(game, san)) == san
+##
+
+@pytest.mark.parametrize('san', ['Qh5', 'Nb3', 'e5', 'O-O', 'xyz'])
+def test_invalid_san(san: str) -> None:
+    with pytest.raises(ValueError):
+        parse_san(GameState(), san)
+##
+
+def test_write_then_read_games() -> None:
+    rng = random.Random(0)
+    games = []
+    for _ in range(3):
+        game = GameState()
+        for _ in range(60):
+            moves = game.get_valid_moves()
+            if not moves:
+                break
+            game.make_move(moves[rng.randrange(len(moves))])
+        games.append(game)
+
+    out = io.StringIO()
+    for game in games:
+        write_game(out, game, {'Event': 'test'}, result='*')
+
+    read = list(read_games(io.StringIO(out.getvalue())))
+    assert len(read) == len(games)
+    for game, pgn_game in zip(games, read):
+        assert pgn_game.tags['Event'] == 'test'
+        assert len(pgn_game.moves) == len(game.move_log)
+        assert pgn_game.replay().to_fen() == game.to_fen()
+##
+
+def test_read_comments_variations_and_fen() -> None:
+    text = '''[Event "x"]
+[SetUp "1"]
+[FEN "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"]
+
+1. Ra8+ {a comment [with brackets]
+spanning lines} (1. Ra7 h6) 1-0
+'''
+    (pgn_game,) = read_games(io.StringIO(text))
+    assert pgn_game.moves == ['Ra8+']
+    assert pgn_game.result == '1-0'
+    assert pgn_game.replay().to_fen() == 'R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1'
+##
@@ -0,0 +1,55 @@
+'''Search results on positions with a known answer'''
+import pytest
+
+from ChessEngine import GameState
+from MoveOrdering import MoveOrdering, HISTORY_LIMIT
+from Search import Searcher, MATE
+
+
+
+@pytest.mark.parametrize('fen, best, plies', [
+    ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'a1a8', 1), #back rank mate
+    ('r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4', 'h5f7', 1), #scholar's mate
+    ('kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1', 'a1a6', 3),
+])
+def test_finds_mate(fen: str, best: str, plies: int) -> None:
+    result = Searcher(tt_size_mb=1).search(GameState(fen), max_depth=plies + 2)
+    assert result.move.get_uci_notation() == best
+    assert result.score == MATE - plies
+##
+
+def test_checkmated_position() -> None:
+    result = Searcher(tt_size_mb=1).search(GameState('R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1'), max_depth=3)
+    assert result.move is None
+    assert result.score == -MATE
+##
+
+def test_wins_hanging_queen() -> None:
+    result = Searcher(tt_size_mb=1).search(GameState('6k1/8/8/8/8/8/3q4/3R2K1 w - - 0 1'), max_depth=3)
+    assert result.move.get_uci_notation() == 'd1d2'
+    assert result.score > 300
+##
+
+def test_position_is_left_untouched() -> None:
+    game = GameState('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    before = (game.to_fen(), game.zobrist_key)
+    Searcher(tt_size_mb=1).search(game, max_depth=2)
+    assert (game.to_fen(), game.zobrist_key) == before
+    assert not game.move_log
+##
+
+def test_stop_before_start_still_returns_a_move() -> None:
+    result = Searcher(tt_size_mb=1).search(GameState(), should_stop=lambda: True)
+    assert result.move is not None
+    assert result.depth == 0
+##
+
+def test_history_stays_bounded() -> None:
+    ordering = MoveOrdering()
+    game = GameState()
+    cutoff, *failed = game.get_valid_moves()
+    for _ in range(10_000):
+        ordering.update(cutoff, 30, 0, True, failed)
+    assert ordering.history_score(cutoff, True) <= HISTORY_LIMIT
+    assert all(ordering.history_score(move, True) >= -HISTORY_LIMIT for move in failed)
+##
@@ -0,0 +1,57 @@
+'''Probes of a generated KQK table'''
+import os
+
+import pytest
+
+from ChessEngine import GameState, QUEEN
+from Tablebase import Tablebases, TBResult, generate, write_table, signature_of, EXTENSION
+
+
+
+@pytest.fixture(scope='module')
+def tablebases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tablebases')
+    kinds = (QUEEN,)
+    dtm_w, dtm_b = generate(kinds)[kinds]
+    write_table(os.path.join(directory, signature_of(kinds) + EXTENSION), kinds, dtm_w, dtm_b)
+    tablebases = Tablebases(str(directory))
+    yield tablebases
+    tablebases.close()
+##
+
+
+
+@pytest.mark.parametrize('fen, result', [
+    ('7k/8/6K1/8/8/8/8/1Q6 w - - 0 1', TBResult(1, 1)), #Qb8#
+    ('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1', TBResult(-1, 0)), #already mated
+    ('k7/2Q5/1K6/8/8/8/8/8 b - - 0 1', TBResult(0, 0)), #stalemate
+    ('6k1/6Q1/8/8/8/8/8/K7 b - - 0 1', TBResult(0, 0)), #the queen is lost
+    ('1q6/8/8/8/8/6k1/8/7K b - - 0 1', TBResult(1, 1)), #colours the other way around
+    ('7K/8/8/8/8/8/8/k7 w - - 0 1', TBResult(0, 0)), #bare kings
+])
+def test_probe(tablebases: Tablebases, fen: str, result: TBResult) -> None:
+    assert tablebases.probe(GameState(fen)) == result
+##
+
+def test_mate_lengths_agree_with_play(tablebases: Tablebases) -> None:
+    game = GameState('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+    wdl, plies = tablebases.probe(game)
+    assert wdl == 1 and 0 < plies < 20
+    results = []
+    for move in game.get_valid_moves():
+        game.make_move(move)
+        after = tablebases.probe(game)
+        game.undo_move()
+        results.append(after)
+    assert all(after.wdl != -1 or after.plies >= plies - 1 for after in results) #no move mates faster than the table says
+    assert any(after.wdl == -1 and after.plies == plies - 1 for after in results)
+##
+
+@pytest.mark.parametrize('fen', [
+    '7k/8/6K1/8/8/8/8/QR6 w - - 0 1', #no KQRK table
+    '7k/8/6K1/8/8/8/8/Q6q w - - 0 1', #material on both sides
+    '4k3/8/8/8/8/8/8/Q3K2R w K - 0 1',
+])
+def test_not_covered(tablebases: Tablebases, fen: str) -> None:
+    assert tablebases.probe(GameState(fen)) is None
+##
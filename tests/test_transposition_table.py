@@ -0,0 +1,58 @@
+'''Storage and replacement policy of the transposition table'''
+from TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER
+
+
+
+'''Distinct keys falling in the same bucket as `key`'''
+def _same_bucket(tt: TranspositionTable, key: int, n: int):
+    return [key + (i + 1) * (tt.bucket_mask + 1) for i in range(n)]
+##
+
+
+
+def test_store_and_probe() -> None:
+    tt = TranspositionTable(1)
+    tt.store(12345, 7, -250, UPPER, 0x1234)
+    assert tt.probe(12345) == (7, -250, UPPER, 0x1234)
+    assert tt.probe(54321) is None
+##
+
+def test_deep_entry_survives_shallow_ones() -> None:
+    tt = TranspositionTable(1)
+    deep = 77
+    shallow, shallower = _same_bucket(tt, deep, 2)
+    tt.store(deep, 8, 10, EXACT, 1)
+    tt.store(shallow, 2, 20, LOWER, 2) #goes to the always-replace slot
+    assert tt.probe(deep) == (8, 10, EXACT, 1)
+    assert tt.probe(shallow) == (2, 20, LOWER, 2)
+
+    tt.store(shallower, 1, 30, LOWER, 3) #replaces the other shallow entry, never the deep one
+    assert tt.probe(deep) is not None
+    assert tt.probe(shallow) is None
+    assert tt.probe(shallower) == (1, 30, LOWER, 3)
+##
+
+def test_stale_entries_are_replaced() -> None:
+    tt = TranspositionTable(1)
+    deep = 77
+    (other,) = _same_bucket(tt, deep, 1)
+    tt.store(deep, 8, 10, EXACT, 1)
+    tt.new_search()
+    tt.store(other, 1, 20, EXACT, 2) #the deep entry belongs to the previous search
+    assert tt.probe(other) == (1, 20, EXACT, 2)
+    assert tt.probe(deep) is None
+##
+
+def test_fail_low_keeps_known_move() -> None:
+    tt = TranspositionTable(1)
+    tt.store(99, 3, 40, EXACT, 0x0ABC)
+    tt.store(99, 4, -10, UPPER, 0)
+    assert tt.probe(99) == (4, -10, UPPER, 0x0ABC)
+##
+
+def test_clear() -> None:
+    tt = TranspositionTable(1)
+    tt.store(99, 3, 40, EXACT, 1)
+    tt.clear()
+    assert tt.probe(99) is None
+##
@@ -0,0 +1,147 @@
+'''UCI command handling, driven without stdin: every line the engine sends is collected'''
+import asyncio
+from typing import List
+
+import pytest
+
+from UCI import UCIEngine, time_for_move, format_score
+from Search import MATE
+
+
+
+MATE_IN_ONE: str = '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+
+
+
+@pytest.fixture
+def engine():
+    engine = UCIEngine(tt_size_mb=1)
+    engine.lines: List[str] = []
+    engine.send = engine.lines.append
+    yield engine
+    engine._executor.shutdown()
+##
+
+'''Runs the commands in order, in a single event loop, and returns the lines sent'''
+def run(engine: UCIEngine, *commands: str) -> List[str]:
+    async def main() -> None:
+        for command in commands:
+            if command.startswith('sleep '):
+                await asyncio.sleep(float(command.split()[1]))
+            elif command == 'wait':
+                await engine._search
+            else:
+                assert await engine.handle(command)
+        await engine._stop_search()
+    asyncio.run(main())
+    return engine.lines
+##
+
+def bestmoves(lines: List[str]) -> List[str]:
+    return [line for line in lines if line.startswith('bestmove')]
+##
+
+
+
+## COMMANDS ##
+
+def test_uci_and_isready(engine: UCIEngine) -> None:
+    lines = run(engine, 'uci', 'isready', 'unknowncommand')
+    assert lines[-2:] == ['uciok', 'readyok']
+##
+
+def test_position_with_moves(engine: UCIEngine) -> None:
+    run(engine, 'position startpos moves e2e4 c7c5 g1f3')
+    assert engine.game.to_fen() == 'rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2'
+    run(engine, f'position fen {MATE_IN_ONE} moves a1a8')
+    assert engine.game.to_fen() == 'R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1'
+##
+
+def test_illegal_move_is_reported(engine: UCIEngine) -> None:
+    lines = run(engine, 'position startpos moves e2e4 e2e4 d7d5')
+    assert lines == ['info string illegal move e2e4']
+    assert engine.game.to_fen() == 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+##
+
+@pytest.mark.parametrize('fen', ['garbage', '', '8/8/8/8/8/8/8/8 w - - 0 1', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e4 0 1'])
+def test_invalid_fen_keeps_position(engine: UCIEngine, fen: str) -> None:
+    lines = run(engine, f'position fen {MATE_IN_ONE}', f'position fen {fen}', 'isready')
+    assert lines[0].startswith('info string invalid fen')
+    assert lines[-1] == 'readyok'
+    assert engine.game.to_fen() == MATE_IN_ONE
+##
+
+@pytest.mark.parametrize('go', ['go depth x', 'go movetime 1.5', 'go wtime -', 'go depth'])
+def test_invalid_go_argument(engine: UCIEngine, go: str) -> None:
+    lines = run(engine, go, 'isready')
+    assert 'readyok' in lines
+    if go != 'go depth': #a missing value is no argument at all: the search runs without a depth limit
+        assert lines[0].startswith('info string invalid go argument')
+        assert not bestmoves(lines)
+##
+
+
+
+## SEARCH ##
+
+def test_go_depth(engine: UCIEngine) -> None:
+    lines = run(engine, f'position fen {MATE_IN_ONE}', 'go depth 2', 'wait')
+    assert bestmoves(lines) == ['bestmove a1a8']
+    assert any(' score mate 1 ' in line for line in lines)
+##
+
+def test_go_infinite_waits_for_stop(engine: UCIEngine) -> None:
+    async def main() -> None:
+        await engine.handle(f'position fen {MATE_IN_ONE}')
+        await engine.handle('go infinite depth 2')
+        await asyncio.sleep(0.5)
+        assert not bestmoves(engine.lines) #the search is over, but bestmove waits for stop
+        await engine.handle('stop')
+    asyncio.run(main())
+    assert bestmoves(engine.lines) == ['bestmove a1a8']
+##
+
+def test_ponderhit_sends_bestmove(engine: UCIEngine) -> None:
+    async def main() -> None:
+        await engine.handle(f'position fen {MATE_IN_ONE}')
+        await engine.handle('go ponder depth 2')
+        await asyncio.sleep(0.5)
+        assert not bestmoves(engine.lines)
+        await engine.handle('ponderhit')
+        await engine._search #no stop: ponderhit alone lets bestmove out
+    asyncio.run(main())
+    assert bestmoves(engine.lines) == ['bestmove a1a8']
+##
+
+'''With a clock, the search runs without limit while pondering, then out of the go time once ponderhit comes'''
+def test_ponderhit_starts_the_clock(engine: UCIEngine) -> None:
+    async def main() -> None:
+        await engine.handle('go ponder movetime 200')
+        await asyncio.sleep(0.5)
+        assert not bestmoves(engine.lines)
+        await engine.handle('ponderhit')
+        await asyncio.wait_for(engine._search, timeout=10)
+    asyncio.run(main())
+    assert len(bestmoves(engine.lines)) == 1
+##
+
+def test_new_go_stops_the_previous_search(engine: UCIEngine) -> None:
+    lines = run(engine, 'go infinite', 'sleep 0.2', 'go depth 1', 'wait')
+    assert len(bestmoves(lines)) == 2
+##
+
+
+
+## HELPERS ##
+
+def test_time_for_move() -> None:
+    assert time_for_move(True) is None
+    assert time_for_move(True, movetime=1000) == pytest.approx(0.95)
+    assert time_for_move(False, wtime=60_000, btime=1_000, movestogo=10) < time_for_move(True, wtime=60_000, btime=1_000, movestogo=10)
+##
+
+def test_format_score() -> None:
+    assert format_score(35) == 'cp 35'
+    assert format_score(MATE - 1) == 'mate 1'
+    assert format_score(-(MATE - 2)) == 'mate -1'
+##